@@ -0,0 +1,23 @@
+import random
+from synthetic import SEED, OfflineAttioData, attio_records
+
+
+def hydrated(users: int, workspaces: int) -> tuple[OfflineAttioData]:
+    attio = OfflineAttioData(attio_records(users, workspaces))
+    attio.hydrate()
+    return (attio,)
+
+
+def delete_all_users(attio: OfflineAttioData) -> None:
+    users = attio.users
+    random.Random(SEED).shuffle(users)
+    for user in users:
+        attio.delete_record(user.api_object, user.record_id)
+
+
+def bench_delete_record_scales_linearly(benchmark):
+    small = benchmark(delete_all_users, rounds=1, setup=lambda: hydrated(10_000, 4))
+    large = benchmark(delete_all_users, rounds=1, setup=lambda: hydrated(50_000, 4))
+
+    # 5x the users in the same workspaces: linear is ~5x, quadratic would be ~25x
+    assert large / small < 10
@@ -0,0 +1,15 @@
+from fixattiosync.fixresources import FixUser
+from synthetic import fix_tenant
+
+
+def update_all_users(users: list[FixUser]) -> None:
+    for user in users:
+        user.update_info()
+
+
+def bench_update_info_independent_of_cloud_accounts(benchmark):
+    few = benchmark(update_all_users, fix_tenant(200, 20, 10))
+    many = benchmark(update_all_users, fix_tenant(200, 20, 1_000))
+
+    # 100x the cloud accounts per workspace must not change the cost of picking a user's best workspace
+    assert many / few < 3
@@ -0,0 +1,79 @@
+"""Timings of the functions every sync runs once per record, gated by the stored baselines."""
+
+from typing import Any
+from fixattiosync.attioresources import AttioPerson, AttioUser, AttioWorkspace, get_nested_field
+from fixattiosync.fixresources import FixUser
+from fixattiosync.sync import plan_sync
+from synthetic import attio_records, fix_tenant, synced_tenant, synced_users
+
+USERS = 10_000
+WORKSPACES = 20
+
+
+def make_all(cls: type[Any], records: list[dict[str, Any]]) -> None:
+    for record in records:
+        cls.make(record)
+
+
+def bench_make(benchmark):
+    records = attio_records(USERS, WORKSPACES)
+
+    benchmark(make_all, AttioUser, records["users"], name="AttioUser.make")
+    benchmark(make_all, AttioPerson, records["people"], name="AttioPerson.make")
+    benchmark(make_all, AttioWorkspace, records["workspaces"] * (USERS // WORKSPACES), name="AttioWorkspace.make")
+
+
+def get_fields(records: list[dict[str, Any]]) -> None:
+    for record in records:
+        values = record["values"]
+        get_nested_field(values, "user_id", ["value"])
+        get_nested_field(values, "primary_email_address", ["email_address"])
+        get_nested_field(values, "status", ["status", "title"])
+        get_nested_field(values, "missing", ["value"])
+
+
+def bench_get_nested_field(benchmark):
+    benchmark(get_fields, attio_records(USERS, WORKSPACES)["users"])
+
+
+def compare(pairs: list[tuple[FixUser, AttioUser]]) -> None:
+    for fix_user, attio_user in pairs:
+        assert fix_user == attio_user
+
+
+def bench_fix_user_eq_attio_user(benchmark):
+    # Fresh users each round, so that the normalized values are computed rather than taken from the cache
+    benchmark(compare, setup=lambda: (synced_users(USERS, 3),), name="FixUser.__eq__")
+
+
+def update_info(users: list[FixUser]) -> None:
+    for user in users:
+        user.update_info()
+
+
+def bench_update_info(benchmark):
+    benchmark(update_info, fix_tenant(USERS // 10, 10, 5), name="FixUser.update_info")
+
+
+def attio_data(pairs: list[tuple[FixUser, AttioUser]]) -> None:
+    for fix_user, attio_user in pairs:
+        fix_user.attio_data(attio_user.person, list(attio_user.workspaces))  # type: ignore
+
+
+def bench_attio_data(benchmark):
+    benchmark(attio_data, synced_users(USERS, 3), name="FixUser.attio_data")
+
+
+def bench_connect(benchmark):
+    _, attio = synced_tenant(USERS, WORKSPACES)
+
+    benchmark(attio._AttioData__connect, name="AttioData.__connect")
+
+
+def bench_diff(benchmark):
+    fix, attio = synced_tenant(USERS, WORKSPACES)
+    benchmark(plan_sync, fix, attio)
+
+    # Every user is in every workspace, so the workspace diff gets a tenant of its own with few users
+    fix, attio = synced_tenant(10, USERS // 2)
+    benchmark(plan_sync, fix, attio)
@@ -0,0 +1,54 @@
+from datetime import timezone
+from typing import Any
+from fixattiosync.attioresources import AttioUser
+from fixattiosync.fixresources import FixUser
+from synthetic import synced_users
+
+
+def legacy_eq(self: Any, other: Any) -> bool:
+    """FixUser.__eq__ before the declarative mapping, kept as the baseline."""
+    if (
+        not hasattr(other, "id")
+        or not hasattr(other, "email")
+        or not hasattr(other, "registered_at")
+        or not hasattr(other, "workspaces")
+        or not hasattr(other, "last_active_at")
+        or not hasattr(other, "user_email_notifications_disabled")
+        or not hasattr(other, "at_least_one_cloud_account_connected")
+        or not hasattr(other, "is_main_user_in_at_least_one_workspace")
+        or not hasattr(other, "cloud_account_connected_workspace_name")
+        or not hasattr(other, "workspace_has_subscription")
+    ):
+        return False
+    return bool(
+        self.id == other.id
+        and str(self.email).lower() == str(other.email).lower()
+        and self.registered_at.astimezone(timezone.utc) == other.registered_at.astimezone(timezone.utc)
+        and {w.id for w in self.workspaces} == {w.id for w in other.workspaces}
+        and self.user_email_notifications_disabled == other.user_email_notifications_disabled
+        and self.at_least_one_cloud_account_connected == other.at_least_one_cloud_account_connected
+        and self.is_main_user_in_at_least_one_workspace == other.is_main_user_in_at_least_one_workspace
+        and self.cloud_account_connected_workspace_name == other.cloud_account_connected_workspace_name
+        and self.workspace_has_subscription == other.workspace_has_subscription
+        and self.last_active_at.astimezone(timezone.utc) == other.last_active_at.astimezone(timezone.utc)
+    )
+
+
+def compare_legacy(pairs: list[tuple[FixUser, AttioUser]]) -> None:
+    assert all(legacy_eq(fix_user, attio_user) for fix_user, attio_user in pairs)
+
+
+def compare_mapped(pairs: list[tuple[FixUser, AttioUser]]) -> None:
+    assert all(fix_user == attio_user for fix_user, attio_user in pairs)
+
+
+def bench_mapped_comparison_is_faster_than_legacy_eq(benchmark):
+    # Both sides are normalized when they are loaded, as FixData and AttioData do
+    pairs = synced_users(20_000, 3)
+    for fix_user, _ in pairs:
+        fix_user.normalize()
+
+    legacy = benchmark(compare_legacy, pairs)
+    mapped = benchmark(compare_mapped, pairs)
+
+    assert mapped < legacy
@@ -0,0 +1,42 @@
+"""Work left to the main process when hydration marshals records in worker processes."""
+
+import json
+import pickle
+from typing import Any
+from uuid import UUID
+from fixattiosync.attiodata import make_flat
+from fixattiosync.attioresources import AttioUser, unflatten
+from synthetic import attio_records
+
+USERS = 10_000
+CHUNK = 2_000
+
+
+def make_all(records: list[dict[str, Any]]) -> None:
+    for record in records:
+        AttioUser.make(record)
+
+
+def round_trip_all(texts: list[str], results: list[bytes]) -> None:
+    # With workers the main process pickles the JSON texts out and unpickles and unflattens the results. It
+    # decodes every record either way to paginate, which isn't timed.
+    uuids: dict[int, UUID] = {}
+    for i, result in enumerate(results):
+        pickle.dumps(texts[i * CHUNK : (i + 1) * CHUNK], pickle.HIGHEST_PROTOCOL)
+        unflatten(AttioUser, pickle.loads(result), uuids)
+
+
+def bench_marshal_workers_offload_the_main_process(benchmark):
+    texts = [json.dumps(record) for record in attio_records(USERS, 20)["users"]]
+    # What the workers send back
+    results = [
+        pickle.dumps(make_flat(AttioUser, texts[i : i + CHUNK]), pickle.HIGHEST_PROTOCOL)
+        for i in range(0, len(texts), CHUNK)
+    ]
+
+    in_process = benchmark(make_all, setup=lambda: ([json.loads(text) for text in texts],), name="in_process")
+    pooled = benchmark(round_trip_all, texts, results, name="pooled")
+
+    # Unpickling the resources make() returns would cost about as much as make() itself, the flattened ones about
+    # half: what is left is mostly creating the UUIDs and resources themselves
+    assert pooled < in_process * 0.7
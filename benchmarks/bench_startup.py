@@ -0,0 +1,22 @@
+"""Import time of the CLI entry point, which every run and every health check of a cron job pays."""
+
+import re
+import sys
+import subprocess
+
+ROUNDS = 5
+
+
+def import_time(module: str) -> float:
+    """Cumulative import time of the module in a fresh interpreter in seconds, without interpreter startup."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    match = re.search(rf"import time:\s+\d+ \|\s+(\d+) \|\s+{re.escape(module)}$", result.stderr, re.MULTILINE)
+    assert match is not None, f"{module} not found in the import times"
+    return int(match.group(1)) / 1_000_000
+
+
+def bench_entry_point_import(benchmark):
+    module = "fixattiosync.__main__"
+    benchmark.record(f"import {module}", [import_time(module) for _ in range(ROUNDS)])
@@ -0,0 +1,127 @@
+import os
+import json
+import time
+import pytest
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+BASELINES = Path(__file__).parent / "baselines.json"
+MIN_GATED_SECONDS = 0.001
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--save-baselines",
+        action="store_true",
+        default=False,
+        help=f"Store the timings of this run as the new baselines in {BASELINES.name}",
+    )
+    parser.addoption(
+        "--baseline-tolerance",
+        type=float,
+        default=float(os.environ.get("BENCH_TOLERANCE", 0.5)),
+        help="Fail a benchmark that is slower than its baseline by more than this fraction (default: 0.5)",
+    )
+
+
+def calibrate() -> float:
+    """Time of a fixed pure Python workload, timings are stored relative to it to be comparable across machines."""
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        values: dict[int, str] = {}
+        for i in range(200_000):
+            values[i % 1_000] = str(i)
+        sorted(values.values())
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+class Baselines:
+    def __init__(self, path: Path, tolerance: float, save: bool) -> None:
+        self.path = path
+        self.tolerance = tolerance
+        self.save = save
+        self.stored: dict[str, float] = json.loads(path.read_text()) if path.exists() else {}
+        self.results: dict[str, float] = {}
+        self.__calibration: Optional[float] = None
+
+    @property
+    def calibration(self) -> float:
+        if self.__calibration is None:
+            self.__calibration = calibrate()
+        return self.__calibration
+
+    def check(self, key: str, seconds: float) -> Optional[str]:
+        """Record a timing, returns why it fails if it regressed past the tolerance."""
+        relative = seconds / self.calibration
+        self.results[key] = relative
+        baseline = self.stored.get(key)
+        # Sub-millisecond timings are mostly noise
+        if self.save or baseline is None or seconds < MIN_GATED_SECONDS or relative <= baseline * (1 + self.tolerance):
+            return None
+        return f"{key} is {relative / baseline - 1:.0%} slower than its baseline (tolerance {self.tolerance:.0%})"
+
+    def write(self) -> None:
+        merged = {**self.stored, **self.results}
+        self.path.write_text(json.dumps({key: round(merged[key], 4) for key in sorted(merged)}, indent=2) + "\n")
+
+
+class Benchmark:
+    def __init__(self, name: str, baselines: Optional[Baselines] = None) -> None:
+        self.name = name
+        self.baselines = baselines
+        self.timings: list[float] = []
+        self.__names: dict[str, int] = {}
+
+    def __call__(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        rounds: int = 3,
+        setup: Optional[Callable[[], tuple[Any, ...]]] = None,
+        name: Optional[str] = None,
+    ) -> float:
+        """Run `fn` `rounds` times and return the fastest run in seconds.
+
+        If `setup` is given, it is called before every round and its result is passed to `fn` as arguments.
+        The fastest run is compared against the baseline stored under `name` (default: the name of `fn`).
+        """
+        timings = []
+        for _ in range(rounds):
+            call_args = setup() if setup is not None else args
+            start = time.perf_counter()
+            fn(*call_args)
+            timings.append(time.perf_counter() - start)
+        return self.record(name or fn.__name__, timings)
+
+    def record(self, name: str, timings: list[float]) -> float:
+        """Gate timings taken elsewhere, e.g. in a subprocess, like those of `__call__`, returns the fastest."""
+        self.timings.extend(timings)
+        best = min(timings)
+        key = self.key(name)
+        print(f"{key}: {best * 1000:.2f}ms (best of {len(timings)})")
+        if self.baselines is not None:
+            regression = self.baselines.check(key, best)
+            if regression is not None:
+                pytest.fail(regression)
+        return best
+
+    def key(self, name: str) -> str:
+        # The same function may be timed on different inputs in one benchmark
+        count = self.__names[name] = self.__names.get(name, 0) + 1
+        return f"{self.name}.{name}" if count == 1 else f"{self.name}.{name}.{count}"
+
+
+@pytest.fixture(scope="session")
+def baselines(request: pytest.FixtureRequest) -> Iterator[Baselines]:
+    save = request.config.getoption("--save-baselines")
+    baselines = Baselines(BASELINES, request.config.getoption("--baseline-tolerance"), save)
+    yield baselines
+    if save:
+        baselines.write()
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest, baselines: Baselines) -> Benchmark:
+    return Benchmark(request.node.name, baselines)
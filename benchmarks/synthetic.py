@@ -0,0 +1,265 @@
+"""Deterministic synthetic Fix and Attio data for benchmarks."""
+
+import random
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+from typing import Any, Optional
+from fixattiosync.attiodata import AttioData
+from fixattiosync.fixdata import FixData
+from fixattiosync.attioresources import AttioPerson, AttioResource, AttioUser, AttioWorkspace
+from fixattiosync.fixresources import FixCloudAccount, FixRoles, FixUser, FixWorkspace
+
+SEED = 42
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class SyntheticIds:
+    def __init__(self, seed: int = SEED) -> None:
+        self.random = random.Random(seed)
+
+    def uuid(self) -> UUID:
+        return UUID(int=self.random.getrandbits(128), version=4)
+
+    def timestamp(self) -> datetime:
+        return EPOCH + timedelta(seconds=self.random.randrange(365 * 24 * 3600))
+
+
+def envelope(ids: SyntheticIds, object_id: UUID, values: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": {"workspace_id": str(object_id), "object_id": str(object_id), "record_id": str(ids.uuid())},
+        "created_at": ids.timestamp().isoformat(),
+        "values": values,
+    }
+
+
+def attio_records(users: int, workspaces: int, seed: int = SEED) -> dict[str, list[dict[str, Any]]]:
+    """Raw Attio records as returned by the query endpoint, each user in one workspace."""
+    ids = SyntheticIds(seed)
+    object_ids = {object_id: ids.uuid() for object_id in ["workspaces", "people", "users"]}
+    workspace_records = [
+        envelope(
+            ids,
+            object_ids["workspaces"],
+            {
+                "workspace_id": [{"value": str(ids.uuid())}],
+                "name": [{"value": f"Workspace {i}"}],
+                "product_tier": [{"option": {"title": "Free"}}],
+                "status": [{"status": {"title": "Created"}}],
+                "cloud_account_connected": [{"value": False}],
+            },
+        )
+        for i in range(workspaces)
+    ]
+    people_records = []
+    user_records = []
+    for i in range(users):
+        email = f"user{i}@example.com"
+        person = envelope(
+            ids,
+            object_ids["people"],
+            {
+                "name": [{"full_name": f"User {i}", "first_name": "User", "last_name": str(i)}],
+                "email_addresses": [{"email_address": email}],
+                "job_title": [{"value": "Engineer"}],
+                "linkedin": [{"value": None}],
+            },
+        )
+        workspace = workspace_records[i % workspaces]
+        user = envelope(
+            ids,
+            object_ids["users"],
+            {
+                "user_id": [{"value": str(ids.uuid())}],
+                "primary_email_address": [{"email_address": email}],
+                "status": [{"status": {"title": "Signed up"}}],
+                "registered_at": [{"value": ids.timestamp().isoformat()}],
+                "last_activity_3": [{"value": ids.timestamp().isoformat()}],
+                "person": [{"target_object": "people", "target_record_id": person["id"]["record_id"]}],
+                "workspace": [{"target_object": "workspaces", "target_record_id": workspace["id"]["record_id"]}],
+                "user_email_notifications_disabled": [{"value": False}],
+                "at_least_one_cloud_account_connected": [{"value": False}],
+                "is_main_user_in_at_least_one_workspace": [{"value": True}],
+                "cloud_account_connected_workspace_name": [{"value": ""}],
+                "workspace_has_subscription": [{"value": False}],
+            },
+        )
+        people_records.append(person)
+        user_records.append(user)
+    return {"workspaces": workspace_records, "people": people_records, "users": user_records}
+
+
+def fix_tenant(users: int, workspaces: int, cloud_accounts: int, seed: int = SEED) -> list[FixUser]:
+    """Fix users that all own every workspace, each workspace with `cloud_accounts` linked cloud accounts."""
+    ids = SyntheticIds(seed)
+    fix_workspaces = []
+    for i in range(workspaces):
+        created_at = ids.timestamp()
+        workspace = FixWorkspace(
+            id=ids.uuid(),
+            slug=f"workspace-{i}",
+            name=f"Workspace {i}",
+            external_id=ids.uuid(),
+            tier="Free",
+            subscription_id=None,
+            payment_on_hold_since=None,
+            created_at=created_at,
+            updated_at=created_at,
+            owner_id=ids.uuid(),
+            highest_current_cycle_tier=None,
+            current_cycle_ends_at=None,
+            tier_updated_at=None,
+        )
+        for j in range(cloud_accounts):
+            workspace.cloud_accounts.append(
+                FixCloudAccount(
+                    id=ids.uuid(),
+                    tenant_id=workspace.id,
+                    cloud="aws",
+                    account_id=f"{i:06d}{j:06d}",
+                    aws_role_name=None,
+                    aws_external_id=None,
+                    is_configured=ids.random.random() < 0.5,
+                    enabled=True,
+                    privileged=False,
+                    user_account_name=None,
+                    api_account_name=None,
+                    api_account_alias=None,
+                    state=None,
+                    error=None,
+                    last_scan_duration_seconds=0,
+                    last_scan_started_at=None,
+                    last_scan_resources_scanned=ids.random.randrange(10_000),
+                    created_at=created_at,
+                    updated_at=created_at,
+                    state_updated_at=created_at,
+                    version_id=0,
+                    cf_stack_version=None,
+                    scan=True,
+                    failed_scan_count=0,
+                    gcp_service_account_key_id=None,
+                    last_task_id=None,
+                    azure_credential_id=None,
+                    last_scan_resources_errors=0,
+                    last_degraded_scan_started_at=None,
+                )
+            )
+        workspace.update_info()
+        fix_workspaces.append(workspace)
+    fix_users = []
+    for i in range(users):
+        created_at = ids.timestamp()
+        user = FixUser(
+            id=ids.uuid(),
+            email=f"user{i}@example.com",
+            hashed_password="",
+            is_active=True,
+            is_superuser=False,
+            is_verified=True,
+            otp_secret=None,
+            is_mfa_active=False,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        for workspace in fix_workspaces:
+            user.workspaces.append(workspace)
+            user.workspace_roles[workspace.id] = FixRoles.workspace_owner
+        fix_users.append(user)
+    return fix_users
+
+
+def attio_counterpart(ids: SyntheticIds, cls: type[AttioResource], values: dict[str, Any]) -> Any:
+    """The Attio record Attio would store for the values of an assert request."""
+    values = {
+        key: value if isinstance(value, list) else [value] if isinstance(value, dict) else [{"value": value}]
+        for key, value in values.items()
+    }
+    for attribute in ["product_tier", "status"]:
+        if attribute in values:
+            title = values[attribute][0]["value"]
+            values[attribute] = [{"option": {"title": title}, "status": {"title": title}}]
+    return cls.make(envelope(ids, ids.uuid(), values))
+
+
+def synced_users(users: int, workspaces: int, cloud_accounts: int = 1) -> list[tuple[FixUser, AttioUser]]:
+    """Fix users paired with the Attio users they were synced to."""
+    ids = SyntheticIds()
+    fix_users = fix_tenant(users, workspaces, cloud_accounts)
+    attio_workspaces = [
+        attio_counterpart(ids, AttioWorkspace, workspace.attio_data()["data"]["data"]["values"])
+        for workspace in fix_users[0].workspaces
+    ]
+    pairs = []
+    for user in fix_users:
+        user.last_active_at = ids.timestamp()
+        user.update_info()
+        attio_user = attio_counterpart(ids, AttioUser, user.attio_data()["data"]["data"]["values"])
+        for workspace in attio_workspaces:
+            attio_user.workspaces.add(workspace)
+        pairs.append((user, attio_user))
+    return pairs
+
+
+class OfflineAttioData(AttioData):
+    """AttioData serving synthetic records and acknowledging every write without network access."""
+
+    def __init__(self, records: dict[str, list[dict[str, Any]]]) -> None:
+        super().__init__("offline")
+        self.records = records
+
+    def _records(
+        self,
+        object_id: str,
+        filter: Optional[dict[str, Any]] = None,
+        attributes: Optional[frozenset[str]] = None,
+        with_text: bool = False,
+    ) -> list[dict[str, Any]]:
+        assert not with_text, "Records are marshalled in the main process"
+        records = self.records[object_id]
+        if filter is not None and "record_id" in filter:
+            record_ids = set(filter["record_id"]["$in"])
+            records = [record for record in records if record["id"]["record_id"] in record_ids]
+        elif filter is not None and "$or" in filter:
+            # people looked up by email are all linked to a user and hence already known
+            return []
+        return records
+
+    def _request(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[dict[str, Any]] = None,
+        params: Optional[dict[str, str]] = None,
+        timeout: int = 10,
+    ) -> dict[str, Any]:
+        return {}
+
+
+def synced_tenant(users: int, workspaces: int, cloud_accounts: int = 1) -> tuple[FixData, OfflineAttioData]:
+    """Fix data and the Attio data it was completely synced to, both loaded and linked."""
+    ids = SyntheticIds()
+    fix_users = fix_tenant(users, workspaces, cloud_accounts)
+    fix_workspaces = fix_users[0].workspaces
+    for workspace in fix_workspaces:
+        for user in fix_users:
+            workspace.users.append(user)
+            workspace.user_roles[user.id] = FixRoles.workspace_owner
+    attio_workspaces = [
+        attio_counterpart(ids, AttioWorkspace, workspace.attio_data()["data"]["data"]["values"])
+        for workspace in fix_workspaces
+    ]
+    people = []
+    attio_users = []
+    for user in fix_users:
+        user.last_active_at = ids.timestamp()
+        user.update_info()
+        person = attio_counterpart(ids, AttioPerson, user.attio_person()["data"]["data"]["values"])
+        attio_user = attio_counterpart(ids, AttioUser, user.attio_data()["data"]["data"]["values"])
+        attio_user.person_id = person.record_id
+        attio_user.workspace_refs = [workspace.record_id for workspace in attio_workspaces]
+        people.append(person)
+        attio_users.append(attio_user)
+    fix = FixData(db="", user="", password="")
+    fix.load(fix_workspaces, fix_users)
+    attio = OfflineAttioData({})
+    attio.load(attio_workspaces, people, attio_users)
+    return fix, attio
@@ -1,34 +1,207 @@
 import sys
-from .logger import add_args as logging_add_args, log
+from .logger import add_args as logging_add_args, setup_logger, log
 from .args import parse_args
-from .fixdata import FixData, add_args as fixdata_add_args
-from .attiodata import AttioData, add_args as attio_add_args
-from .sync import sync_fix_to_attio, add_args as sync_add_args
+from .fixdata import FixData, FixDataError, add_args as fixdata_add_args
+from .attiodata import AttioData, parse_attio_targets, add_args as attio_add_args
+from .concurrency import AdaptiveLimiter, CircuitBreaker, SharedRateLimit
+from .sync import hydrate_sources, sync_fix_to_targets, plan_sync, add_args as sync_add_args
+from .estimate import estimate_sync, log_estimate, add_args as estimate_add_args
+from .journal import SyncJournal, add_args as journal_add_args
+from .service import SyncService, add_args as service_add_args
+from .verify import verify_sample, log_verification, add_args as verify_add_args
+from .webhooks import WebhookReceiver, parse_webhook_secrets, add_args as webhooks_add_args
+from .snapshot import (
+    checkpoint_attio,
+    dump_snapshot,
+    load_attio_snapshot,
+    load_fix_snapshot,
+    restore_attio,
+    snapshot_targets,
+    add_args as snapshot_add_args,
+)
 
 
 def main() -> None:
-    args = parse_args([logging_add_args, attio_add_args, fixdata_add_args, sync_add_args])
-    if args.attio_api_key is None:
+    args = parse_args(
+        [
+            logging_add_args,
+            attio_add_args,
+            fixdata_add_args,
+            sync_add_args,
+            estimate_add_args,
+            verify_add_args,
+            journal_add_args,
+            service_add_args,
+            webhooks_add_args,
+            snapshot_add_args,
+        ]
+    )
+    setup_logger(
+        "fix",
+        force=False,
+        verbose=args.verbose,
+        quiet=args.quiet,
+        json_format=args.log_json,
+        sample_rate=args.log_sample_rate,
+        max_record_events=args.log_max_record_events,
+    )
+    if args.from_snapshot is not None:
+        plan_from_snapshot(args.from_snapshot)
+        sys.exit(0)
+    try:
+        attio_targets = parse_attio_targets(args.attio_api_keys)
+    except ValueError as e:
+        log.error(str(e))
+        sys.exit(1)
+    if len(attio_targets) == 0:
         log.error("Attio API key is required")
         sys.exit(1)
     if args.password is None:
         log.error("Database password is required")
         sys.exit(1)
+    if args.resume and args.journal is None:
+        log.error("--resume requires --journal")
+        sys.exit(1)
+    webhook_secrets = parse_webhook_secrets(args.attio_webhook_secrets)
+    unsigned = [name for name in attio_targets if not (webhook_secrets.get(name) or webhook_secrets.get(""))]
+    if args.serve and args.attio_webhooks and unsigned and not args.attio_webhooks_insecure:
+        log.error(f"--attio-webhooks requires a secret for {', '.join(unsigned)}, or --attio-webhooks-insecure")
+        sys.exit(1)
 
     exit_code = 0
     log.info("Starting Fix Attio Sync")
 
-    fix = FixData(db=args.db, user=args.user, password=args.password, host=args.host, port=args.port)
-    fix.hydrate()
+    fix = FixData(
+        db=args.db,
+        user=args.user,
+        password=args.password,
+        host=args.host,
+        port=args.port,
+        replica_host=args.replica_host,
+        replica_port=args.replica_port,
+        statement_timeout=args.statement_timeout,
+        pool_size=args.fix_pool_size,
+        max_retries=args.fix_max_retries,
+    )
+    targets = [
+        AttioData(
+            api_key,
+            rate_limit=args.attio_rate_limit,
+            limiter=AdaptiveLimiter(max_limit=args.attio_max_concurrency),
+            breaker=CircuitBreaker(threshold=args.attio_error_threshold / 100),
+            name=name,
+            marshal_workers=args.attio_marshal_workers,
+            shared_rate_limit=(
+                # Every Attio workspace has a quota of its own
+                SharedRateLimit(
+                    args.attio_rate_limit_file if len(attio_targets) == 1 else f"{args.attio_rate_limit_file}.{name}",
+                    args.attio_rate_limit,
+                )
+                if args.attio_rate_limit_file and args.attio_rate_limit
+                else None
+            ),
+        )
+        for name, api_key in attio_targets.items()
+    ]
+
+    if args.serve:
+        webhooks = (
+            WebhookReceiver(targets, webhook_secrets, insecure=args.attio_webhooks_insecure)
+            if args.attio_webhooks
+            else None
+        )
+        service = SyncService(
+            fix,
+            targets,
+            max_changes_percent=args.modification_threshold,
+            interval=args.sync_interval,
+            attio_resync_interval=args.attio_resync_interval,
+            fix_resync_interval=args.fix_resync_interval,
+            time_budget=args.time_budget,
+            webhooks=webhooks,
+        )
+        try:
+            service.serve(args.listen_address, args.listen_port)
+        except KeyboardInterrupt:
+            log.info("Received interrupt, shutting down")
+    else:
+        journals: dict[str, SyncJournal] = {}
+        if args.journal is not None and not args.estimate and args.verify_sample is None:
+            for attio in targets:
+                # With several targets, every target gets a journal of its own next to the configured path
+                path = args.journal if len(targets) == 1 else f"{args.journal}.{attio.name}"
+                journals[attio.name] = attio.journal = SyncJournal(path, resume=args.resume)
 
-    attio = AttioData(args.attio_api_key)
-    attio.hydrate()
+        try:
+            if args.verify_sample is not None:
+                # Attio is not hydrated, only the sampled records are fetched
+                fix.hydrate()
+                for attio in targets:
+                    if len(targets) > 1:
+                        log.info(f"Verification of {attio.name}:")
+                    log_verification(verify_sample(fix, attio, args.verify_sample))
+                fix.close()
+                sys.exit(exit_code)
+            # A resumed run starts from the Attio state its journal checkpointed, only Fix is read again
+            restored = {
+                attio.name
+                for attio in targets
+                if args.resume
+                and attio.name in journals
+                and restore_attio(journals[attio.name], attio, args.resume_max_age)
+            }
+            hydrate_sources(fix, [attio for attio in targets if attio.name not in restored])
+        except FixDataError as e:
+            log.fatal(str(e))
+            fix.close()
+            sys.exit(2)
+        except Exception as e:
+            log.fatal(f"Error fetching Attio data: {e}")
+            fix.close()
+            sys.exit(3)
+        for attio in targets:
+            if attio.name in journals and args.resume:
+                attio.replay_journal(journals[attio.name])
+            if attio.name in journals and attio.name not in restored:
+                checkpoint_attio(journals[attio.name], attio)
 
-    sync_fix_to_attio(fix, attio, max_changes_percent=args.modification_threshold)
+        if args.dump_snapshot is not None:
+            dump_snapshot(args.dump_snapshot, fix, targets)
+            fix.close()
+            sys.exit(exit_code)
 
+        if args.estimate:
+            for attio in targets:
+                if len(targets) > 1:
+                    log.info(f"Estimate for {attio.name}:")
+                log_estimate(estimate_sync(plan_sync(fix, attio), attio, concurrency=args.attio_max_concurrency))
+            fix.close()
+            sys.exit(exit_code)
+
+        results = sync_fix_to_targets(
+            fix, targets, max_changes_percent=args.modification_threshold, time_budget=args.time_budget
+        )
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                exit_code = 1
+            elif name in journals:
+                journals[name].complete()
+
+    fix.close()
     log.info("Shutdown complete")
     sys.exit(exit_code)
 
 
+def plan_from_snapshot(directory: str) -> None:
+    # Neither the database nor Attio are contacted, so no credentials are needed
+    log.info(f"Planning sync from snapshot {directory}")
+    fix = FixData(db="", user="", password="")
+    load_fix_snapshot(directory, fix)
+    for name in snapshot_targets(directory):
+        attio = AttioData("", name=name)
+        load_attio_snapshot(directory, attio)
+        log.info(f"Sync plan for {name}: {plan_sync(fix, attio).report()}")
+
+
 if __name__ == "__main__":
     main()
@@ -1,27 +1,96 @@
-import sys
 import os
-import requests
+import json
+import time
+import threading
 from uuid import UUID
-from typing import Union, Any, Optional
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from collections import deque
+from contextlib import AbstractContextManager, nullcontext
+from typing import Union, Any, Iterable, Iterator, Optional, TYPE_CHECKING
 from argparse import ArgumentParser
 from .logger import log
-from .attioresources import AttioWorkspace, AttioPerson, AttioUser
+from .attioresources import (
+    AttioWorkspace,
+    AttioPerson,
+    AttioUser,
+    FlatResources,
+    R,
+    flatten,
+    get_nested_field,
+    unflatten,
+)
+from .journal import SyncJournal
+from .concurrency import AdaptiveLimiter, CircuitBreaker, SharedRateLimit
+from .jsonstream import iter_array
+
+if TYPE_CHECKING:
+    import requests
+    from concurrent.futures import ProcessPoolExecutor
+
+
+# Max. number of values per query by attribute, e.g. email addresses per people query
+RECORDS_BY_ATTRIBUTE_CHUNK = 100
+# Bytes read from a streamed response at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+# Values written longer ago than this can't be from the write that returned them
+OWN_WRITE_MAX_AGE = timedelta(minutes=5)
+# Latencies kept per HTTP method for the mean latency
+LATENCY_WINDOW = 1_000
+# Records decoded per task when marshalling in worker processes
+MARSHAL_CHUNK_SIZE = 2_000
+
+
+class AttioDataError(Exception):
+    pass
 
 
 class AttioData:
-    def __init__(self, api_key: str, default_limit: int = 500):
+    def __init__(
+        self,
+        api_key: str,
+        default_limit: int = 500,
+        rate_limit: Optional[float] = None,
+        limiter: Optional[AdaptiveLimiter] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        max_retries: int = 2,
+        name: str = "attio",
+        shared_rate_limit: Optional[SharedRateLimit] = None,
+        marshal_workers: int = 0,
+    ):
         self.api_key = api_key
+        self.name = name
         self.base_url = "https://api.attio.com/v2/"
         self.default_limit = default_limit
+        self.rate_limit = rate_limit
+        self.shared_rate_limit = shared_rate_limit
+        # Id of the API token actor, learned from our own writes so that webhook events caused by them are skipped
+        self.api_actor_id: Optional[str] = None
+        self.marshal_workers = marshal_workers
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_retries = max_retries
         self.hydrated = False
+        self.journal: Optional[SyncJournal] = None
+        # Only recent requests, a service would otherwise collect latencies forever
+        self.latencies: dict[str, deque[float]] = {}
+        self.__rate_lock = threading.Lock()
+        self.__next_request_at = 0.0
         self.__workspaces: dict[UUID, AttioWorkspace] = {}
         self.__people: dict[UUID, AttioPerson] = {}
         self.__users: dict[UUID, AttioUser] = {}
+        self.__people_by_email: dict[str, AttioPerson] = {}
+        self.__store_lock = threading.RLock()
+        self.__object_slugs: dict[str, str] = {}
 
     def _headers(self, json: bool = False) -> dict[str, str]:
+        # Every compression urllib3 can decode, brotli only if a brotli package is installed
+        from urllib3.util.request import ACCEPT_ENCODING
+
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
         }
         if json:
             headers["Content-Type"] = "application/json"
@@ -36,6 +105,34 @@ class AttioData:
         params: Optional[dict[str, str]] = None,
         timeout: int = 10,
     ) -> dict[str, Any]:
+        response = self._send(method, endpoint, json=json, params=params, timeout=timeout)
+        return response.json()  # type: ignore
+
+    def _request_records(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[dict[str, Any]] = None,
+        params: Optional[dict[str, str]] = None,
+        timeout: int = 10,
+        with_text: bool = False,
+    ) -> Iterator[Any]:
+        """Yield the records of the response's data array as they are decoded, while the body is still arriving.
+
+        With `with_text` each record is yielded together with its JSON text, see `iter_array`.
+        """
+        with self._send(method, endpoint, json=json, params=params, timeout=timeout, stream=True) as response:
+            yield from iter_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), "data", with_text)
+
+    def _send(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[dict[str, Any]] = None,
+        params: Optional[dict[str, str]] = None,
+        timeout: int = 10,
+        stream: bool = False,
+    ) -> "requests.Response":
         url = self.base_url + endpoint
         headers = self._headers(json=bool(json))
 
@@ -47,13 +144,76 @@ class AttioData:
         }
         action_str = action_strings.get(method.upper(), f"Requesting data via {method} from")
 
-        log.debug(f"{action_str} {url}")
-        response = requests.request(method, url, headers=headers, json=json, params=params, timeout=timeout)
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_request()
+            self._throttle()
+            self.limiter.acquire()
+            log.debug("%s %s", action_str, url)
+            start = time.monotonic()
+            response: Optional["requests.Response"] = None
+            latency: Optional[float] = None
+            overloaded = False
+            try:
+                response = requests.request(
+                    method, url, headers=headers, json=json, params=params, timeout=timeout, stream=stream
+                )
+                latency = time.monotonic() - start
+                self.latencies.setdefault(method.upper(), deque(maxlen=LATENCY_WINDOW)).append(latency)
+                overloaded = response.status_code == 429 or response.status_code >= 500
+            except (requests.Timeout, requests.ConnectionError):
+                overloaded = True
+                if attempt == self.max_retries:
+                    raise
+            finally:
+                # Whatever happened, the slot must not leak
+                self.limiter.release(success=not overloaded, latency=latency)
+                self.breaker.record(success=not overloaded, sent_at=start)
+
+            if response is None:
+                # Timed out or the connection failed
+                self.__back_off(2**attempt)
+                continue
+            if response.status_code == 200:
+                return response
+            if not overloaded or attempt == self.max_retries:
+                break
+            response.close()
+            retry_after = response.headers.get("Retry-After", "")
+            self.__back_off(float(retry_after) if retry_after.isdigit() else 2**attempt)
+        assert response is not None
+        raise Exception(f"Error {action_str.lower()} {url}: {response.status_code} {response.text}")
+
+    def __back_off(self, delay: float) -> None:
+        # Other runs sharing the rate limit hold back as well
+        if self.shared_rate_limit is not None:
+            self.shared_rate_limit.pause(delay)
+        time.sleep(delay)
+
+    def _throttle(self) -> None:
+        if self.shared_rate_limit is not None:
+            wait = self.shared_rate_limit.reserve()
+        elif not self.rate_limit:
+            return
+        else:
+            with self.__rate_lock:
+                now = time.monotonic()
+                wait = self.__next_request_at - now
+                self.__next_request_at = max(now, self.__next_request_at) + 1 / self.rate_limit
+        if wait > 0:
+            time.sleep(wait)
 
-        if response.status_code == 200:
-            return response.json()  # type: ignore
+    def mean_latency(self, method: Optional[str] = None) -> Optional[float]:
+        if method is not None:
+            latencies = list(self.latencies.get(method.upper(), ()))
         else:
-            raise Exception(f"Error {action_str.lower()} {url}: {response.status_code} {response.text}")
+            latencies = [
+                latency for method_latencies in list(self.latencies.values()) for latency in list(method_latencies)
+            ]
+        if len(latencies) == 0:
+            return None
+        return sum(latencies) / len(latencies)
 
     def _delete_data(
         self,
@@ -63,6 +223,13 @@ class AttioData:
     ) -> dict[str, Any]:
         return self._request("DELETE", endpoint, json=json, params=params)
 
+    def _get_data(
+        self,
+        endpoint: str,
+        params: Optional[dict[str, str]] = None,
+    ) -> dict[str, Any]:
+        return self._request("GET", endpoint, params=params)
+
     def _post_data(
         self,
         endpoint: str,
@@ -79,81 +246,205 @@ class AttioData:
     ) -> dict[str, Any]:
         return self._request("PUT", endpoint, json=json, params=params)
 
-    def delete_record(self, object_id: str, record_id: UUID) -> dict[str, Any]:
-        endpoint = f"objects/{object_id}/records/{record_id}"
+    def __store(self, object_id: str) -> tuple[
+        Union[type[AttioPerson], type[AttioUser], type[AttioWorkspace]],
+        dict[UUID, Union[AttioPerson, AttioUser, AttioWorkspace]],
+    ]:
         match object_id:
             case "users":
-                self_store = self.__users
+                return AttioUser, self.__users  # type: ignore
             case "people":
-                self_store = self.__people  # type: ignore
+                return AttioPerson, self.__people  # type: ignore
             case "workspaces":
-                self_store = self.__workspaces  # type: ignore
+                return AttioWorkspace, self.__workspaces  # type: ignore
             case _:
                 raise ValueError(f"Unknown object_id: {object_id}")
 
+    def delete_record(self, object_id: str, record_id: UUID) -> dict[str, Any]:
+        endpoint = f"objects/{object_id}/records/{record_id}"
+        self.__store(object_id)
+
         response = self._delete_data(endpoint)
-        if record_id in self_store:
-            log.debug(f"Deleted {object_id} {record_id} in Attio, updating locally")
-            attio_obj = self_store[record_id]
-            if object_id == "users":
-                assert isinstance(attio_obj, AttioUser)
-                if attio_obj.person is not None:
-                    assert isinstance(attio_obj.person, AttioPerson)
-                    attio_obj.person.users.remove(attio_obj)
-                for workspace in attio_obj.workspaces:
-                    workspace.users.remove(attio_obj)
-            del self_store[record_id]
-        else:
+        if self.journal is not None:
+            self.journal.record_delete(object_id, record_id)
+        if not self.forget_record(object_id, record_id):
             log.error(f"Deleted {object_id} {record_id} in Attio, not found locally")
         return response
 
+    def person_in_use(self, person: AttioPerson) -> bool:
+        # Storing a user unlinks and re-links it, which must not look like the person lost its last user
+        with self.__store_lock:
+            return len(person.users) > 0
+
+    def forget_record(self, object_id: str, record_id: UUID) -> bool:
+        _, self_store = self.__store(object_id)
+        with self.__store_lock:
+            if record_id not in self_store:
+                return False
+            log.debug("Deleted %s %s in Attio, updating locally", object_id, record_id)
+            attio_obj = self_store[record_id]
+            if isinstance(attio_obj, AttioUser):
+                self.__unlink_user(attio_obj)
+            elif isinstance(attio_obj, AttioPerson):
+                self.__unindex_person(attio_obj)
+            del self_store[record_id]
+            return True
+
     def assert_record(
         self, object_id: str, matching_attribute: str, data: dict[str, Any]
     ) -> Union[AttioPerson, AttioUser, AttioWorkspace]:
         endpoint = f"objects/{object_id}/records"
         params = {"matching_attribute": matching_attribute}
-        attio_cls: Union[type[AttioPerson], type[AttioUser], type[AttioWorkspace]]
-        match object_id:
-            case "users":
-                attio_cls = AttioUser
-                self_store = self.__users
-            case "people":
-                attio_cls = AttioPerson
-                self_store = self.__people  # type: ignore
-            case "workspaces":
-                attio_cls = AttioWorkspace
-                self_store = self.__workspaces  # type: ignore
-            case _:
-                raise ValueError(f"Unknown object_id: {object_id}")
+        self.__store(object_id)
 
         response = self._put_data(endpoint, params=params, json=data)
 
         if response.get("data", []):
-            attio_obj = attio_cls.make(response["data"])
-            log.debug(f"Asserted {object_id} {attio_obj} in Attio, updating locally")
-            self_store[attio_obj.record_id] = attio_obj  # type: ignore
-            return attio_obj
+            self.__learn_actor(response["data"])
+            if self.journal is not None:
+                self.journal.record_assert(object_id, matching_key(matching_attribute, data), response["data"])
+            return self.store_record(object_id, response["data"])
         else:
             raise RuntimeError(f"Error asserting {object_id} in Attio: {response}")
 
-    def _records(self, object_id: str) -> list[dict[str, Any]]:
+    def __learn_actor(self, data: dict[str, Any]) -> None:
+        # The most recent values of an asserted record are the ones we just wrote, created by our API token
+        values = [value for values in data.get("values", {}).values() for value in values if isinstance(value, dict)]
+        latest = max(values, key=lambda value: value.get("active_from") or "", default=None)
+        if latest is None or not latest.get("active_from"):
+            return
+        actor = latest.get("created_by_actor") or {}
+        active_from = datetime.fromisoformat(latest["active_from"].replace("Z", "+00:00"))
+        if actor.get("type") == "api-token" and datetime.now(timezone.utc) - active_from < OWN_WRITE_MAX_AGE:
+            self.api_actor_id = actor.get("id")
+
+    def store_record(self, object_id: str, data: dict[str, Any]) -> Union[AttioPerson, AttioUser, AttioWorkspace]:
+        attio_cls, self_store = self.__store(object_id)
+        attio_obj = attio_cls.make(data)
+        log.debug("Asserted %s %s in Attio, updating locally", object_id, attio_obj)
+        with self.__store_lock:
+            previous = self_store.get(attio_obj.record_id)
+            self_store[attio_obj.record_id] = attio_obj
+            if isinstance(attio_obj, AttioUser):
+                if isinstance(previous, AttioUser):
+                    self.__unlink_user(previous)
+                self.__link_user(attio_obj)
+            elif isinstance(attio_obj, AttioPerson):
+                if isinstance(previous, AttioPerson):
+                    self.__unindex_person(previous)
+                    attio_obj.users = previous.users
+                    for user in attio_obj.users:
+                        user.person = attio_obj
+                self.__index_person(attio_obj)
+            elif isinstance(previous, AttioWorkspace):
+                attio_obj.users = previous.users
+                for user in attio_obj.users:
+                    user.workspaces.add(attio_obj)
+            return attio_obj
+
+    def object_slug(self, object_id: str) -> str:
+        """Api slug of an Attio object, webhook events identify objects by their id only."""
+        slug = self.__object_slugs.get(object_id)
+        if slug is None:
+            response = self._get_data(f"objects/{object_id}")
+            slug = self.__object_slugs[object_id] = response["data"]["api_slug"]
+        return slug
+
+    def refresh_record(self, object_id: str, record_id: UUID) -> bool:
+        """Re-fetch a record that changed in Attio and update it like hydrate() would, True if anything changed."""
+        attio_cls, self_store = self.__store(object_id)
+        if attio_cls is AttioPerson and record_id not in self_store:
+            # Like in hydrate(), only people linked to a user are kept
+            if not any(user.person_id == record_id for user in self.users):
+                return False
+        response = self._get_data(f"objects/{object_id}/records/{record_id}")
+        data = response["data"]
+        data["values"] = {k: v for k, v in data.get("values", {}).items() if k in attio_cls.attributes}
+        if not all(data["values"].get(attribute) for attribute in attio_cls.query_filter or {}):
+            # No longer matches the hydration filter (only $not_empty conditions), e.g. its Fix id was removed
+            return self.forget_record(object_id, record_id)
+        attio_obj = self.store_record(object_id, data)
+        if isinstance(attio_obj, AttioUser) and attio_obj.person is None and attio_obj.person_id is not None:
+            # A person created along with the user wasn't known yet
+            if self.refresh_record("people", attio_obj.person_id):
+                with self.__store_lock:
+                    self.__link_user(attio_obj)
+        return True
+
+    def replay_journal(self, journal: SyncJournal) -> None:
+        if not self.hydrated:
+            self.hydrate()
+        for entry in journal.entries:
+            match entry["operation"]:
+                case "assert":
+                    self.store_record(entry["object_id"], entry["data"])
+                case "delete":
+                    self.forget_record(entry["object_id"], UUID(entry["key"]))
+        log.info(f"Replayed {len(journal.entries)} journaled operations")
+
+    def _records(
+        self,
+        object_id: str,
+        filter: Optional[dict[str, Any]] = None,
+        attributes: Optional[frozenset[str]] = None,
+        with_text: bool = False,
+    ) -> Iterator[Any]:
+        """Yield the records of an object as soon as they are decoded, page after page.
+
+        With `with_text` the records are yielded as tuples of the record and its JSON text, which isn't projected
+        to `attributes`.
+        """
         log.debug(f"Fetching {object_id}")
         endpoint = f"objects/{object_id}/records/query"
-        all_data = []
+        found = 0
+        # Keyset pagination: pages are sorted by creation time and continue at the last timestamp seen, so that
+        # records created or deleted during the scan don't shift pages and the server never scans a large offset.
+        # Records sharing the last timestamp are fetched again and dropped, an offset is only needed to get past
+        # a page full of records created at the same time. Only ids created at that timestamp are kept to drop them.
+        seen: set[str] = set()
+        cursor: Optional[str] = None
         offset = 0
 
         while True:
-            params = {"limit": self.default_limit, "offset": offset}
-            response_data = self._post_data(endpoint, params)
-            data = response_data.get("data", [])
-            all_data.extend(data)
+            page_filter = filter
+            if cursor is not None:
+                cursor_filter = {"created_at": {"$gte": cursor}}
+                page_filter = cursor_filter if filter is None else {"$and": [filter, cursor_filter]}
+            params: dict[str, Any] = {
+                "limit": self.default_limit,
+                "offset": offset,
+                "sorts": [{"attribute": "created_at", "direction": "asc"}],
+            }
+            if page_filter is not None:
+                params["filter"] = page_filter
+            page_size = 0
+            last_created_at = None
+            for item in self._request_records("POST", endpoint, json=params, with_text=with_text):
+                record = item[0] if with_text else item
+                page_size += 1
+                if record["created_at"] != last_created_at and record["created_at"] != cursor:
+                    # Records created earlier than this one can't be fetched again
+                    seen.clear()
+                last_created_at = record["created_at"]
+                record_id = record["id"]["record_id"]
+                if record_id in seen:
+                    continue
+                seen.add(record_id)
+                if attributes is not None and not with_text:
+                    # The query endpoint can't project attributes, so drop the ones we don't use before decoding
+                    record["values"] = {k: v for k, v in record.get("values", {}).items() if k in attributes}
+                found += 1
+                yield item
 
-            if len(data) < self.default_limit:
+            if page_size < self.default_limit:
                 break
 
-            offset += self.default_limit
-        log.debug(f"Found {len(all_data)} {object_id} in Attio")
-        return all_data
+            if last_created_at == cursor:
+                offset += page_size
+            else:
+                cursor = last_created_at
+                offset = 0
+        log.debug(f"Found {found} {object_id} in Attio")
 
     @property
     def workspaces(self) -> list[AttioWorkspace]:
@@ -173,41 +464,191 @@ class AttioData:
             self.hydrate()
         return list(self.__users.values())
 
+    def person_by_email(self, email: str) -> Optional[AttioPerson]:
+        if not self.hydrated:
+            self.hydrate()
+        return self.__people_by_email.get(email.lower())
+
+    def _records_by_id(
+        self,
+        object_id: str,
+        record_ids: set[UUID],
+        attributes: Optional[frozenset[str]] = None,
+        with_text: bool = False,
+    ) -> Iterator[Any]:
+        record_id_list = sorted(str(record_id) for record_id in record_ids)
+        for i in range(0, len(record_id_list), self.default_limit):
+            chunk = record_id_list[i : i + self.default_limit]
+            yield from self._records(object_id, {"record_id": {"$in": chunk}}, attributes, with_text)
+
+    def _records_by_attribute(
+        self, object_id: str, attribute: str, values: list[str], attributes: Optional[frozenset[str]] = None
+    ) -> Iterator[dict[str, Any]]:
+        """Records of which the attribute equals one of the values, e.g. the users with the given user_ids."""
+        for i in range(0, len(values), RECORDS_BY_ATTRIBUTE_CHUNK):
+            value_filter = {"$or": [{attribute: value} for value in values[i : i + RECORDS_BY_ATTRIBUTE_CHUNK]]}
+            yield from self._records(object_id, value_filter, attributes)
+
+    def load_people(self, emails: set[str]) -> None:
+        """Fetch people not referenced by any user, so that they are found by `person_by_email`."""
+        if not self.hydrated:
+            self.hydrate()
+        unknown = sorted(email.lower() for email in emails if email.lower() not in self.__people_by_email)
+        for record in self._records_by_attribute("people", "email_addresses", unknown, AttioPerson.attributes):
+            self.store_record("people", record)
+
     def hydrate(self) -> None:
         log.debug("Hydrating Attio data")
-        self.__workspaces = self.__marshal(self._records("workspaces"), AttioWorkspace)  # type: ignore
-        self.__people = self.__marshal(self._records("people"), AttioPerson)  # type: ignore
-        self.__users = self.__marshal(self._records("users"), AttioUser)  # type: ignore
-        self.__connect()
-        if len(self.__workspaces) == 0 or len(self.__people) == 0 or len(self.__users) == 0:
-            log.fatal("No data found in Attio")
-            sys.exit(3)
+        with self.__marshal_pool() as pool:
+            # Worker processes are sent the JSON text of the records, decoding it again is cheaper than pickling
+            with_text = pool is not None
+            workspaces = self.__marshal(
+                self._records("workspaces", AttioWorkspace.query_filter, AttioWorkspace.attributes, with_text),
+                AttioWorkspace,
+                pool,
+            )
+            users = self.__marshal(
+                self._records("users", AttioUser.query_filter, AttioUser.attributes, with_text), AttioUser, pool
+            )
+            # Only people that are linked to a user matter, others are fetched by email when needed
+            person_ids = {user.person_id for user in users if user.person_id is not None}
+            people = self.__marshal(
+                self._records_by_id("people", person_ids, AttioPerson.attributes, with_text), AttioPerson, pool
+            )
+        self.load(workspaces, people, users)
+
+    def load(self, workspaces: list[AttioWorkspace], people: list[AttioPerson], users: list[AttioUser]) -> None:
+        """Replace the local state with the given records and link them."""
+        with self.__store_lock:
+            self.__workspaces = {workspace.record_id: workspace for workspace in workspaces}
+            self.__people = {person.record_id: person for person in people}
+            self.__users = {user.record_id: user for user in users}
+            self.__people_by_email = {}
+            for person in self.__people.values():
+                self.__index_person(person)
+            self.__connect()
+        if len(self.__workspaces) == 0 or len(self.__users) == 0:
+            raise AttioDataError(f"No data found in Attio workspace {self.name}")
         self.hydrated = True
 
     def __connect(self) -> None:
         for user in self.__users.values():
-            if user.person_id in self.__people:
-                person = self.__people[user.person_id]
-                person.users.append(user)
-                user.person = person
-            if user.workspace_refs is not None and len(user.workspace_refs) > 0:
-                for workspace_ref in user.workspace_refs:
-                    if workspace_ref in self.__workspaces:
-                        workspace = self.__workspaces[workspace_ref]
-                        workspace.users.append(user)
-                        user.workspaces.append(workspace)
-
-    def __marshal(
-        self, data: list[dict[str, Any]], cls: Union[type[AttioWorkspace], type[AttioPerson], type[AttioUser]]
-    ) -> dict[UUID, Union[AttioWorkspace, AttioPerson, AttioUser]]:
-        ret = {}
-        for item in data:
-            obj = cls.make(item)
-            ret[obj.record_id] = obj
-        return ret
+            self.__link_user(user)
+
+    def __link_user(self, user: AttioUser) -> None:
+        if user.person_id in self.__people:
+            person = self.__people[user.person_id]
+            person.users.add(user)
+            user.person = person
+        if user.workspace_refs is not None and len(user.workspace_refs) > 0:
+            for workspace_ref in user.workspace_refs:
+                if workspace_ref in self.__workspaces:
+                    workspace = self.__workspaces[workspace_ref]
+                    workspace.users.add(user)
+                    user.workspaces.add(workspace)
+
+    def __unlink_user(self, user: AttioUser) -> None:
+        if user.person is not None:
+            assert isinstance(user.person, AttioPerson)
+            user.person.users.discard(user)
+        for workspace in user.workspaces:
+            workspace.users.discard(user)
+
+    def __index_person(self, person: AttioPerson) -> None:
+        if person.email is not None:
+            self.__people_by_email[person.email.lower()] = person
+
+    def __unindex_person(self, person: AttioPerson) -> None:
+        if person.email is not None and self.__people_by_email.get(person.email.lower()) is person:
+            del self.__people_by_email[person.email.lower()]
+
+    def __marshal_pool(self) -> AbstractContextManager[Optional["ProcessPoolExecutor"]]:
+        if self.marshal_workers < 1:
+            return nullcontext()
+        from multiprocessing import get_context
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Hydration runs in a thread next to others, forking a multi-threaded process isn't safe
+        return ProcessPoolExecutor(self.marshal_workers, mp_context=get_context("spawn"))
+
+    def __marshal(self, data: Iterable[Any], cls: type[R], pool: Optional["ProcessPoolExecutor"] = None) -> list[R]:
+        if pool is None:
+            return [cls.make(item) for item in data]
+        # Chunks are decoded by the workers while the next pages are still being fetched. Records travel as JSON
+        # text and come back flattened: unpickling the resources themselves would cost about as much as make().
+        texts = (text for _, text in data)
+        futures = []
+        while chunk := list(islice(texts, MARSHAL_CHUNK_SIZE)):
+            futures.append(pool.submit(make_flat, cls, chunk))
+        uuids: dict[int, UUID] = {}
+        return [resource for future in futures for resource in unflatten(cls, future.result(), uuids)]
+
+
+def make_flat(cls: type[R], texts: list[str]) -> FlatResources:
+    return flatten([cls.make(json.loads(text)) for text in texts])
+
+
+def matching_key(matching_attribute: str, data: dict[str, Any]) -> str:
+    values = data["data"]["values"]
+    if matching_attribute == "email_addresses":
+        return str(get_nested_field(values, matching_attribute, ["email_address"])).lower()
+    return str(values.get(matching_attribute))
+
+
+def parse_attio_targets(api_keys: Optional[list[str]]) -> dict[str, str]:
+    """Maps target names to API keys, from `--api-key` or the comma separated ATTIO_API_KEY."""
+    if not api_keys:
+        api_keys = [key.strip() for key in os.environ.get("ATTIO_API_KEY", "").split(",") if key.strip()]
+    targets = {}
+    for position, api_key in enumerate(api_keys, start=1):
+        name, separator, key = api_key.partition("=")
+        if not separator or not name.replace("-", "_").isidentifier():
+            name, key = ("attio" if len(api_keys) == 1 else f"attio{position}"), api_key
+        if name in targets:
+            raise ValueError(f"Attio target {name} configured more than once")
+        targets[name] = key
+    return targets
 
 
 def add_args(arg_parser: ArgumentParser) -> None:
     arg_parser.add_argument(
-        "--api-key", dest="attio_api_key", help="Attio API Key", default=os.environ.get("ATTIO_API_KEY", None)
+        "--api-key",
+        dest="attio_api_keys",
+        help="Attio API Key, optionally named like `sales=<key>` - repeat to sync to several Attio workspaces",
+        action="append",
+        default=None,
+    )
+    arg_parser.add_argument(
+        "--attio-rate-limit",
+        dest="attio_rate_limit",
+        help="Max. Attio API requests per second (default: 25)",
+        type=float,
+        default=float(os.environ.get("ATTIO_RATE_LIMIT", 25)),
+    )
+    arg_parser.add_argument(
+        "--attio-rate-limit-file",
+        dest="attio_rate_limit_file",
+        help="Share the Attio rate limit with other runs on this host that use the same file",
+        default=os.environ.get("ATTIO_RATE_LIMIT_FILE"),
+    )
+    arg_parser.add_argument(
+        "--attio-max-concurrency",
+        dest="attio_max_concurrency",
+        help="Max. concurrent Attio API requests, adjusted automatically below this (default: 8)",
+        type=int,
+        default=int(os.environ.get("ATTIO_MAX_CONCURRENCY", 8)),
+    )
+    arg_parser.add_argument(
+        "--attio-marshal-workers",
+        dest="attio_marshal_workers",
+        help="Processes decoding Attio records during hydration, 0 decodes them in the main process (default: 0)",
+        type=int,
+        default=int(os.environ.get("ATTIO_MARSHAL_WORKERS", 0)),
+    )
+    arg_parser.add_argument(
+        "--attio-error-threshold",
+        dest="attio_error_threshold",
+        help="Attio error rate in percent that pauses the run (default: 50)",
+        type=float,
+        default=float(os.environ.get("ATTIO_ERROR_THRESHOLD", 50)),
     )
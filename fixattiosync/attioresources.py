@@ -1,11 +1,13 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from datetime import datetime
+from itertools import repeat
+from operator import itemgetter
 from uuid import UUID
-from typing import Optional, Self, Type, ClassVar, Any
-from enum import Enum
+from typing import Optional, Self, Type, ClassVar, Any, Generic, TypeVar, Iterable, Iterator, Sequence
 from .logger import log
+from .mapping import MappedResource, WORKSPACE_MAPPING, USER_MAPPING, optional_uuid
 
 
 def get_nested_field(values_dict: dict[str, Any], key: str, field_path: list[str], default: Any = None) -> Any:
@@ -21,19 +23,53 @@ def get_nested_field(values_dict: dict[str, Any], key: str, field_path: list[str
     return default
 
 
-def optional_uuid(value: str) -> Optional[UUID]:
-    uuid = None
-    try:
-        uuid = UUID(value)
-    except (ValueError, TypeError):
-        pass
-    return uuid
+R = TypeVar("R", bound="AttioResource")
+
+
+class RecordSet(Generic[R]):
+    """Insertion ordered set of Attio records keyed by record id, with O(1) add and remove."""
+
+    __slots__ = ("__records",)
+
+    def __init__(self, records: Iterable[R] = ()) -> None:
+        self.__records: dict[UUID, R] = {record.record_id: record for record in records}
+
+    def add(self, record: R) -> None:
+        self.__records[record.record_id] = record
+
+    def remove(self, record: R) -> None:
+        del self.__records[record.record_id]
+
+    def discard(self, record: R) -> None:
+        self.__records.pop(record.record_id, None)
+
+    def __contains__(self, record: object) -> bool:
+        return isinstance(record, AttioResource) and record.record_id in self.__records
+
+    def __iter__(self) -> Iterator[R]:
+        return iter(self.__records.values())
+
+    def __len__(self) -> int:
+        return len(self.__records)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, RecordSet):
+            return NotImplemented
+        return self.__records.keys() == other.__records.keys()
+
+    def __repr__(self) -> str:
+        # Records reference each other, only print their ids
+        return f"RecordSet({[str(record_id) for record_id in self.__records]})"
 
 
 @dataclass
 class AttioResource(ABC):
     matching_attribute: ClassVar[str] = "record_id"
     api_object: ClassVar[str] = ""
+    # Attribute values decoded by make(), all others are dropped after fetching
+    attributes: ClassVar[frozenset[str]] = frozenset()
+    # Server side filter selecting the records relevant to the sync
+    query_filter: ClassVar[Optional[dict[str, Any]]] = None
 
     object_id: UUID
     record_id: UUID
@@ -46,10 +82,13 @@ class AttioResource(ABC):
         pass
 
 
-@dataclass
-class AttioWorkspace(AttioResource):
+@dataclass(eq=False)
+class AttioWorkspace(MappedResource, AttioResource):
     matching_attribute: ClassVar[str] = "workspace_id"
     api_object: ClassVar[str] = "workspaces"
+    mapping = WORKSPACE_MAPPING
+    attributes: ClassVar[frozenset[str]] = frozenset(attribute.attio for attribute in WORKSPACE_MAPPING.attributes)
+    query_filter: ClassVar[Optional[dict[str, Any]]] = {"workspace_id": {"$not_empty": True}}
 
     id: Optional[UUID]
     name: Optional[str]
@@ -57,23 +96,7 @@ class AttioWorkspace(AttioResource):
     status: Optional[str]
     fix_workspace_id: Optional[UUID]
     cloud_account_connected: Optional[bool]
-    users: list[AttioUser] = field(default_factory=list)
-
-    def __eq__(self: Self, other: Any) -> bool:
-        if (
-            not hasattr(other, "id")
-            or not hasattr(other, "tier")
-            or not hasattr(other, "cloud_account_connected")
-            or not hasattr(other, "status")
-            or not isinstance(other.status, Enum)
-        ):
-            return False
-        return bool(
-            self.id == other.id
-            and self.tier == other.tier
-            and self.status == other.status.value
-            and self.cloud_account_connected == other.cloud_account_connected
-        )
+    users: RecordSet[AttioUser] = field(default_factory=RecordSet)
 
     @classmethod
     def make(cls: Type[Self], data: dict[str, Any]) -> Self:
@@ -82,44 +105,33 @@ class AttioWorkspace(AttioResource):
         workspace_id = UUID(data["id"]["workspace_id"])
         created_at = datetime.fromisoformat(data["created_at"].rstrip("Z"))
 
-        values = data.get("values", {})
-
-        name = get_nested_field(values, "name", ["value"])
-        product_tier = get_nested_field(values, "product_tier", ["option", "title"])
-        status = get_nested_field(values, "status", ["status", "title"])
-        fix_workspace_id = optional_uuid(str(get_nested_field(values, "workspace_id", ["value"])))
-        if fix_workspace_id is None:
+        values = WORKSPACE_MAPPING.decode(data.get("values", {}))
+        if values["id"] is None:
             log.error(f"Fix workspace ID not found for {record_id}: {data}")
-        cloud_account_connected = get_nested_field(values, "cloud_account_connected", ["value"])
-
-        cls_data = {
-            "id": fix_workspace_id,
-            "object_id": object_id,
-            "record_id": record_id,
-            "workspace_id": workspace_id,
-            "created_at": created_at,
-            "name": name,
-            "tier": product_tier,
-            "status": status,
-            "fix_workspace_id": fix_workspace_id,
-            "cloud_account_connected": cloud_account_connected,
-        }
 
-        return cls(**cls_data)
+        workspace = cls(
+            object_id=object_id,
+            record_id=record_id,
+            workspace_id=workspace_id,
+            created_at=created_at,
+            fix_workspace_id=values["id"],
+            **values,
+        )
+        workspace.normalize()
+        return workspace
 
 
 @dataclass
 class AttioPerson(AttioResource):
     matching_attribute: ClassVar[str] = "email_addresses"
     api_object: ClassVar[str] = "people"
+    attributes: ClassVar[frozenset[str]] = frozenset({"name", "email_addresses"})
 
     full_name: Optional[str]
     first_name: Optional[str]
     last_name: Optional[str]
     email: Optional[str]
-    linkedin: Optional[str]
-    job_title: Optional[str]
-    users: list[AttioUser] = field(default_factory=list)
+    users: RecordSet[AttioUser] = field(default_factory=RecordSet)
 
     @classmethod
     def make(cls: Type[Self], data: dict[str, Any]) -> Self:
@@ -134,8 +146,6 @@ class AttioPerson(AttioResource):
         first_name = get_nested_field(values, "name", ["first_name"])
         last_name = get_nested_field(values, "name", ["last_name"])
         email_address = get_nested_field(values, "email_addresses", ["email_address"])
-        job_title = get_nested_field(values, "job_title", ["value"])
-        linkedin = get_nested_field(values, "linkedin", ["value"])
 
         cls_data = {
             "object_id": object_id,
@@ -146,17 +156,20 @@ class AttioPerson(AttioResource):
             "first_name": first_name,
             "last_name": last_name,
             "email": email_address,
-            "job_title": job_title,
-            "linkedin": linkedin,
         }
 
         return cls(**cls_data)
 
 
-@dataclass
-class AttioUser(AttioResource):
+@dataclass(eq=False)
+class AttioUser(MappedResource, AttioResource):
     matching_attribute: ClassVar[str] = "user_id"
     api_object: ClassVar[str] = "users"
+    mapping = USER_MAPPING
+    attributes: ClassVar[frozenset[str]] = frozenset(
+        {attribute.attio for attribute in USER_MAPPING.attributes} | {"status", "person"}
+    )
+    query_filter: ClassVar[Optional[dict[str, Any]]] = {"user_id": {"$not_empty": True}}
 
     id: Optional[UUID]
     demo_workspace_viewed: Optional[bool]
@@ -168,49 +181,13 @@ class AttioUser(AttioResource):
     person_id: Optional[UUID]
     workspace_refs: Optional[list[UUID]] = None
     person: Optional[AttioPerson] = None
-    workspaces: list[AttioWorkspace] = field(default_factory=list)
+    workspaces: RecordSet[AttioWorkspace] = field(default_factory=RecordSet)
     user_email_notifications_disabled: Optional[bool] = None
     at_least_one_cloud_account_connected: Optional[bool] = None
     is_main_user_in_at_least_one_workspace: Optional[bool] = None
     cloud_account_connected_workspace_name: Optional[str] = None
     workspace_has_subscription: Optional[bool] = None
 
-    def __eq__(self: Self, other: Any) -> bool:
-        if (
-            not hasattr(other, "id")
-            or not hasattr(other, "email")
-            or not hasattr(other, "registered_at")
-            or not isinstance(self.registered_at, datetime)
-            or not isinstance(other.registered_at, datetime)
-            or not hasattr(other, "workspaces")
-            or not isinstance(other.workspaces, list)
-            or not hasattr(other, "last_active_at")
-            or not hasattr(other, "user_email_notifications_disabled")
-            or not hasattr(other, "at_least_one_cloud_account_connected")
-            or not hasattr(other, "is_main_user_in_at_least_one_workspace")
-            or not hasattr(other, "cloud_account_connected_workspace_name")
-            or not hasattr(other, "workspace_has_subscription")
-        ):
-            return False
-        self_last_active_at = None
-        other_last_active_at = None
-        if self.last_active_at is not None:
-            self_last_active_at = self.last_active_at.astimezone(timezone.utc)
-        if other.last_active_at is not None:
-            other_last_active_at = other.last_active_at.astimezone(timezone.utc)
-        return bool(
-            self.id == other.id
-            and str(self.email).lower() == str(other.email).lower()
-            and self.registered_at.astimezone(timezone.utc) == other.registered_at.astimezone(timezone.utc)
-            and {w.id for w in self.workspaces} == {w.id for w in other.workspaces}
-            and self.user_email_notifications_disabled == other.user_email_notifications_disabled
-            and self.at_least_one_cloud_account_connected == other.at_least_one_cloud_account_connected
-            and self.is_main_user_in_at_least_one_workspace == other.is_main_user_in_at_least_one_workspace
-            and self.cloud_account_connected_workspace_name == other.cloud_account_connected_workspace_name
-            and self.workspace_has_subscription == other.workspace_has_subscription
-            and self_last_active_at == other_last_active_at
-        )
-
     @classmethod
     def make(cls: Type[Self], data: dict[str, Any]) -> Self:
         object_id = UUID(data["id"]["object_id"])
@@ -218,62 +195,107 @@ class AttioUser(AttioResource):
         workspace_id = UUID(data["id"]["workspace_id"])
         created_at = datetime.fromisoformat(data["created_at"])
 
-        values = data.get("values", {})
-
-        registered_at = get_nested_field(values, "registered_at", ["value"])
-        if registered_at:
-            registered_at = datetime.fromisoformat(registered_at).replace(microsecond=0)
-
-        last_active_at = get_nested_field(values, "last_activity_3", ["value"])
-        if last_active_at:
-            last_active_at = datetime.fromisoformat(last_active_at).replace(microsecond=0)
-
-        primary_email_address = get_nested_field(values, "primary_email_address", ["email_address"])
-        status = get_nested_field(values, "status", ["status", "title"])
-        user_id = optional_uuid(str(get_nested_field(values, "user_id", ["value"])))
-        person_id = optional_uuid(str(get_nested_field(values, "person", ["target_record_id"])))
-        user_email_notifications_disabled = get_nested_field(values, "user_email_notifications_disabled", ["value"])
-        at_least_one_cloud_account_connected = get_nested_field(
-            values, "at_least_one_cloud_account_connected", ["value"]
-        )
-        is_main_user_in_at_least_one_workspace = get_nested_field(
-            values, "is_main_user_in_at_least_one_workspace", ["value"]
-        )
-        cloud_account_connected_workspace_name = get_nested_field(
-            values, "cloud_account_connected_workspace_name", ["value"]
-        )
-        workspace_has_subscription = get_nested_field(values, "workspace_has_subscription", ["value"])
-
-        if user_id is None:
+        raw_values = data.get("values", {})
+        values = USER_MAPPING.decode(raw_values)
+        if values["id"] is None:
             log.error(f"Fix user ID not found for {record_id}: {data}")
 
-        workspace_refs = None
-        workspace_info = values.get("workspace", [])
-        for workspace in workspace_info:
-            workspace_ref = optional_uuid(str(workspace.get("target_record_id")))
+        workspace_refs: Optional[list[UUID]] = None
+        for workspace in raw_values.get("workspace", []):
             if workspace_refs is None:
                 workspace_refs = []
-            workspace_refs.append(workspace_ref)
-
-        cls_data = {
-            "object_id": object_id,
-            "record_id": record_id,
-            "workspace_id": workspace_id,
-            "id": user_id,
-            "created_at": created_at,
-            "demo_workspace_viewed": None,
-            "email": primary_email_address,
-            "registered_at": registered_at,
-            "last_active_at": last_active_at,
-            "status": status,
-            "user_id": user_id,
-            "person_id": person_id,
-            "workspace_refs": workspace_refs,
-            "user_email_notifications_disabled": user_email_notifications_disabled,
-            "at_least_one_cloud_account_connected": at_least_one_cloud_account_connected,
-            "is_main_user_in_at_least_one_workspace": is_main_user_in_at_least_one_workspace,
-            "cloud_account_connected_workspace_name": cloud_account_connected_workspace_name,
-            "workspace_has_subscription": workspace_has_subscription,
-        }
-
-        return cls(**cls_data)
+            workspace_ref = optional_uuid(workspace.get("target_record_id"))
+            if workspace_ref is not None:
+                workspace_refs.append(workspace_ref)
+
+        user = cls(
+            object_id=object_id,
+            record_id=record_id,
+            workspace_id=workspace_id,
+            created_at=created_at,
+            demo_workspace_viewed=None,
+            status=get_nested_field(raw_values, "status", ["status", "title"]),
+            user_id=values["id"],
+            person_id=optional_uuid(get_nested_field(raw_values, "person", ["target_record_id"])),
+            workspace_refs=workspace_refs,
+            **values,
+        )
+        user.normalize()
+        return user
+
+
+# Resources in columns of primitive values, which are a lot cheaper to unpickle than UUIDs and dataclasses:
+# the names of the fields, how each field is encoded and the values of each field
+FlatResources = tuple[tuple[str, ...], tuple[str, ...], list[list[Any]]]
+
+
+def flat_kind(column: Sequence[Any]) -> str:
+    values = [value for value in column if value is not None]
+    if len(values) == 0:
+        return "value"
+    if all(isinstance(value, UUID) for value in values):
+        return "uuid"
+    if all(isinstance(value, list) and all(isinstance(item, UUID) for item in value) for value in values):
+        return "uuids"
+    if all(isinstance(value, RecordSet) and len(value) == 0 for value in values):
+        return "set"
+    return "value"
+
+
+def flatten(resources: Sequence[AttioResource]) -> FlatResources:
+    """Flatten resources of one type for `unflatten`, UUIDs become ints and empty record sets are dropped.
+
+    The normalized values of mapped resources are a cache and recomputed by `unflatten` instead.
+    """
+    if len(resources) == 0:
+        return (), (), []
+    names = tuple(name for name in vars(resources[0]) if name != "_value_keys")
+    fields = itemgetter(*names)
+    columns = [list(column) for column in zip(*(fields(vars(resource)) for resource in resources))]
+    kinds = tuple(flat_kind(column) for column in columns)
+    for i, kind in enumerate(kinds):
+        if kind == "uuid":
+            columns[i] = [None if value is None else value.int for value in columns[i]]
+        elif kind == "uuids":
+            columns[i] = [None if value is None else [item.int for item in value] for value in columns[i]]
+        elif kind == "set":
+            columns[i] = []
+    return names, kinds, columns
+
+
+def unflatten(cls: type[R], flat: FlatResources, uuids: Optional[dict[int, UUID]] = None) -> list[R]:
+    """The resources flattened by `flatten`, equal UUIDs are shared by way of `uuids`."""
+    names, kinds, columns = flat
+    if uuids is None:
+        uuids = {}
+
+    def intern(values: Iterable[Optional[int]]) -> None:
+        for value in set(values).difference(uuids):
+            if value is not None:
+                uuids[value] = UUID(int=value)
+
+    values: list[Iterable[Any]] = list(columns)
+    sets = []
+    for i, (name, kind) in enumerate(zip(names, kinds)):
+        if kind == "uuid":
+            intern(columns[i])
+            values[i] = [None if value is None else uuids[value] for value in columns[i]]
+        elif kind == "uuids":
+            intern(item for value in columns[i] if value is not None for item in value)
+            values[i] = [None if value is None else [uuids[item] for item in value] for value in columns[i]]
+        elif kind == "set":
+            sets.append(name)
+            values[i] = repeat(None)
+    normalize = issubclass(cls, MappedResource)
+    resources = []
+    for row in zip(*values):
+        data = dict(zip(names, row))
+        for name in sets:
+            data[name] = RecordSet()
+        # Bypasses __init__ like unpickling does, all fields are set from the row
+        resource = object.__new__(cls)
+        object.__setattr__(resource, "__dict__", data)
+        if normalize:
+            resource.normalize()  # type: ignore
+        resources.append(resource)
+    return resources
@@ -0,0 +1,165 @@
+import os
+import math
+import time
+import struct
+import threading
+from collections import deque
+from typing import Callable, Optional
+from .logger import log
+
+SLOT = struct.Struct("<d")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class AdaptiveLimiter:
+    """Limits in-flight requests, growing the limit additively while healthy and shrinking it multiplicatively."""
+
+    def __init__(
+        self,
+        initial_limit: float = 2,
+        min_limit: float = 1,
+        max_limit: float = 8,
+        latency_target: float = 2.0,
+        decrease_factor: float = 0.5,
+    ) -> None:
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self.__condition = threading.Condition()
+
+    def acquire(self) -> None:
+        with self.__condition:
+            while self.in_flight >= int(self.limit):
+                self.__condition.wait()
+            self.in_flight += 1
+
+    def release(self, success: bool, latency: Optional[float] = None) -> None:
+        with self.__condition:
+            self.in_flight -= 1
+            if not success:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                log.debug(f"Attio is overloaded, reducing concurrency to {int(self.limit)}")
+            elif latency is None or latency <= self.latency_target:
+                # grows by roughly one for every `limit` healthy requests
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.__condition.notify_all()
+
+
+class CircuitBreaker:
+    """Fails fast once the error rate over the last `window` requests crosses `threshold`."""
+
+    def __init__(self, threshold: float = 0.5, window: int = 20, cooldown: float = 30.0, max_trips: int = 3) -> None:
+        self.threshold = threshold
+        self.window = window
+        self.cooldown = cooldown
+        self.max_trips = max_trips
+        self.trips = 0
+        self.opened_at: Optional[float] = None
+        self.__outcomes: deque[bool] = deque(maxlen=window)
+        self.__changed_at = -math.inf
+        self.__lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    @property
+    def exhausted(self) -> bool:
+        return self.trips >= self.max_trips
+
+    def before_request(self) -> None:
+        if self.is_open:
+            raise CircuitOpenError(f"Circuit breaker open after {self.trips} trips, not sending requests to Attio")
+
+    def record(self, success: bool, sent_at: Optional[float] = None) -> None:
+        """Record the outcome of a request sent at `sent_at` (monotonic, default: now)."""
+        sent_at = time.monotonic() if sent_at is None else sent_at
+        with self.__lock:
+            # Requests that were in flight when the state changed tell nothing about the new state
+            if sent_at < self.__changed_at:
+                return
+            if self.opened_at is not None:
+                if sent_at < self.opened_at + self.cooldown:
+                    return
+                # first request after the cooldown decides whether the circuit closes again
+                if success:
+                    log.info("Attio recovered, closing circuit breaker")
+                    self.opened_at = None
+                    self.trips = 0
+                    self.__outcomes.clear()
+                    self.__changed_at = time.monotonic()
+                else:
+                    self.__trip()
+                return
+            self.__outcomes.append(success)
+            failures = self.__outcomes.count(False)
+            if len(self.__outcomes) >= self.window and failures / len(self.__outcomes) >= self.threshold:
+                self.__trip()
+
+    def reset(self) -> None:
+        """Forget all trips, e.g. at the start of a new sync run."""
+        with self.__lock:
+            self.opened_at = None
+            self.trips = 0
+            self.__outcomes.clear()
+            self.__changed_at = time.monotonic()
+
+    def wait(self) -> None:
+        if self.opened_at is not None:
+            remaining = self.cooldown - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                log.warning(f"Circuit breaker open, pausing for {remaining:.0f}s")
+                time.sleep(remaining)
+
+    def __trip(self) -> None:
+        self.trips += 1
+        self.opened_at = self.__changed_at = time.monotonic()
+        self.__outcomes.clear()
+        log.error(f"Attio error rate above {self.threshold:.0%}, opening circuit breaker (trip {self.trips})")
+
+
+class SharedRateLimit:
+    """Spaces requests `1 / rate` seconds apart across all processes on this host that use the same file.
+
+    The file holds the wall clock time the next request may be sent at. Every request reserves the next free slot
+    under an exclusive lock, so concurrent runs against the same Attio workspace take turns instead of each sending
+    at the full rate.
+    """
+
+    def __init__(self, path: str, rate: float) -> None:
+        self.path = path
+        self.rate = rate
+        self.__fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        # flock() doesn't exclude threads sharing the file descriptor
+        self.__lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Reserve the next slot, returns the seconds to wait for it."""
+        return self.__update(lambda now, next_at: max(now, next_at) + 1 / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every process sharing the limit, e.g. after Attio answered with 429."""
+        self.__update(lambda now, next_at: max(next_at, now + seconds))
+
+    def close(self) -> None:
+        os.close(self.__fd)
+
+    def __update(self, schedule: Callable[[float, float], float]) -> float:
+        import fcntl
+
+        with self.__lock:
+            fcntl.flock(self.__fd, fcntl.LOCK_EX)
+            try:
+                data = os.pread(self.__fd, SLOT.size, 0)
+                next_at = SLOT.unpack(data)[0] if len(data) == SLOT.size else 0.0
+                now = time.time()
+                os.pwrite(self.__fd, SLOT.pack(schedule(now, next_at)), 0)
+            finally:
+                fcntl.flock(self.__fd, fcntl.LOCK_UN)
+        return next_at - now
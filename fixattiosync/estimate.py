@@ -0,0 +1,107 @@
+import math
+from dataclasses import dataclass, field
+from argparse import ArgumentParser
+from typing import Optional
+from .logger import log
+from .attiodata import AttioData, RECORDS_BY_ATTRIBUTE_CHUNK
+from .attioresources import AttioPerson
+from .sync import SyncPlan, change_percentages
+
+# Assumed per request latency in seconds when no request has been observed yet.
+DEFAULT_LATENCY = 0.5
+
+
+@dataclass
+class SyncEstimate:
+    calls: dict[str, int] = field(default_factory=dict)
+    latency: float = DEFAULT_LATENCY
+    rate_limit: Optional[float] = None
+    concurrency: int = 1
+    min_required_threshold: int = 0
+
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+    @property
+    def seconds_per_call(self) -> float:
+        seconds = self.latency / self.concurrency
+        if self.rate_limit:
+            seconds = max(seconds, 1 / self.rate_limit)
+        return seconds
+
+    @property
+    def wall_time(self) -> float:
+        return self.total_calls * self.seconds_per_call
+
+
+def estimate_sync(plan: SyncPlan, attio: AttioData, concurrency: int = 1) -> SyncEstimate:
+    # The sync looks up the people of new users by email, in the same chunks and with the same pagination
+    unresolved = sorted(
+        {user.email.lower() for user in plan.users_missing if attio.person_by_email(user.email) is None}
+    )
+    attio.load_people(set(unresolved))
+    people_queries = 0
+    for i in range(0, len(unresolved), RECORDS_BY_ATTRIBUTE_CHUNK):
+        found = sum(
+            attio.person_by_email(email) is not None for email in unresolved[i : i + RECORDS_BY_ATTRIBUTE_CHUNK]
+        )
+        people_queries += found // attio.default_limit + 1
+    people_emails = set()
+    for user in plan.users_missing:
+        email = user.email.lower()
+        if attio.person_by_email(email) is None:
+            people_emails.add(email)
+
+    obsolete_user_ids = {id(user) for user in plan.users_obsolete}
+    missing_emails = {user.email.lower() for user in plan.users_missing}
+    people_to_delete: dict[int, AttioPerson] = {}
+    for attio_user in plan.users_obsolete:
+        person = attio_user.person
+        if person is None or not all(id(user) in obsolete_user_ids for user in person.users):
+            continue
+        # Like in the sync, a new user with the same email takes over the person, which then isn't deleted
+        if person.email and person.email.lower() in missing_emails:
+            continue
+        people_to_delete[id(person)] = person
+
+    calls = {
+        "POST people query": people_queries,
+        "PUT workspaces": len(plan.workspaces_missing) + len(plan.workspaces_outdated),
+        "PUT people": len(people_emails),
+        "PUT users": len(plan.users_missing) + len(plan.users_outdated),
+        "DELETE workspaces": len(plan.workspaces_obsolete),
+        "DELETE users": len(plan.users_obsolete),
+        "DELETE people": len(people_to_delete),
+    }
+    latency = attio.mean_latency()
+    return SyncEstimate(
+        calls=calls,
+        latency=latency if latency is not None else DEFAULT_LATENCY,
+        rate_limit=attio.rate_limit,
+        concurrency=concurrency,
+        min_required_threshold=math.ceil(max(change_percentages(plan, attio))),
+    )
+
+
+def log_estimate(estimate: SyncEstimate) -> None:
+    log.info("Estimated Attio API calls:")
+    for endpoint, count in estimate.calls.items():
+        log.info(f"  {endpoint}: {count}")
+    log.info(f"  Total: {estimate.total_calls}")
+    rate_limit = f"{estimate.rate_limit:g}/s" if estimate.rate_limit else "unlimited"
+    log.info(
+        f"Estimated wall time: {estimate.wall_time:.0f}s"
+        f" (latency {estimate.latency * 1000:.0f}ms, rate limit {rate_limit}, concurrency {estimate.concurrency})"
+    )
+    log.info(f"Required modification threshold: {estimate.min_required_threshold}%")
+
+
+def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--estimate",
+        dest="estimate",
+        help="Only estimate the API calls and runtime of a sync, don't apply any changes",
+        action="store_true",
+        default=False,
+    )
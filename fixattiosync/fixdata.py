@@ -1,26 +1,68 @@
+from __future__ import annotations
 import os
-import sys
-import psycopg
-from psycopg.rows import dict_row
+import time
 from uuid import UUID
+from datetime import datetime, timedelta
 from argparse import ArgumentParser
 from .logger import log
 from .fixresources import FixUser, FixWorkspace, FixCloudAccount, FixRoles, FixUserNotificationSettings
-from typing import Optional
+from typing import Any, Callable, Iterable, LiteralString, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import psycopg
+    from psycopg_pool import ConnectionPool
+
+
+# Rows changed this long before the last read are read again by a refresh: a transaction that was still running
+# during the last read stamps its rows with its start time
+REFRESH_OVERLAP = timedelta(minutes=10)
+
+Roles = dict[UUID, dict[UUID, FixRoles]]
+
+
+class FixDataError(Exception):
+    pass
 
 
 class FixData:
-    def __init__(self, db: str, user: str, password: str, host: str = "localhost", port: int = 5432) -> None:
+    def __init__(
+        self,
+        db: str,
+        user: str,
+        password: str,
+        host: str = "localhost",
+        port: int = 5432,
+        replica_host: Optional[str] = None,
+        replica_port: Optional[int] = None,
+        statement_timeout: float = 60.0,
+        pool_size: int = 2,
+        max_retries: int = 3,
+    ) -> None:
         self.db = db
         self.user = user
         self.password = password
         self.host = host
         self.port = port
-        self.conn: Optional[psycopg.Connection] = None
+        self.replica_host = replica_host
+        self.replica_port = replica_port
+        self.statement_timeout = statement_timeout
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.pool: Optional[ConnectionPool[psycopg.Connection[Any]]] = None
         self.hydrated = False
         self.__workspaces: dict[UUID, FixWorkspace] = {}
         self.__users: dict[UUID, FixUser] = {}
         self.__cloud_accounts: dict[UUID, FixCloudAccount] = {}
+        # What the resources are built from, so that a refresh only rebuilds the resources affected by changed rows
+        self.__user_rows: dict[UUID, dict[str, Any]] = {}
+        self.__workspace_rows: dict[UUID, dict[str, Any]] = {}
+        self.__notification_settings: dict[UUID, FixUserNotificationSettings] = {}
+        self.__workspace_cloud_accounts: dict[UUID, dict[UUID, FixCloudAccount]] = {}
+        self.__roles_by_user: Roles = {}
+        self.__roles_by_workspace: Roles = {}
+        self.__owners: dict[UUID, UUID] = {}
+        # Database time of the last read, the watermark of the next refresh
+        self.__read_at: Optional[datetime] = None
 
     @property
     def users(self) -> list[FixUser]:
@@ -35,92 +77,294 @@ class FixData:
         return list(self.__workspaces.values())
 
     def connect(self) -> None:
-        log.debug(f"Connecting to database {self.db} on {self.host}:{self.port} as {self.user}")
-        if self.conn is None:
-            try:
-                self.conn = psycopg.connect(
-                    dbname=self.db, user=self.user, password=self.password, host=self.host, port=self.port
-                )
-                log.debug("Connection successful")
-            except psycopg.DatabaseError as e:
-                log.error(f"Error connecting to the database: {e}")
-                sys.exit(2)
+        from psycopg.conninfo import make_conninfo
+        from psycopg_pool import ConnectionPool
 
-    def hydrate(self) -> None:
-        if self.conn is None:
-            self.connect()
+        if self.pool is not None:
+            return
+        # The sync only reads, so with a replica configured the primary is never touched
+        host, port = self.host, self.port
+        if self.replica_host is not None:
+            host, port = self.replica_host, self.replica_port or self.port
+        log.debug(f"Connecting to database {self.db} on {host}:{port} as {self.user}")
+        conninfo = make_conninfo(dbname=self.db, user=self.user, password=self.password, host=host, port=port)
+        self.pool = ConnectionPool(
+            conninfo, min_size=1, max_size=self.pool_size, configure=self.__configure, open=False, name="fix"
+        )
+        self.pool.open()
+
+    def __configure(self, conn: psycopg.Connection[Any]) -> None:
+        # All queries of a hydration see the same snapshot, and nothing can be written by accident
+        from psycopg import IsolationLevel
 
+        conn.isolation_level = IsolationLevel.REPEATABLE_READ
+        conn.read_only = True
+
+    def hydrate(self) -> None:
         log.debug("Hydrating Fix database data")
-        if self.conn is not None:
+        self.__read(self.__load)
+
+    def refresh(self) -> None:
+        """Read only the rows changed since the last read and rebuild the resources affected by them.
+
+        Users, workspaces, cloud accounts and notification settings are read by their timestamps, deletions of any
+        of them are found by their ids. Roles and owners have no timestamps, these narrow tables are read in full
+        and compared.
+        """
+        if not self.hydrated or self.__read_at is None:
+            self.hydrate()
+            return
+        log.debug("Refreshing Fix database data")
+        self.__read(self.__load_changes)
+
+    def __read(self, load: Callable[[psycopg.Connection[Any]], None]) -> None:
+        import psycopg
+
+        self.connect()
+        assert self.pool is not None
+
+        for attempt in range(self.max_retries + 1):
             try:
-                with self.conn.cursor(row_factory=dict_row) as cursor:
-                    cursor.execute('SELECT * FROM public."user" WHERE is_active=true;')
-                    rows = cursor.fetchall()
-                    for row in rows:
-                        user = FixUser(**row)
-                        self.__users[user.id] = user
-                with self.conn.cursor(row_factory=dict_row) as cursor:
-                    cursor.execute('SELECT * FROM public."organization";')
-                    rows = cursor.fetchall()
-                    for row in rows:
-                        workspace = FixWorkspace(**row)
-                        self.__workspaces[workspace.id] = workspace
-                with self.conn.cursor(row_factory=dict_row) as cursor:
-                    cursor.execute('SELECT * FROM public."user_role_assignment";')
-                    rows = cursor.fetchall()
-                    for row in rows:
-                        if row["user_id"] not in self.__users or row["workspace_id"] not in self.__workspaces:
-                            continue
-                        user = self.__users[row["user_id"]]
-                        workspace = self.__workspaces[row["workspace_id"]]
-                        roles = FixRoles(row["role_names"])
-                        user.workspaces.append(workspace)
-                        workspace.users.append(user)
-                        user.workspace_roles[workspace.id] = roles
-                        workspace.user_roles[user.id] = roles
-                with self.conn.cursor(row_factory=dict_row) as cursor:
-                    cursor.execute('SELECT * FROM public."organization_owners";')
-                    rows = cursor.fetchall()
-                    for row in rows:
-                        self.__workspaces[row["organization_id"]].owner = self.__users[row["user_id"]]
-                with self.conn.cursor(row_factory=dict_row) as cursor:
-                    cursor.execute('SELECT * FROM public."user_notification_settings";')
-                    rows = cursor.fetchall()
-                    for row in rows:
-                        if row["user_id"] in self.__users:
-                            user = self.__users[row["user_id"]]
-                            user.notification_settings = FixUserNotificationSettings(**row)
-                with self.conn.cursor(row_factory=dict_row) as cursor:
-                    cursor.execute('SELECT * FROM public."cloud_account";')
-                    rows = cursor.fetchall()
-                    for row in rows:
-                        cloud_account = FixCloudAccount(**row)
-                        self.__cloud_accounts[cloud_account.id] = cloud_account
-                        if cloud_account.tenant_id in self.__workspaces:
-                            self.__workspaces[cloud_account.tenant_id].cloud_accounts.append(cloud_account)
-                        else:
-                            log.error(f"Data error: cloud account {cloud_account.id} does not have a workspace")
-                for workspace in self.__workspaces.values():
-                    workspace.update_info()
-                for user in self.__users.values():
-                    user.update_info()
+                with self.pool.connection() as conn:
+                    load(conn)
+                break
+            except psycopg.OperationalError as e:
+                # Lost connections, statement timeouts and replica recovery conflicts are worth another try
+                if attempt == self.max_retries:
+                    raise FixDataError(f"Error fetching data: {e}") from e
+                log.warning(f"Transient error fetching data, retrying: {e}")
+                time.sleep(2**attempt)
             except psycopg.Error as e:
-                log.error(f"Error fetching data: {e}")
-                sys.exit(2)
-            finally:
-                self.close()
-            log.debug(f"Found {len(self.__workspaces)} workspaces in database")
-            log.debug(f"Found {len(self.__users)} users in database")
-            log.debug(f"Found {len(self.__cloud_accounts)} cloud accounts in database")
-            if len(self.__users) == 0 or len(self.__workspaces) == 0:
-                log.fatal("No data found in Fix database")
-                sys.exit(2)
-            self.hydrated = True
+                raise FixDataError(f"Error fetching data: {e}") from e
+        log.debug(f"Found {len(self.__workspaces)} workspaces in database")
+        log.debug(f"Found {len(self.__users)} users in database")
+        log.debug(f"Found {len(self.__cloud_accounts)} cloud accounts in database")
+        if len(self.__users) == 0 or len(self.__workspaces) == 0:
+            raise FixDataError("No data found in Fix database")
+        self.hydrated = True
+
+    def load(self, workspaces: list[FixWorkspace], users: list[FixUser]) -> None:
+        """Replace the local state with already linked workspaces and users, e.g. from a snapshot."""
+        self.__workspaces = {workspace.id: workspace for workspace in workspaces}
+        self.__users = {user.id: user for user in users}
+        self.__cloud_accounts = {}
+        # Nothing was read from the database, a refresh has to read everything
+        self.__read_at = None
+        self.hydrated = True
+
+    def _fetch(
+        self, conn: psycopg.Connection[Any], query: LiteralString, params: Optional[dict[str, Any]] = None
+    ) -> list[dict[str, Any]]:
+        from psycopg import sql
+        from psycopg.rows import dict_row
+
+        timeout_ms = int(self.statement_timeout * 1000)
+        with conn.cursor(row_factory=dict_row) as cursor:
+            cursor.execute(sql.SQL("SET LOCAL statement_timeout = {}").format(timeout_ms))
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def __ids(self, conn: psycopg.Connection[Any], query: LiteralString, column: str = "id") -> set[UUID]:
+        return {row[column] for row in self._fetch(conn, query)}
+
+    def __load(self, conn: psycopg.Connection[Any]) -> None:
+        with conn.transaction():
+            read_at = self._fetch(conn, "SELECT now() AS now;")[0]["now"]
+            users = self._fetch(conn, 'SELECT * FROM public."user" WHERE is_active=true ORDER BY id;')
+            workspaces = self._fetch(conn, 'SELECT * FROM public."organization" ORDER BY id;')
+            roles = self._fetch(conn, 'SELECT * FROM public."user_role_assignment";')
+            owners = self._fetch(conn, 'SELECT * FROM public."organization_owners";')
+            notification_settings = self._fetch(conn, 'SELECT * FROM public."user_notification_settings";')
+            cloud_accounts = self._fetch(conn, 'SELECT * FROM public."cloud_account";')
+        self.__user_rows = {row["id"]: row for row in users}
+        self.__workspace_rows = {row["id"]: row for row in workspaces}
+        self.__roles_by_user, self.__roles_by_workspace = index_roles(roles)
+        self.__owners = {row["organization_id"]: row["user_id"] for row in owners}
+        self.__notification_settings = {
+            row["user_id"]: FixUserNotificationSettings(**row) for row in notification_settings
+        }
+        self.__cloud_accounts = {}
+        self.__workspace_cloud_accounts = {}
+        for row in cloud_accounts:
+            self.__add_cloud_account(FixCloudAccount(**row))
+        self.__users = {}
+        self.__workspaces = {}
+        self.__rebuild(self.__user_rows, self.__workspace_rows)
+        self.__read_at = read_at
+
+    def __load_changes(self, conn: psycopg.Connection[Any]) -> None:
+        assert self.__read_at is not None
+        since = {"since": self.__read_at - REFRESH_OVERLAP}
+        with conn.transaction():
+            read_at = self._fetch(conn, "SELECT now() AS now;")[0]["now"]
+            users = self._fetch(
+                conn,
+                'SELECT * FROM public."user" WHERE updated_at >= %(since)s OR last_active >= %(since)s;',
+                params=since,
+            )
+            user_ids = self.__ids(conn, 'SELECT id FROM public."user" WHERE is_active=true;')
+            workspaces = self._fetch(
+                conn, 'SELECT * FROM public."organization" WHERE updated_at >= %(since)s;', params=since
+            )
+            workspace_ids = self.__ids(conn, 'SELECT id FROM public."organization";')
+            roles = self._fetch(conn, 'SELECT * FROM public."user_role_assignment";')
+            owners = self._fetch(conn, 'SELECT * FROM public."organization_owners";')
+            notification_settings = self._fetch(
+                conn, 'SELECT * FROM public."user_notification_settings" WHERE updated_at >= %(since)s;', params=since
+            )
+            notification_settings_ids = self.__ids(
+                conn, 'SELECT user_id FROM public."user_notification_settings";', "user_id"
+            )
+            cloud_accounts = self._fetch(
+                conn,
+                'SELECT * FROM public."cloud_account" WHERE updated_at >= %(since)s OR state_updated_at >= %(since)s;',
+                params=since,
+            )
+            cloud_account_ids = self.__ids(conn, 'SELECT id FROM public."cloud_account";')
+
+        changed_users = {row["id"] for row in users if row["is_active"]}
+        changed_workspaces = {row["id"] for row in workspaces}
+        changed_cloud_accounts = {row["id"] for row in cloud_accounts}
+        changed_notification_settings = {row["user_id"] for row in notification_settings}
+        if (
+            user_ids - changed_users - self.__user_rows.keys()
+            or workspace_ids - changed_workspaces - self.__workspace_rows.keys()
+            or cloud_account_ids - changed_cloud_accounts - self.__cloud_accounts.keys()
+            or notification_settings_ids - changed_notification_settings - self.__notification_settings.keys()
+        ):
+            log.info("Rows appeared without a newer timestamp, reading all Fix data again")
+            self.__load(conn)
+            return
+
+        dirty_users: set[UUID] = set()
+        dirty_workspaces: set[UUID] = set()
+        for row in users:
+            if row["is_active"]:
+                self.__user_rows[row["id"]] = row
+            else:
+                self.__user_rows.pop(row["id"], None)
+            dirty_users.add(row["id"])
+        for user_id in self.__user_rows.keys() - user_ids:
+            del self.__user_rows[user_id]
+            dirty_users.add(user_id)
+        for row in workspaces:
+            self.__workspace_rows[row["id"]] = row
+            dirty_workspaces.add(row["id"])
+        for workspace_id in self.__workspace_rows.keys() - workspace_ids:
+            del self.__workspace_rows[workspace_id]
+            dirty_workspaces.add(workspace_id)
+        for row in notification_settings:
+            self.__notification_settings[row["user_id"]] = FixUserNotificationSettings(**row)
+            dirty_users.add(row["user_id"])
+        for user_id in self.__notification_settings.keys() - notification_settings_ids:
+            del self.__notification_settings[user_id]
+            dirty_users.add(user_id)
+        for row in cloud_accounts:
+            cloud_account = FixCloudAccount(**row)
+            if cloud_account.id in self.__cloud_accounts:
+                dirty_workspaces.add(self.__remove_cloud_account(cloud_account.id).tenant_id)
+            self.__add_cloud_account(cloud_account)
+            dirty_workspaces.add(cloud_account.tenant_id)
+        for cloud_account_id in self.__cloud_accounts.keys() - cloud_account_ids:
+            dirty_workspaces.add(self.__remove_cloud_account(cloud_account_id).tenant_id)
+
+        # Users and workspaces whose links changed, the users depend on their roles and need to be rebuilt
+        relink: set[UUID] = set()
+        old_by_user, old_by_workspace = self.__roles_by_user, self.__roles_by_workspace
+        self.__roles_by_user, self.__roles_by_workspace = index_roles(roles)
+        for user_id in old_by_user.keys() | self.__roles_by_user.keys():
+            old_roles, new_roles = old_by_user.get(user_id, {}), self.__roles_by_user.get(user_id, {})
+            if old_roles != new_roles:
+                dirty_users.add(user_id)
+        old_owners, self.__owners = self.__owners, {row["organization_id"]: row["user_id"] for row in owners}
+        relink.update(w for w in old_owners.keys() | self.__owners.keys() if old_owners.get(w) != self.__owners.get(w))
+        # Users depend on their workspaces, and rebuilt users are linked into all their workspaces
+        for workspace_id in dirty_workspaces:
+            dirty_users.update(old_by_workspace.get(workspace_id, {}), self.__roles_by_workspace.get(workspace_id, {}))
+        for user_id in dirty_users:
+            relink.update(old_by_user.get(user_id, {}), self.__roles_by_user.get(user_id, {}))
+
+        self.__rebuild(dirty_users, dirty_workspaces, relink)
+        self.__read_at = read_at
+        log.debug(
+            f"Rebuilt {len(dirty_users)} users and {len(dirty_workspaces)} workspaces changed since {since['since']}"
+        )
+
+    def __add_cloud_account(self, cloud_account: FixCloudAccount) -> None:
+        self.__cloud_accounts[cloud_account.id] = cloud_account
+        if cloud_account.tenant_id not in self.__workspace_rows:
+            log.error(f"Data error: cloud account {cloud_account.id} does not have a workspace")
+        self.__workspace_cloud_accounts.setdefault(cloud_account.tenant_id, {})[cloud_account.id] = cloud_account
+
+    def __remove_cloud_account(self, cloud_account_id: UUID) -> FixCloudAccount:
+        cloud_account = self.__cloud_accounts.pop(cloud_account_id)
+        self.__workspace_cloud_accounts[cloud_account.tenant_id].pop(cloud_account_id)
+        return cloud_account
+
+    def __rebuild(self, user_ids: Iterable[UUID], workspace_ids: Iterable[UUID], relink: Iterable[UUID] = ()) -> None:
+        """Build the given users and workspaces from their rows again, or drop them if their rows are gone.
+
+        Workspaces in `relink` and those rebuilt are linked to the current users. All users of rebuilt workspaces
+        have to be rebuilt as well, they are linked to the workspaces.
+        """
+        user_ids, workspace_ids = list(user_ids), list(workspace_ids)
+        for workspace_id in workspace_ids:
+            workspace_row = self.__workspace_rows.get(workspace_id)
+            if workspace_row is None:
+                self.__workspaces.pop(workspace_id, None)
+                continue
+            workspace = FixWorkspace(**workspace_row)
+            workspace.cloud_accounts = list(self.__workspace_cloud_accounts.get(workspace_id, {}).values())
+            self.__workspaces[workspace_id] = workspace
+        for user_id in user_ids:
+            user_row = self.__user_rows.get(user_id)
+            if user_row is None:
+                self.__users.pop(user_id, None)
+                continue
+            user = FixUser(**user_row)
+            user.notification_settings = self.__notification_settings.get(user_id)
+            for workspace_id, roles in self.__roles_by_user.get(user_id, {}).items():
+                if workspace_id in self.__workspaces:
+                    user.workspaces.append(self.__workspaces[workspace_id])
+                    user.workspace_roles[workspace_id] = roles
+            self.__users[user_id] = user
+        for workspace_id in dict.fromkeys([*workspace_ids, *relink]):
+            if workspace_id not in self.__workspaces:
+                continue
+            workspace = self.__workspaces[workspace_id]
+            workspace.users = []
+            workspace.user_roles = {}
+            for user_id, roles in self.__roles_by_workspace.get(workspace_id, {}).items():
+                if user_id in self.__users:
+                    workspace.users.append(self.__users[user_id])
+                    workspace.user_roles[user_id] = roles
+            owner_id = self.__owners.get(workspace_id)
+            workspace.owner = None if owner_id is None else self.__users.get(owner_id)
+        for workspace_id in workspace_ids:
+            if workspace_id in self.__workspaces:
+                self.__workspaces[workspace_id].update_info()
+                self.__workspaces[workspace_id].normalize()
+        for user_id in user_ids:
+            if user_id in self.__users:
+                self.__users[user_id].update_info()
+                self.__users[user_id].normalize()
 
     def close(self) -> None:
-        if self.conn is not None:
-            log.debug("Closing database connection")
-            self.conn.close()
+        if self.pool is not None:
+            log.debug("Closing database connections")
+            self.pool.close()
+            self.pool = None
+
+
+def index_roles(rows: list[dict[str, Any]]) -> tuple[Roles, Roles]:
+    """The roles of role assignment rows by user and workspace, and by workspace and user."""
+    by_user: Roles = {}
+    by_workspace: Roles = {}
+    for row in rows:
+        roles = FixRoles(row["role_names"])
+        by_user.setdefault(row["user_id"], {})[row["workspace_id"]] = roles
+        by_workspace.setdefault(row["workspace_id"], {})[row["user_id"]] = roles
+    return by_user, by_workspace
 
 
 def add_args(arg_parser: ArgumentParser) -> None:
@@ -138,3 +382,37 @@ def add_args(arg_parser: ArgumentParser) -> None:
     arg_parser.add_argument(
         "--port", dest="port", help="Database port", default=os.environ.get("PGPORT", 5432), type=int
     )
+    arg_parser.add_argument(
+        "--replica-host",
+        dest="replica_host",
+        help="Read replica host, used instead of --host when set",
+        default=os.environ.get("PGREPLICAHOST", None),
+    )
+    arg_parser.add_argument(
+        "--replica-port",
+        dest="replica_port",
+        help="Read replica port (default: --port)",
+        default=os.environ.get("PGREPLICAPORT", None),
+        type=int,
+    )
+    arg_parser.add_argument(
+        "--statement-timeout",
+        dest="statement_timeout",
+        help="Max. seconds a database query may run (default: 60)",
+        default=float(os.environ.get("FIX_STATEMENT_TIMEOUT", 60)),
+        type=float,
+    )
+    arg_parser.add_argument(
+        "--fix-pool-size",
+        dest="fix_pool_size",
+        help="Max. database connections (default: 2)",
+        default=int(os.environ.get("FIX_POOL_SIZE", 2)),
+        type=int,
+    )
+    arg_parser.add_argument(
+        "--fix-max-retries",
+        dest="fix_max_retries",
+        help="Retries of a database read after a transient error (default: 3)",
+        default=int(os.environ.get("FIX_MAX_RETRIES", 3)),
+        type=int,
+    )
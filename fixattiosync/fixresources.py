@@ -1,14 +1,17 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from datetime import datetime, timezone
+from datetime import datetime
 from uuid import UUID
 from typing import Optional, Self, Any
 from enum import Enum, IntFlag
 from .attioresources import AttioPerson, AttioWorkspace
+from .mapping import MappedResource, WORKSPACE_MAPPING, USER_MAPPING
 
 
-@dataclass
-class FixUser:
+@dataclass(eq=False)
+class FixUser(MappedResource):
+    mapping = USER_MAPPING
+
     id: UUID
     email: str
     hashed_password: str
@@ -38,41 +41,11 @@ class FixUser:
         if self.last_active is not None:
             self.last_active_at = self.last_active.replace(microsecond=0)
 
-    def __eq__(self: Self, other: Any) -> bool:
-        if (
-            not hasattr(other, "id")
-            or not hasattr(other, "email")
-            or not hasattr(other, "registered_at")
-            or not isinstance(self.registered_at, datetime)
-            or not isinstance(other.registered_at, datetime)
-            or not hasattr(other, "workspaces")
-            or not isinstance(other.workspaces, list)
-            or not hasattr(other, "last_active_at")
-            or not hasattr(other, "user_email_notifications_disabled")
-            or not hasattr(other, "at_least_one_cloud_account_connected")
-            or not hasattr(other, "is_main_user_in_at_least_one_workspace")
-            or not hasattr(other, "cloud_account_connected_workspace_name")
-            or not hasattr(other, "workspace_has_subscription")
-        ):
+    def eq_except_last_active(self: Self, other: Any) -> bool:
+        if not isinstance(other, MappedResource) or other.mapping is not self.mapping:
             return False
-        self_last_active_at = None
-        other_last_active_at = None
-        if self.last_active_at is not None:
-            self_last_active_at = self.last_active_at.astimezone(timezone.utc)
-        if other.last_active_at is not None:
-            other_last_active_at = other.last_active_at.astimezone(timezone.utc)
-        return bool(
-            self.id == other.id
-            and str(self.email).lower() == str(other.email).lower()
-            and self.registered_at.astimezone(timezone.utc) == other.registered_at.astimezone(timezone.utc)
-            and {w.id for w in self.workspaces} == {w.id for w in other.workspaces}
-            and self.user_email_notifications_disabled == other.user_email_notifications_disabled
-            and self.at_least_one_cloud_account_connected == other.at_least_one_cloud_account_connected
-            and self.is_main_user_in_at_least_one_workspace == other.is_main_user_in_at_least_one_workspace
-            and self.cloud_account_connected_workspace_name == other.cloud_account_connected_workspace_name
-            and self.workspace_has_subscription == other.workspace_has_subscription
-            and self_last_active_at == other_last_active_at
-        )
+        exclude = frozenset({"last_active_at"})
+        return self.sync_key(exclude) == other.sync_key(exclude)
 
     def attio_data(
         self, person: Optional[AttioPerson] = None, workspaces: Optional[list[AttioWorkspace]] = None
@@ -80,47 +53,23 @@ class FixUser:
         object_id = "users"
         matching_attribute = "user_id"
         assert isinstance(self.registered_at, datetime)
-        data: dict[str, Any] = {
-            "data": {
-                "values": {
-                    "user_id": str(self.id),
-                    "primary_email_address": [{"email_address": self.email}],
-                    "status": "Signed up" if self.is_active else "Invited",
-                    "demo_workspace_viewed": False,
-                    "registered_at": self.registered_at.isoformat(),
-                }
-            }
-        }
+        values = USER_MAPPING.encode(self)
+        values["status"] = "Signed up" if self.is_active else "Invited"
+        values["demo_workspace_viewed"] = False
         if person:
-            data["data"]["values"]["person"] = {
+            values["person"] = {
                 "target_object": "people",
                 "target_record_id": str(person.record_id),
             }
         if workspaces:
-            data["data"]["values"]["workspace"] = []
-            for workspace in workspaces:
-                data["data"]["values"]["workspace"].append(
-                    {
-                        "target_object": "workspaces",
-                        "target_record_id": str(workspace.record_id),
-                    }
-                )
-        if self.last_active_at is not None:
-            data["data"]["values"]["last_activity_3"] = self.last_active_at.isoformat()
-        if self.user_email_notifications_disabled is not None:
-            data["data"]["values"]["user_email_notifications_disabled"] = self.user_email_notifications_disabled
-        if self.at_least_one_cloud_account_connected is not None:
-            data["data"]["values"]["at_least_one_cloud_account_connected"] = self.at_least_one_cloud_account_connected
-        if self.is_main_user_in_at_least_one_workspace is not None:
-            data["data"]["values"][
-                "is_main_user_in_at_least_one_workspace"
-            ] = self.is_main_user_in_at_least_one_workspace
-        if self.cloud_account_connected_workspace_name is not None:
-            data["data"]["values"][
-                "cloud_account_connected_workspace_name"
-            ] = self.cloud_account_connected_workspace_name
-        if self.workspace_has_subscription is not None:
-            data["data"]["values"]["workspace_has_subscription"] = self.workspace_has_subscription
+            values["workspace"] = [
+                {
+                    "target_object": "workspaces",
+                    "target_record_id": str(workspace.record_id),
+                }
+                for workspace in workspaces
+            ]
+        data: dict[str, Any] = {"data": {"values": values}}
 
         return {
             "object_id": object_id,
@@ -152,20 +101,10 @@ class FixUser:
                 if workspace.cloud_account_connected and not best_workspace.cloud_account_connected:
                     best_workspace = workspace
                     continue
-                best_workspace_is_configured = any(
-                    cloud_account.is_configured for cloud_account in best_workspace.cloud_accounts
-                )
-                workspace_is_configured = any(cloud_account.is_configured for cloud_account in workspace.cloud_accounts)
-                if workspace_is_configured and not best_workspace_is_configured:
+                if workspace.cloud_account_configured and not best_workspace.cloud_account_configured:
                     best_workspace = workspace
                     continue
-                best_workspace_sum_of_last_scan_resources_scanned = sum(
-                    cloud_account.last_scan_resources_scanned for cloud_account in best_workspace.cloud_accounts
-                )
-                workspace_sum_of_last_scan_resources_scanned = sum(
-                    cloud_account.last_scan_resources_scanned for cloud_account in workspace.cloud_accounts
-                )
-                if workspace_sum_of_last_scan_resources_scanned > best_workspace_sum_of_last_scan_resources_scanned:
+                if workspace.resources_scanned > best_workspace.resources_scanned:
                     best_workspace = workspace
                     continue
 
@@ -200,8 +139,10 @@ class FixRoles(IntFlag):
     workspace_billing_admin = 1 << 3
 
 
-@dataclass
-class FixWorkspace:
+@dataclass(eq=False)
+class FixWorkspace(MappedResource):
+    mapping = WORKSPACE_MAPPING
+
     id: UUID
     slug: str
     name: str
@@ -221,31 +162,19 @@ class FixWorkspace:
     status: FixWorkspaceStatus = FixWorkspaceStatus.Created
     cloud_account_connected: bool = False
     user_roles: dict[UUID, FixRoles] = field(default_factory=dict)
-
-    def __eq__(self: Self, other: Any) -> bool:
-        if (
-            not hasattr(other, "id")
-            or not hasattr(other, "name")
-            or not hasattr(other, "tier")
-            or not hasattr(other, "status")
-            or not hasattr(other, "cloud_account_connected")
-        ):
-            return False
-        return bool(
-            self.id == other.id
-            and self.name == other.name
-            and self.tier == other.tier
-            and self.status.value == other.status
-            and self.cloud_account_connected == other.cloud_account_connected
-        )
+    # Aggregates over the cloud accounts, computed by update_info() once the cloud accounts are linked
+    cloud_account_configured: bool = False
+    resources_scanned: int = 0
 
     def update_info(self) -> None:
+        self.cloud_account_configured = any(cloud_account.is_configured for cloud_account in self.cloud_accounts)
+        self.resources_scanned = sum(cloud_account.last_scan_resources_scanned for cloud_account in self.cloud_accounts)
         if len(self.cloud_accounts) > 0:
             self.cloud_account_connected = True
         if self.subscription_id is not None:
             self.status = FixWorkspaceStatus.Subscribed
             return
-        if any(cloud_account.is_configured for cloud_account in self.cloud_accounts):
+        if self.cloud_account_configured:
             self.status = FixWorkspaceStatus.Configured
         if any(cloud_account.last_scan_resources_scanned > 0 for cloud_account in self.cloud_accounts):
             self.status = FixWorkspaceStatus.Collected
@@ -253,17 +182,7 @@ class FixWorkspace:
     def attio_data(self) -> dict[str, Any]:
         object_id = "workspaces"
         matching_attribute = "workspace_id"
-        data: dict[str, Any] = {
-            "data": {
-                "values": {
-                    "workspace_id": str(self.id),
-                    "name": self.name,
-                    "product_tier": self.tier,
-                    "status": self.status.value,
-                    "cloud_account_connected": self.cloud_account_connected,
-                }
-            }
-        }
+        data: dict[str, Any] = {"data": {"values": WORKSPACE_MAPPING.encode(self)}}
         return {
             "object_id": object_id,
             "matching_attribute": matching_attribute,
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import threading
+from uuid import UUID
+from typing import Any, Optional, IO
+from argparse import ArgumentParser
+from .logger import log
+
+
+class SyncJournal:
+    """Append-only log of the writes applied to Attio, used to resume an interrupted run.
+
+    A run first checkpoints the Attio state it planned from, so that a resumed run starts from that state and the
+    writes journaled after it instead of fetching Attio again.
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.path = path
+        self.entries: list[dict[str, Any]] = []
+        # Records of the last complete checkpoint by object id, and when it was taken
+        self.state: Optional[dict[str, list[dict[str, Any]]]] = None
+        self.state_time: Optional[float] = None
+        self.__lock = threading.Lock()
+        self.__file: Optional[IO[str]] = None
+        if resume:
+            self.load()
+        self.open(truncate=not resume)
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            log.info(f"No journal found at {self.path}, nothing to resume")
+            return
+        checkpoint: dict[str, list[dict[str, Any]]] = {}
+        with open(self.path, "r") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partially written last line behind
+                    log.warning(f"Ignoring corrupt journal entry in {self.path} line {line_number}")
+                    continue
+                if entry["operation"] == "state":
+                    checkpoint.setdefault(entry["object_id"], []).append(entry["data"])
+                    continue
+                match entry["operation"]:
+                    case "complete":
+                        # Operations of completed runs are already reflected in Attio
+                        self.entries = []
+                        self.state = self.state_time = None
+                    case "checkpoint":
+                        # Only a checkpoint written to its end is used, it includes all operations before it
+                        self.state, self.state_time = checkpoint, entry["time"]
+                        self.entries = []
+                    case _:
+                        self.entries.append(entry)
+                checkpoint = {}
+        log.info(f"Loaded {len(self.entries)} journaled operations from {self.path}")
+
+    def open(self, truncate: bool = False) -> None:
+        self.__file = open(self.path, "w" if truncate else "a")
+        if not truncate and self.__file.tell() > 0:
+            # Terminate a partially written last line so that new entries start on a line of their own
+            self.__file.write("\n")
+
+    def close(self) -> None:
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def record_assert(self, object_id: str, key: str, data: dict[str, Any]) -> None:
+        self.__append({"operation": "assert", "object_id": object_id, "key": key, "data": data})
+
+    def record_delete(self, object_id: str, record_id: UUID) -> None:
+        self.__append({"operation": "delete", "object_id": object_id, "key": str(record_id)})
+
+    def record_state(self, state: dict[str, list[dict[str, Any]]]) -> None:
+        """Checkpoint the records of each object, the operations journaled so far are included in them."""
+        lines = [
+            json.dumps({"operation": "state", "object_id": object_id, "data": data})
+            for object_id, records in state.items()
+            for data in records
+        ]
+        checkpoint_time = time.time()
+        lines.append(json.dumps({"operation": "checkpoint", "time": checkpoint_time}))
+        with self.__lock:
+            self.entries = []
+            if self.__file is None:
+                return
+            # One write and fsync for the whole state instead of one per record
+            self.__file.write("\n".join(lines) + "\n")
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def complete(self) -> None:
+        self.__append({"operation": "complete"})
+        self.close()
+
+    def __append(self, entry: dict[str, Any]) -> None:
+        entry["time"] = time.time()
+        with self.__lock:
+            self.entries.append(entry)
+            if self.__file is None:
+                return
+            self.__file.write(json.dumps(entry) + "\n")
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+
+def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--journal",
+        dest="journal",
+        help="Record every write applied to Attio in this file",
+        default=os.environ.get("FIX_JOURNAL", None),
+    )
+    arg_parser.add_argument(
+        "--resume",
+        dest="resume",
+        help="Resume an interrupted run from the journal instead of starting over",
+        action="store_true",
+        default=False,
+    )
+    arg_parser.add_argument(
+        "--resume-max-age",
+        dest="resume_max_age",
+        help="Fetch Attio again on resume if the journaled state is older than this many seconds (default: 86400)",
+        type=float,
+        default=float(os.environ.get("FIX_RESUME_MAX_AGE", 86400)),
+    )
@@ -0,0 +1,98 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+WHITESPACE = " \t\n\r"
+
+
+class IncompleteJSON(ValueError):
+    pass
+
+
+class ChunkReader:
+    """Decoded text of a stream of byte chunks, read on demand and dropped once consumed."""
+
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        # Start of the last value decoded by value(), its text is buffer[start:pos]
+        self.start = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read the next chunk, False at the end of the stream."""
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buffer = self.buffer[self.pos :] + self.decoder.decode(b"", final=True)
+        else:
+            self.buffer = self.buffer[self.pos :] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """The next character that isn't whitespace, without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise IncompleteJSON("Unexpected end of JSON stream")
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at {self.buffer[self.pos : self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self, decoder: json.JSONDecoder) -> Any:
+        """Decode the next complete JSON value, reading more chunks until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer might continue in the next chunk
+            if end == len(self.buffer) and not self.eof and isinstance(value, (int, float)):
+                self.fill()
+                continue
+            self.start, self.pos = self.pos, end
+            return value
+
+
+def iter_array(chunks: Iterable[bytes], key: str = "data", with_text: bool = False) -> Iterator[Any]:
+    """Yield the elements of the array `key` of a JSON object one by one, while its bytes are still arriving.
+
+    Other members of the object are decoded and skipped, so only one element is held in memory at a time. With
+    `with_text` each element is yielded as a tuple of its value and its JSON text.
+    """
+    reader = ChunkReader(chunks)
+    decoder = json.JSONDecoder()
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value(decoder)
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() != "]":
+                while True:
+                    value = reader.value(decoder)
+                    yield (value, reader.buffer[reader.start : reader.pos]) if with_text else value
+                    if reader.peek() == "]":
+                        break
+                    reader.expect(",")
+            reader.expect("]")
+        else:
+            reader.value(decoder)
+        if reader.peek() == "}":
+            return
+        reader.expect(",")
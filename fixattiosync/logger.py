@@ -1,7 +1,11 @@
 from argparse import ArgumentParser
+from datetime import datetime, timezone
 from typing import Optional, Any
+import json
 import sys
 import os
+import threading
+import time
 import logging
 from logging import (
     basicConfig,
@@ -50,6 +54,105 @@ def add_args(arg_parser: ArgumentParser) -> None:
         action="store_true",
         default=False,
     )
+    arg_parser.add_argument(
+        "--log-json",
+        help="Log one JSON object per line",
+        dest="log_json",
+        action="store_true",
+        default=os.environ.get("FIX_LOG_JSON", "false").lower() == "true",
+    )
+    arg_parser.add_argument(
+        "--log-sample-rate",
+        help="Fraction of per-record events that are logged (default: 1)",
+        dest="log_sample_rate",
+        type=float,
+        default=float(os.environ.get("FIX_LOG_SAMPLE_RATE", 1.0)),
+    )
+    arg_parser.add_argument(
+        "--log-max-record-events",
+        help="Max. per-record events logged per sync phase, the rest only count towards its summary (default: 1000)",
+        dest="log_max_record_events",
+        type=int,
+        default=int(os.environ.get("FIX_LOG_MAX_RECORD_EVENTS", 1000)),
+    )
+
+
+# Attributes every LogRecord has, everything else was passed via `extra`
+STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, proc: str) -> None:
+        super().__init__()
+        self.proc = proc
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "proc": self.proc,
+            "level": record.levelname,
+            "process": record.process,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in STANDARD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class RecordSampling:
+    def __init__(self, sample_rate: float = 1.0, max_events: Optional[int] = 1000) -> None:
+        self.sample_rate = sample_rate
+        self.max_events = max_events
+
+
+record_sampling = RecordSampling()
+
+
+class RecordEvents:
+    """Counts the per-record events of a sync phase and logs only a sample of them.
+
+    Messages are formatted lazily, so events that are not logged cost no more than a counter increment.
+    `summary()` logs the counts of the whole phase in one line.
+    """
+
+    def __init__(self, phase: str, target: Optional[str] = None, sampling: Optional[RecordSampling] = None) -> None:
+        self.phase = phase
+        self.target = target
+        self.sampling = sampling or record_sampling
+        self.counts: dict[str, int] = {}
+        self.events = 0
+        self.logged = 0
+        self.started_at = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def event(self, action: str, msg: str, *args: Any) -> None:
+        with self.__lock:
+            self.counts[action] = self.counts.get(action, 0) + 1
+            self.events += 1
+            # Every 1/sample_rate-th event, spread evenly instead of at random
+            rate = self.sampling.sample_rate
+            sampled = int(self.events * rate) > int((self.events - 1) * rate)
+            limit = self.sampling.max_events
+            if not sampled or (limit is not None and self.logged >= limit) or not log.isEnabledFor(INFO):
+                return
+            self.logged += 1
+        log.info(msg, *args, extra={"phase": self.phase, "target": self.target, "action": action})
+
+    def summary(self, **fields: Any) -> None:
+        if self.events == 0 and not any(fields.values()):
+            return
+        duration = time.monotonic() - self.started_at
+        counts = ", ".join(f"{action}: {count}" for action, count in self.counts.items()) or "nothing"
+        suppressed = f", {self.events - self.logged} events not logged" if self.logged < self.events else ""
+        details = "".join(f", {name}: {value}" for name, value in fields.items() if value)
+        log.info(
+            f"Finished {self.phase} in {duration:.1f}s - {counts}{details}{suppressed}",
+            extra={"phase": self.phase, "target": self.target, "counts": self.counts, "duration": duration, **fields},
+        )
 
 
 def setup_logger(
@@ -59,11 +162,18 @@ def setup_logger(
     verbose: bool = False,
     quiet: bool = False,
     level: Optional[str] = None,
-    json_format: bool = True,
+    json_format: bool = False,
+    sample_rate: float = 1.0,
+    max_record_events: Optional[int] = 1000,
 ) -> None:
     # override log output via env var
     log_format = f"%(asctime)s|{proc}|%(levelname)5s|%(process)d|%(threadName)10s  %(message)s"
     basicConfig(format=log_format, datefmt="%y-%m-%d %H:%M:%S", force=force)
+    if json_format or os.environ.get("FIX_LOG_JSON", "false").lower() == "true":
+        for handler in getLogger().handlers:
+            handler.setFormatter(JsonFormatter(proc))
+    record_sampling.sample_rate = sample_rate
+    record_sampling.max_events = max_record_events
     argv = sys.argv[1:]
     if level:
         getLogger("fix").setLevel(level)
@@ -148,5 +258,4 @@ add_logging_level("DEBUG5", DEBUG5)
 add_logging_level("TRACE", TRACE)
 
 setLoggerClass(FixLogger)
-setup_logger("fix", force=False)
 log = get_fix_logger("fix")
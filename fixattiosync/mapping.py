@@ -0,0 +1,194 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+from typing import Any, Callable, ClassVar, Iterable, Optional, Sequence
+
+
+def identity(value: Any) -> Any:
+    return value
+
+
+def optional_uuid(value: Any) -> Optional[UUID]:
+    uuid = None
+    try:
+        uuid = UUID(str(value))
+    except (ValueError, TypeError):
+        pass
+    return uuid
+
+
+def optional_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value).replace(microsecond=0)
+
+
+def isoformat(value: datetime) -> str:
+    return value.isoformat()
+
+
+def email_address(value: str) -> list[dict[str, str]]:
+    return [{"email_address": value}]
+
+
+def enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def utc_timestamp(value: Optional[datetime]) -> Optional[float]:
+    # Naive datetimes are taken as local time, like astimezone() does
+    return None if value is None else value.timestamp()
+
+
+def lowercase(value: Any) -> str:
+    return str(value).lower()
+
+
+def id_set(resources: Iterable[Any]) -> frozenset[Any]:
+    # UUID.__hash__ is implemented in Python, hashing the underlying int is a lot cheaper
+    return frozenset([getattr(resource.id, "int", None) for resource in resources])
+
+
+KeyFunction = Callable[[Any], tuple[Any, ...]]
+
+
+@dataclass(frozen=True)
+class Attribute:
+    """Maps an attribute of a Fix resource to an Attio attribute of the same record.
+
+    `name` is the Python attribute on both the Fix resource and its Attio counterpart. `path` locates the value
+    inside the Attio attribute, `decode` turns it into the Python value and `encode` turns the Python value into
+    what the Attio API expects. `normalize` maps both sides to a representation that compares equal when the
+    values are semantically the same. Relations (`path` is None) are linked by AttioData, not decoded here.
+    """
+
+    name: str
+    attio: str
+    path: Optional[tuple[str, ...]] = ("value",)
+    decode: Callable[[Any], Any] = identity
+    encode: Optional[Callable[[Any], Any]] = identity
+    normalize: Callable[[Any], Any] = identity
+
+
+class ResourceMapping:
+    def __init__(self, attributes: Sequence[Attribute]) -> None:
+        self.attributes = tuple(attributes)
+        self.values = tuple(attribute for attribute in self.attributes if attribute.path is not None)
+        self.relations = tuple(attribute for attribute in self.attributes if attribute.path is None)
+        self.value_names = frozenset(attribute.name for attribute in self.values)
+        self.__keys: dict[frozenset[str], tuple[KeyFunction, KeyFunction]] = {}
+
+    def decode(self, values: dict[str, Any]) -> dict[str, Any]:
+        decoded = {}
+        for attribute in self.values:
+            data = values.get(attribute.attio)
+            data = data[0] if data else None
+            for key in attribute.path or ():
+                data = data.get(key) if isinstance(data, dict) else None
+            decoded[attribute.name] = attribute.decode(data)
+        return decoded
+
+    def encode(self, resource: Any) -> dict[str, Any]:
+        values = {}
+        for attribute in self.attributes:
+            if attribute.encode is None:
+                continue
+            value = getattr(resource, attribute.name)
+            if value is not None:
+                values[attribute.attio] = attribute.encode(value)
+        return values
+
+    def keys(self, exclude: frozenset[str] = frozenset()) -> tuple[KeyFunction, KeyFunction]:
+        """Functions returning the normalized values and the normalized relations of a resource."""
+        keys = self.__keys.get(exclude)
+        if keys is None:
+            keys = self.__keys[exclude] = (
+                compile_key([attribute for attribute in self.values if attribute.name not in exclude]),
+                compile_key([attribute for attribute in self.relations if attribute.name not in exclude]),
+            )
+        return keys
+
+
+def compile_key(attributes: Sequence[Attribute]) -> KeyFunction:
+    # Generate a function building the key tuple in one expression, like dataclasses generates __eq__,
+    # so that only the normalizers that change values are called
+    namespace: dict[str, Any] = {}
+    items = []
+    for attribute in attributes:
+        if attribute.normalize is identity:
+            items.append(f"resource.{attribute.name}")
+        else:
+            namespace[f"normalize_{attribute.name}"] = attribute.normalize
+            items.append(f"normalize_{attribute.name}(resource.{attribute.name})")
+    exec(f"def key(resource):\n    return ({''.join(item + ', ' for item in items)})", namespace)
+    return namespace["key"]  # type: ignore
+
+
+class MappedResource:
+    """Compares resources on both sides of the sync by the normalized values of their mapped attributes.
+
+    The normalized values are computed once and cached until one of the mapped attributes is assigned. Relations
+    are mutated in place, so they are normalized on every comparison.
+    """
+
+    mapping: ClassVar[ResourceMapping]
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name in self.mapping.value_names:
+            self.__dict__.pop("_value_keys", None)
+
+    def normalize(self) -> None:
+        """Normalize the mapped values now rather than on the first comparison."""
+        self.__values(frozenset())
+
+    def sync_key(self, exclude: frozenset[str] = frozenset()) -> tuple[Any, ...]:
+        return self.__values(exclude), self.mapping.keys(exclude)[1](self)
+
+    def __values(self, exclude: frozenset[str]) -> tuple[Any, ...]:
+        value_keys = self.__dict__.get("_value_keys")
+        if value_keys is None:
+            value_keys = self.__dict__["_value_keys"] = {}
+        values = value_keys.get(exclude)
+        if values is None:
+            values = value_keys[exclude] = self.mapping.keys(exclude)[0](self)
+        return values
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, MappedResource) or other.mapping is not self.mapping:
+            return False
+        return self.sync_key() == other.sync_key()
+
+    __hash__ = None  # type: ignore
+
+
+WORKSPACE_MAPPING = ResourceMapping(
+    [
+        Attribute("id", "workspace_id", decode=optional_uuid, encode=str),
+        Attribute("name", "name"),
+        Attribute("tier", "product_tier", path=("option", "title")),
+        Attribute("status", "status", path=("status", "title"), encode=enum_value, normalize=enum_value),
+        Attribute("cloud_account_connected", "cloud_account_connected"),
+    ]
+)
+
+USER_MAPPING = ResourceMapping(
+    [
+        Attribute("id", "user_id", decode=optional_uuid, encode=str),
+        Attribute("email", "primary_email_address", path=("email_address",), encode=email_address, normalize=lowercase),
+        Attribute(
+            "registered_at", "registered_at", decode=optional_datetime, encode=isoformat, normalize=utc_timestamp
+        ),
+        Attribute("workspaces", "workspace", path=None, encode=None, normalize=id_set),
+        Attribute("user_email_notifications_disabled", "user_email_notifications_disabled"),
+        Attribute("at_least_one_cloud_account_connected", "at_least_one_cloud_account_connected"),
+        Attribute("is_main_user_in_at_least_one_workspace", "is_main_user_in_at_least_one_workspace"),
+        Attribute("cloud_account_connected_workspace_name", "cloud_account_connected_workspace_name"),
+        Attribute("workspace_has_subscription", "workspace_has_subscription"),
+        Attribute(
+            "last_active_at", "last_activity_3", decode=optional_datetime, encode=isoformat, normalize=utc_timestamp
+        ),
+    ]
+)
@@ -0,0 +1,70 @@
+import math
+from typing import Any, Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+L = TypeVar("L")
+R = TypeVar("R")
+
+
+def id_key(resource: Any) -> int:
+    # Sorting and comparing the int of a UUID is a lot cheaper than the UUID itself, records without id sort first
+    resource_id = resource.id
+    return -1 if resource_id is None else int(resource_id.int)
+
+
+def keyed(items: Iterable[T], key: Callable[[Any], int], unique: bool) -> Iterator[tuple[float, T]]:
+    previous = -math.inf
+    for item in items:
+        item_key = key(item)
+        if item_key < previous or (unique and item_key == previous):
+            raise ValueError(f"Items are not sorted by key: {item_key} after {previous}")
+        previous = item_key
+        yield item_key, item
+
+
+def merge_join(
+    left: Iterable[L], right: Iterable[R], key: Callable[[Any], int] = id_key
+) -> Iterator[tuple[Optional[L], Optional[R]]]:
+    """Join two iterables that are both sorted by `key` in a single pass, like a full outer merge join.
+
+    Yields (left, right) for matching keys and (left, None) or (None, right) for keys found on one side only.
+    Left keys are unique. Right items sharing the key of a left item are joined with the last of them, like a dict
+    by key would, the others are dropped. Raises ValueError if a side isn't sorted.
+    """
+    end: tuple[float, Any] = (math.inf, None)
+    lefts, rights = keyed(left, key, unique=True), keyed(right, key, unique=False)
+    (lkey, lhs), (rkey, rhs) = next(lefts, end), next(rights, end)
+    while lkey != math.inf or rkey != math.inf:
+        if lkey < rkey:
+            yield lhs, None
+            lkey, lhs = next(lefts, end)
+        elif rkey < lkey:
+            yield None, rhs
+            rkey, rhs = next(rights, end)
+        else:
+            last = rhs
+            rkey, rhs = next(rights, end)
+            while rkey == lkey:
+                last = rhs
+                rkey, rhs = next(rights, end)
+            yield lhs, last
+            lkey, lhs = next(lefts, end)
+
+
+def diff_sorted(fix: Iterable[L], attio: Iterable[R]) -> tuple[list[L], list[L], list[R]]:
+    """The Fix resources missing and outdated in Attio and the Attio resources no longer in Fix, in id order.
+
+    Both sides must be sorted by id, they are consumed in a single pass.
+    """
+    missing: list[L] = []
+    outdated: list[L] = []
+    obsolete: list[R] = []
+    for fix_resource, attio_resource in merge_join(fix, attio):
+        if fix_resource is None:
+            if attio_resource is not None:
+                obsolete.append(attio_resource)
+        elif attio_resource is None:
+            missing.append(fix_resource)
+        elif fix_resource != attio_resource:
+            outdated.append(fix_resource)
+    return missing, outdated, obsolete
@@ -0,0 +1,214 @@
+from __future__ import annotations
+import os
+import json
+import time
+import threading
+from dataclasses import asdict
+from argparse import ArgumentParser
+from typing import Any, Optional, TYPE_CHECKING
+from .logger import log
+from .attiodata import AttioData
+from .fixdata import FixData
+from .sync import hydrate_sources, sync_fix_to_targets
+
+if TYPE_CHECKING:
+    from http.server import BaseHTTPRequestHandler
+    from .webhooks import WebhookReceiver
+
+
+class SyncService:
+    def __init__(
+        self,
+        fix: FixData,
+        targets: list[AttioData],
+        max_changes_percent: int = 10,
+        interval: int = 300,
+        attio_resync_interval: int = 3600,
+        fix_resync_interval: int = 3600,
+        time_budget: Optional[float] = None,
+        webhooks: Optional[WebhookReceiver] = None,
+    ) -> None:
+        self.fix = fix
+        self.targets = targets
+        self.max_changes_percent = max_changes_percent
+        self.interval = interval
+        self.attio_resync_interval = attio_resync_interval
+        self.fix_resync_interval = fix_resync_interval
+        self.time_budget = time_budget
+        self.webhooks = webhooks
+        self.last_attio_hydration: dict[str, float] = {}
+        self.last_fix_hydration: Optional[float] = None
+        self.stats: dict[str, Any] = {"runs": 0, "failures": 0, "last_success": None, "last_run": None}
+        self.__run_lock = threading.Lock()
+        self.__trigger = threading.Event()
+        self.__shutdown = threading.Event()
+
+    def refresh(self) -> None:
+        # Fix only reads the rows changed since its last read, and all of them now and then in case a change was
+        # missed. Attio state stays resident and is kept current by our own writes, so it is only re-fetched to pick
+        # up changes made in Attio directly.
+        now = time.monotonic()
+        full = self.last_fix_hydration is None or now - self.last_fix_hydration >= self.fix_resync_interval
+        if full:
+            log.info("Reading all Fix data")
+        due = []
+        for attio in self.targets:
+            last_hydration = self.last_attio_hydration.get(attio.name)
+            if last_hydration is None or now - last_hydration >= self.attio_resync_interval:
+                log.info(f"Refreshing Attio data of {attio.name}")
+                due.append(attio)
+        hydrate_sources(self.fix, due, incremental=not full)
+        if full:
+            self.last_fix_hydration = now
+        for attio in due:
+            self.last_attio_hydration[attio.name] = now
+
+    def run_once(self) -> dict[str, Any]:
+        with self.__run_lock:
+            started_at = time.time()
+            run: dict[str, Any] = {"started_at": started_at, "success": False, "reports": {}, "errors": {}}
+            # A run paused by the circuit breaker must not keep later runs from trying again
+            for attio in self.targets:
+                attio.breaker.reset()
+            try:
+                self.refresh()
+                results = sync_fix_to_targets(
+                    self.fix, self.targets, max_changes_percent=self.max_changes_percent, time_budget=self.time_budget
+                )
+                for name, result in results.items():
+                    if isinstance(result, Exception):
+                        run["errors"][name] = str(result)
+                    else:
+                        run["reports"][name] = asdict(result)
+                run["success"] = len(run["errors"]) == 0
+            except Exception as e:
+                log.error(f"Sync run failed: {e}")
+                run["errors"] = {attio.name: str(e) for attio in self.targets}
+            if run["success"]:
+                self.stats["last_success"] = started_at
+            else:
+                self.stats["failures"] += 1
+            run["duration"] = time.time() - started_at
+            self.stats["runs"] += 1
+            self.stats["last_run"] = run
+            return run
+
+    def trigger(self) -> None:
+        self.__trigger.set()
+
+    def shutdown(self) -> None:
+        self.__shutdown.set()
+        self.__trigger.set()
+
+    def healthy(self) -> bool:
+        if self.stats["runs"] == 0:
+            return True
+        last_success = self.stats["last_success"]
+        return last_success is not None and time.time() - last_success < 2 * self.interval
+
+    def serve(self, address: str = "127.0.0.1", port: int = 8080) -> None:
+        from http.server import ThreadingHTTPServer
+
+        server = ThreadingHTTPServer((address, port), make_handler(self))
+        server_thread = threading.Thread(target=server.serve_forever, name="http", daemon=True)
+        server_thread.start()
+        log.info(f"Serving health and stats on http://{address}:{server.server_address[1]}")
+        if self.webhooks is not None:
+            self.webhooks.start()
+        try:
+            while not self.__shutdown.is_set():
+                self.run_once()
+                self.__trigger.wait(self.interval)
+                self.__trigger.clear()
+        finally:
+            server.shutdown()
+            server.server_close()
+            if self.webhooks is not None:
+                self.webhooks.stop()
+
+
+def make_handler(service: SyncService) -> type[BaseHTTPRequestHandler]:
+    from http.server import BaseHTTPRequestHandler
+
+    class SyncServiceHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802
+            match self.path:
+                case "/health":
+                    healthy = service.healthy()
+                    self.respond(200 if healthy else 503, {"healthy": healthy})
+                case "/stats":
+                    stats = dict(service.stats)
+                    if service.webhooks is not None:
+                        stats["webhooks"] = service.webhooks.stats
+                    self.respond(200, stats)
+                case _:
+                    self.respond(404, {"error": "not found"})
+
+        def do_POST(self) -> None:  # noqa: N802
+            match self.path:
+                case "/sync":
+                    service.trigger()
+                    self.respond(202, {"triggered": True})
+                case path if path.startswith("/webhooks/") and service.webhooks is not None:
+                    body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                    status = service.webhooks.receive(path.removeprefix("/webhooks/"), body, dict(self.headers))
+                    self.respond(status, {"accepted": status == 202})
+                case _:
+                    self.respond(404, {"error": "not found"})
+
+        def respond(self, status: int, body: dict[str, Any]) -> None:
+            payload = json.dumps(body, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            log.debug(f"{self.address_string()} {format % args}")
+
+    return SyncServiceHandler
+
+
+def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--serve",
+        dest="serve",
+        help="Keep running and sync on an interval",
+        action="store_true",
+        default=False,
+    )
+    arg_parser.add_argument(
+        "--sync-interval",
+        dest="sync_interval",
+        help="Seconds between syncs in serve mode (default: 300)",
+        type=int,
+        default=int(os.environ.get("FIX_SYNC_INTERVAL", 300)),
+    )
+    arg_parser.add_argument(
+        "--attio-resync-interval",
+        dest="attio_resync_interval",
+        help="Seconds between full Attio refreshes in serve mode (default: 3600)",
+        type=int,
+        default=int(os.environ.get("FIX_ATTIO_RESYNC_INTERVAL", 3600)),
+    )
+    arg_parser.add_argument(
+        "--fix-resync-interval",
+        dest="fix_resync_interval",
+        help="Seconds between full Fix reads in serve mode, changed rows are read in between (default: 3600)",
+        type=int,
+        default=int(os.environ.get("FIX_RESYNC_INTERVAL", 3600)),
+    )
+    arg_parser.add_argument(
+        "--listen-address",
+        dest="listen_address",
+        help="Address of the health and stats endpoint in serve mode (default: 127.0.0.1)",
+        default=os.environ.get("FIX_LISTEN_ADDRESS", "127.0.0.1"),
+    )
+    arg_parser.add_argument(
+        "--listen-port",
+        dest="listen_port",
+        help="Port of the health and stats endpoint in serve mode (default: 8080)",
+        type=int,
+        default=int(os.environ.get("FIX_LISTEN_PORT", 8080)),
+    )
@@ -0,0 +1,220 @@
+from __future__ import annotations
+import os
+import time
+import types
+from dataclasses import fields
+from datetime import datetime
+from enum import Enum
+from uuid import UUID
+from argparse import ArgumentParser
+from typing import Any, Callable, TypeVar, Union, get_args, get_origin, get_type_hints
+from .logger import log
+from .attiodata import AttioData
+from .fixdata import FixData
+from .journal import SyncJournal
+from .attioresources import AttioPerson, AttioUser, AttioWorkspace
+from .fixresources import FixRoles, FixUser, FixWorkspace
+
+T = TypeVar("T")
+
+# Arrow IPC files rather than Parquet: they can be memory-mapped and read without decoding
+SUFFIX = ".arrow"
+SCALARS = (bool, int, float, str, datetime)
+# Credentials are never written to snapshots, they are loaded with these placeholders
+CREDENTIALS: dict[str, Any] = {"hashed_password": "", "otp_secret": None, "is_mfa_active": False}
+
+
+def require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise ImportError("Snapshots require pyarrow, install fixattiosync[snapshots]") from e
+
+
+def columns(cls: type[Any], exclude: frozenset[str] = frozenset(CREDENTIALS)) -> dict[str, Callable[[Any], Any]]:
+    """Decoders of the dataclass fields that are stored as columns, relations to other objects and the excluded
+    fields are left out."""
+    hints = get_type_hints(cls)
+    decoders: dict[str, Callable[[Any], Any]] = {}
+    for f in fields(cls):
+        if f.name in exclude:
+            continue
+        hint = hints[f.name]
+        if get_origin(hint) in (Union, types.UnionType):
+            hint = next(arg for arg in get_args(hint) if arg is not type(None))
+        if hint is UUID:
+            decoders[f.name] = lambda value: None if value is None else UUID(value)
+        elif get_origin(hint) is list and get_args(hint) == (UUID,):
+            decoders[f.name] = lambda value: None if value is None else [UUID(v) for v in value]
+        elif isinstance(hint, type) and issubclass(hint, Enum):
+            decoders[f.name] = enum_decoder(hint)
+        elif hint is datetime:
+            # Arrow stores datetimes, JSON journals ISO strings
+            decoders[f.name] = lambda value: datetime.fromisoformat(value) if isinstance(value, str) else value
+        elif hint in SCALARS:
+            decoders[f.name] = lambda value: value
+    return decoders
+
+
+def enum_decoder(enum: type[Enum]) -> Callable[[Any], Any]:
+    return lambda value: None if value is None else enum(value)
+
+
+def encode(value: Any) -> Any:
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, list):
+        return [encode(v) for v in value]
+    return value
+
+
+def encode_json(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else encode(value)
+
+
+def encode_rows(cls: type[Any], items: list[Any], encoder: Callable[[Any], Any] = encode) -> list[dict[str, Any]]:
+    names = list(columns(cls))
+    return [{name: encoder(getattr(item, name)) for name in names} for item in items]
+
+
+def decode_rows(rows: list[dict[str, Any]], cls: type[T]) -> list[T]:
+    decoders = columns(cls)
+    placeholders = {f.name: CREDENTIALS[f.name] for f in fields(cls) if f.name in CREDENTIALS}  # type: ignore
+    return [
+        cls(**placeholders, **{name: decoders[name](value) for name, value in row.items() if name in decoders})
+        for row in rows
+    ]
+
+
+def write_table(path: str, cls: type[Any], items: list[Any]) -> None:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    table = pa.Table.from_pylist(encode_rows(cls, items))
+    with pa.OSFile(path, "wb") as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def read_rows(path: str) -> list[dict[str, Any]]:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    with pa.memory_map(path, "r") as source:
+        rows: list[dict[str, Any]] = pyarrow.ipc.open_file(source).read_all().to_pylist()
+    return rows
+
+
+def read_table(path: str, cls: type[T]) -> list[T]:
+    return decode_rows(read_rows(path), cls)
+
+
+def dump_snapshot(directory: str, fix: FixData, targets: list[AttioData]) -> None:
+    require_pyarrow()
+    os.makedirs(directory, exist_ok=True)
+    write_table(os.path.join(directory, f"fix-workspaces{SUFFIX}"), FixWorkspace, fix.workspaces)
+    write_table(os.path.join(directory, f"fix-users{SUFFIX}"), FixUser, fix.users)
+    write_memberships(os.path.join(directory, f"fix-memberships{SUFFIX}"), fix.users)
+    for attio in targets:
+        prefix = os.path.join(directory, f"attio-{attio.name}")
+        write_table(f"{prefix}-workspaces{SUFFIX}", AttioWorkspace, attio.workspaces)
+        write_table(f"{prefix}-people{SUFFIX}", AttioPerson, attio.people)
+        write_table(f"{prefix}-users{SUFFIX}", AttioUser, attio.users)
+    log.info(f"Wrote snapshot of Fix and {len(targets)} Attio target(s) to {directory}")
+
+
+def write_memberships(path: str, users: list[FixUser]) -> None:
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    rows = [
+        {"user_id": str(user.id), "workspace_id": str(workspace.id), "roles": int(user.workspace_roles[workspace.id])}
+        for user in users
+        for workspace in user.workspaces
+    ]
+    schema = pa.schema([("user_id", pa.string()), ("workspace_id", pa.string()), ("roles", pa.int64())])
+    table = pa.Table.from_pylist(rows, schema=schema)
+    with pa.OSFile(path, "wb") as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def load_fix_snapshot(directory: str, fix: FixData) -> None:
+    require_pyarrow()
+    workspaces = {w.id: w for w in read_table(os.path.join(directory, f"fix-workspaces{SUFFIX}"), FixWorkspace)}
+    users = {u.id: u for u in read_table(os.path.join(directory, f"fix-users{SUFFIX}"), FixUser)}
+    for row in read_rows(os.path.join(directory, f"fix-memberships{SUFFIX}")):
+        user = users[UUID(row["user_id"])]
+        workspace = workspaces[UUID(row["workspace_id"])]
+        roles = FixRoles(row["roles"])
+        user.workspaces.append(workspace)
+        workspace.users.append(user)
+        user.workspace_roles[workspace.id] = roles
+        workspace.user_roles[user.id] = roles
+    for workspace in workspaces.values():
+        workspace.owner = users.get(workspace.owner_id)
+    fix.load(list(workspaces.values()), list(users.values()))
+
+
+def snapshot_targets(directory: str) -> list[str]:
+    return sorted(
+        name[len("attio-") : -len(f"-users{SUFFIX}")]
+        for name in os.listdir(directory)
+        if name.startswith("attio-") and name.endswith(f"-users{SUFFIX}")
+    )
+
+
+def load_attio_snapshot(directory: str, attio: AttioData) -> None:
+    require_pyarrow()
+    prefix = os.path.join(directory, f"attio-{attio.name}")
+    attio.load(
+        read_table(f"{prefix}-workspaces{SUFFIX}", AttioWorkspace),
+        read_table(f"{prefix}-people{SUFFIX}", AttioPerson),
+        read_table(f"{prefix}-users{SUFFIX}", AttioUser),
+    )
+
+
+def checkpoint_attio(journal: SyncJournal, attio: AttioData) -> None:
+    """Journal the hydrated Attio state in the columns of a snapshot, so that `restore_attio` can resume from it."""
+    journal.record_state(
+        {
+            "workspaces": encode_rows(AttioWorkspace, attio.workspaces, encode_json),
+            "people": encode_rows(AttioPerson, attio.people, encode_json),
+            "users": encode_rows(AttioUser, attio.users, encode_json),
+        }
+    )
+    log.debug(f"Checkpointed the state of {attio.name} in {journal.path}")
+
+
+def restore_attio(journal: SyncJournal, attio: AttioData, max_age: float) -> bool:
+    """Load the Attio state journaled by `checkpoint_attio` instead of fetching it, False if there is none recent."""
+    if journal.state is None or journal.state_time is None:
+        log.info(f"No Attio state journaled in {journal.path}, fetching {attio.name}")
+        return False
+    age = time.time() - journal.state_time
+    if age > max_age:
+        log.info(f"Journaled Attio state is {age:.0f}s old, fetching {attio.name} again")
+        return False
+    attio.load(
+        decode_rows(journal.state.get("workspaces", []), AttioWorkspace),
+        decode_rows(journal.state.get("people", []), AttioPerson),
+        decode_rows(journal.state.get("users", []), AttioUser),
+    )
+    journal.state = None
+    log.info(f"Resuming {attio.name} from the Attio state journaled {age:.0f}s ago")
+    return True
+
+
+def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--dump-snapshot",
+        dest="dump_snapshot",
+        help="Write the hydrated Fix and Attio data to Arrow files in this directory and exit",
+        default=None,
+    )
+    arg_parser.add_argument(
+        "--from-snapshot",
+        dest="from_snapshot",
+        help="Plan the sync from a snapshot directory instead of the database and Attio, without applying it",
+        default=None,
+    )
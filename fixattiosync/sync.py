@@ -1,32 +1,96 @@
-import sys
+import heapq
 import math
-from typing import Optional
+import time
+import threading
+from uuid import UUID
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Optional, Any, Callable, Union
 from argparse import ArgumentParser
-from .logger import log
+from .logger import log, RecordEvents
 from .attiodata import AttioData
 from .fixdata import FixData
 from .fixresources import FixUser, FixWorkspace
 from .attioresources import AttioUser, AttioWorkspace, AttioPerson
+from .reconcile import diff_sorted, id_key
+
+
+class ModificationThresholdError(Exception):
+    pass
+
+
+class TimeBudget:
+    def __init__(self, seconds: Optional[float] = None) -> None:
+        self.seconds = seconds
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+
+    def exhausted(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+
+@dataclass
+class SyncReport:
+    workspaces_missing: int = 0
+    workspaces_outdated: int = 0
+    workspaces_obsolete: int = 0
+    users_missing: int = 0
+    users_outdated: int = 0
+    users_obsolete: int = 0
+    deferred: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class SyncPlan:
+    workspaces_missing: list[FixWorkspace]
+    workspaces_outdated: list[FixWorkspace]
+    workspaces_obsolete: list[AttioWorkspace]
+    users_missing: list[FixUser]
+    users_outdated: list[FixUser]
+    users_obsolete: list[AttioUser]
+
+    def report(self) -> SyncReport:
+        return SyncReport(
+            workspaces_missing=len(self.workspaces_missing),
+            workspaces_outdated=len(self.workspaces_outdated),
+            workspaces_obsolete=len(self.workspaces_obsolete),
+            users_missing=len(self.users_missing),
+            users_outdated=len(self.users_outdated),
+            users_obsolete=len(self.users_obsolete),
+        )
 
 
-def sync_fix_to_attio(fix: FixData, attio: AttioData, max_changes_percent: int = 10) -> None:
-    workspaces_missing = workspaces_missing_in_attio(fix, attio)
-    users_missing = users_missing_in_attio(fix, attio)
-    obsolete_workspaces = workspaces_no_longer_in_fix(fix, attio)
-    obsolete_users = users_no_longer_in_fix(fix, attio)
-    users_outdated = users_outdated_in_attio(fix, attio)
-    workspaces_outdated = workspaces_outdated_in_attio(fix, attio)
-
-    # Sanity check
-    delta_percent_missing = (
-        (len(workspaces_missing) + len(users_missing)) / (len(attio.users) + len(attio.workspaces)) * 100
+def plan_sync(fix: FixData, attio: AttioData) -> SyncPlan:
+    # One sort-merge pass per object instead of id sets and dicts for every kind of change. Fix is read ordered
+    # by id already, so sorting it is a linear scan.
+    workspaces_missing, workspaces_outdated, workspaces_obsolete = diff_sorted(
+        sorted(fix.workspaces, key=id_key), sorted(attio.workspaces, key=id_key)
     )
-    delta_percent_outdated = (
-        (len(users_outdated) + len(workspaces_outdated)) / (len(attio.users) + len(attio.workspaces)) * 100
+    users_missing, users_outdated, users_obsolete = diff_sorted(
+        sorted(fix.users, key=id_key), sorted(attio.users, key=id_key)
     )
-    delta_percent_obsolete = (
-        (len(obsolete_workspaces) + len(obsolete_users)) / (len(attio.users) + len(attio.workspaces)) * 100
+    plan = SyncPlan(
+        workspaces_missing=workspaces_missing,
+        workspaces_outdated=workspaces_outdated,
+        workspaces_obsolete=workspaces_obsolete,
+        users_missing=users_missing,
+        users_outdated=users_outdated,
+        users_obsolete=users_obsolete,
     )
+    log.debug(f"Planned sync to {attio.name}: {plan.report()}")
+    return plan
+
+
+def change_percentages(plan: SyncPlan, attio: AttioData) -> tuple[float, float, float]:
+    total = len(attio.users) + len(attio.workspaces)
+    delta_percent_missing = (len(plan.workspaces_missing) + len(plan.users_missing)) / total * 100
+    delta_percent_outdated = (len(plan.users_outdated) + len(plan.workspaces_outdated)) / total * 100
+    delta_percent_obsolete = (len(plan.workspaces_obsolete) + len(plan.users_obsolete)) / total * 100
+    return delta_percent_missing, delta_percent_outdated, delta_percent_obsolete
+
+
+def check_threshold(plan: SyncPlan, attio: AttioData, max_changes_percent: int) -> None:
+    delta_percent_missing, delta_percent_outdated, delta_percent_obsolete = change_percentages(plan, attio)
 
     if (
         delta_percent_missing > max_changes_percent
@@ -34,93 +98,359 @@ def sync_fix_to_attio(fix: FixData, attio: AttioData, max_changes_percent: int =
         or delta_percent_obsolete > max_changes_percent
     ):
         min_required_threshold = math.ceil(max(delta_percent_missing, delta_percent_outdated, delta_percent_obsolete))
-        log.fatal(
+        raise ModificationThresholdError(
             f"Data changes exceed the threshold of {max_changes_percent}%:"
             f" Missing: {delta_percent_missing:.2f}%,"
             f" Outdated: {delta_percent_outdated:.2f}%,"
             f" Obsolete: {delta_percent_obsolete:.2f}%"
             f" - run with `--modification-threshold {min_required_threshold}` or higher to apply all changes!"
         )
-        sys.exit(1)
 
-    # Sync data
-    create_missing_workspaces(attio, workspaces_missing)
-    update_outdated_workspaces(attio, workspaces_outdated)
-    create_missing_users(attio, users_missing)
-    update_outdated_users(attio, users_outdated)
-    delete_obsolete_workspaces(attio, obsolete_workspaces)
-    delete_obsolete_users_and_people(attio, obsolete_users)
 
+PHASES = [
+    "workspaces_missing",
+    "users_missing",
+    "workspaces_outdated",
+    "users_outdated",
+    "users_last_active_outdated",
+    "workspaces_obsolete",
+    "users_obsolete",
+]
+
+
+def sync_fix_to_attio(
+    fix: FixData, attio: AttioData, max_changes_percent: int = 10, time_budget: Optional[float] = None
+) -> SyncReport:
+    plan = plan_sync(fix, attio)
+
+    # Sanity check
+    check_threshold(plan, attio, max_changes_percent)
+
+    attio_users_by_id = {user.id: user for user in attio.users}
+    users_activity_outdated = [
+        user for user in plan.users_outdated if user.eq_except_last_active(attio_users_by_id[user.id])
+    ]
+    users_activity_outdated_ids = {user.id for user in users_activity_outdated}
+    users_outdated = [user for user in plan.users_outdated if user.id not in users_activity_outdated_ids]
+
+    # Instead of running the phases one after another, every change waits only for what it depends on: a user for
+    # the workspaces it is linked to, the deletion of a person for users that might still claim it by email.
+    # Ready changes start in the order of PHASES, so that a time budget defers the least important ones.
+    # With a budget, no change starts while changes of an earlier phase still wait for their dependencies.
+    events = {phase: RecordEvents(phase, target=attio.name) for phase in PHASES}
+    workspaces_by_fix_id = attio_workspaces_by_fix_id(attio)
+    workspace_tasks = {
+        **create_missing_workspaces_tasks(attio, plan.workspaces_missing, events["workspaces_missing"]),
+        **update_outdated_workspaces_tasks(attio, plan.workspaces_outdated, events["workspaces_outdated"]),
+    }
+    for task in workspace_tasks.values():
+        task.run = track_workspace(task.run, workspaces_by_fix_id)
+    user_tasks = create_missing_users_tasks(
+        attio, plan.users_missing, events["users_missing"], workspaces_by_fix_id, workspace_tasks
+    )
+    tasks = [
+        *workspace_tasks.values(),
+        *user_tasks.values(),
+        *update_outdated_users_tasks(
+            attio, users_outdated, events["users_outdated"], workspaces_by_fix_id, workspace_tasks
+        ),
+        *update_outdated_users_tasks(
+            attio, users_activity_outdated, events["users_last_active_outdated"], workspaces_by_fix_id, workspace_tasks
+        ),
+        *delete_obsolete_workspaces_tasks(attio, plan.workspaces_obsolete, events["workspaces_obsolete"]),
+        *delete_obsolete_users_and_people_tasks(attio, plan.users_obsolete, events["users_obsolete"], user_tasks),
+    ]
+
+    report = plan.report()
+    deferred = run_tasks(attio, tasks, TimeBudget(time_budget))
+    for phase in PHASES:
+        if len(deferred.get(phase, [])) > 0:
+            report.deferred[phase] = len(deferred[phase])
+        events[phase].summary(deferred=len(deferred.get(phase, [])))
+    if attio.breaker.exhausted:
+        log.error("Attio keeps failing, paused the run - remaining changes are deferred to the next run")
+    elif len(report.deferred) > 0:
+        log.warning(
+            f"Time budget of {time_budget}s exhausted, deferred to the next run: "
+            + ", ".join(f"{phase}: {count}" for phase, count in report.deferred.items())
+        )
+
+    return report
+
+
+def hydrate_sources(fix: FixData, targets: list[AttioData], incremental: bool = False) -> None:
+    """Hydrates Fix and the Attio targets at the same time, Fix waits on Postgres while Attio waits on HTTP.
+
+    With `incremental` Fix only reads the rows changed since it was last read. All hydrations run to their end. If
+    any failed, the error of Fix is raised first, otherwise that of the first failed target, the others are only
+    logged.
+    """
+    with ThreadPoolExecutor(max_workers=len(targets) + 1, thread_name_prefix="hydrate") as executor:
+        futures = [("Fix", executor.submit(fix.refresh if incremental else fix.hydrate))]
+        futures.extend((attio.name, executor.submit(attio.hydrate)) for attio in targets)
+    errors = [(name, error) for name, future in futures if (error := future.exception()) is not None]
+    for name, error in errors[1:]:
+        log.error(f"Hydrating {name} also failed: {error}")
+    if errors:
+        raise errors[0][1]
+
+
+def sync_fix_to_targets(
+    fix: FixData, targets: list[AttioData], max_changes_percent: int = 10, time_budget: Optional[float] = None
+) -> dict[str, Union[SyncReport, Exception]]:
+    """Syncs one Fix hydration to several Attio workspaces at once, each checked against the threshold on its own."""
+    if not fix.hydrated:
+        fix.hydrate()
+
+    def sync(attio: AttioData) -> SyncReport:
+        threading.current_thread().name = attio.name
+        return sync_fix_to_attio(fix, attio, max_changes_percent=max_changes_percent, time_budget=time_budget)
+
+    results: dict[str, Union[SyncReport, Exception]] = {}
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {attio.name: executor.submit(sync, attio) for attio in targets}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                log.error(f"Sync to {name} failed: {e}")
+                results[name] = e
+    return results
+
+
+@dataclass(eq=False)
+class SyncTask:
+    """One change in Attio, started once all tasks it depends on are done."""
+
+    phase: str
+    items: list[Any]
+    run: Callable[[], Any]
+    after: list["SyncTask"] = field(default_factory=list)
+
+
+def run_tasks(attio: AttioData, tasks: list[SyncTask], budget: Optional[TimeBudget] = None) -> dict[str, list[Any]]:
+    """Runs the tasks concurrently as their dependencies finish, returns the items of tasks that were never started.
+
+    With a time budget a task only starts once all tasks of earlier phases have started, or nothing else runs.
+    """
+    # Dependencies run as well, even when they are not listed themselves
+    tasks = list(dict.fromkeys(dependency for task in tasks for dependency in [*task.after, task]))
+    order = {phase: index for index, phase in enumerate(PHASES)}
+    waiting_for = {task: len(task.after) for task in tasks}
+    dependents: dict[SyncTask, list[SyncTask]] = {}
+    for task in tasks:
+        for dependency in task.after:
+            dependents.setdefault(dependency, []).append(task)
+    ready: list[tuple[int, int, SyncTask]] = []
+    for index, task in enumerate(tasks):
+        if waiting_for[task] == 0:
+            heapq.heappush(ready, (order.get(task.phase, len(order)), index, task))
+    index_of = {task: index for index, task in enumerate(tasks)}
+    unstarted = [0] * (len(order) + 1)
+    for task in tasks:
+        unstarted[order.get(task.phase, len(order))] += 1
+
+    pending: dict[Future[Any], SyncTask] = {}
+    started: set[SyncTask] = set()
+    with ThreadPoolExecutor(max_workers=math.ceil(attio.limiter.max_limit), thread_name_prefix=attio.name) as executor:
+        while len(ready) > 0 or len(pending) > 0:
+            while len(ready) > 0 and len(pending) < int(attio.limiter.limit):
+                if attio.breaker.is_open and not attio.breaker.exhausted:
+                    attio.breaker.wait()
+                if (budget is not None and budget.exhausted()) or attio.breaker.exhausted:
+                    ready.clear()
+                    break
+                rank = ready[0][0]
+                if budget is not None and budget.deadline is not None and len(pending) > 0 and any(unstarted[:rank]):
+                    # Waits for the earlier phases, which would otherwise find the budget spent on later ones
+                    break
+                _, _, task = heapq.heappop(ready)
+                unstarted[rank] -= 1
+                started.add(task)
+                pending[executor.submit(task.run)] = task
+            if len(pending) == 0:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for dependent in dependents.get(pending.pop(future), []):
+                    waiting_for[dependent] -= 1
+                    if waiting_for[dependent] == 0:
+                        heapq.heappush(ready, (order.get(dependent.phase, len(order)), index_of[dependent], dependent))
+
+    deferred: dict[str, list[Any]] = {}
+    for task in tasks:
+        if task not in started:
+            deferred.setdefault(task.phase, []).extend(task.items)
+    return deferred
+
+
+def attio_workspaces_by_fix_id(attio: AttioData) -> dict[UUID, AttioWorkspace]:
+    return {workspace.fix_workspace_id: workspace for workspace in attio.workspaces if workspace.fix_workspace_id}
 
-def create_missing_workspaces(attio: AttioData, workspaces_missing: list[FixWorkspace]) -> None:
-    attio_workspace: Optional[AttioWorkspace]
-    for fix_workspace in workspaces_missing:
-        log.info(f"Creating workspace {fix_workspace.name}")
+
+def track_workspace(run: Callable[[], Any], workspaces_by_fix_id: dict[UUID, AttioWorkspace]) -> Callable[[], Any]:
+    # Users started later link to the workspace record returned by Attio
+    def run_and_track() -> Any:
+        attio_workspace = run()
+        if isinstance(attio_workspace, AttioWorkspace) and attio_workspace.fix_workspace_id is not None:
+            workspaces_by_fix_id[attio_workspace.fix_workspace_id] = attio_workspace
+        return attio_workspace
+
+    return run_and_track
+
+
+def create_missing_workspaces_tasks(
+    attio: AttioData, workspaces_missing: list[FixWorkspace], events: RecordEvents
+) -> dict[UUID, SyncTask]:
+    def create(fix_workspace: FixWorkspace) -> Optional[AttioWorkspace]:
+        events.event("created", "Creating workspace %s", fix_workspace.name)
         try:
-            attio_workspace = attio.assert_record(**fix_workspace.attio_data())  # type: ignore
+            attio_workspace = attio.assert_record(**fix_workspace.attio_data())
             assert isinstance(attio_workspace, AttioWorkspace)
+            return attio_workspace
         except Exception as e:
             log.error(f"Error creating workspace {fix_workspace.name}: {e}")
-
-
-def update_outdated_workspaces(attio: AttioData, workspaces_outdated: list[FixWorkspace]) -> None:
-    attio_workspace: Optional[AttioWorkspace]
-    for fix_workspace in workspaces_outdated:
-        log.info(f"Updating workspace {fix_workspace.name}")
+            return None
+
+    return {
+        workspace.id: SyncTask(events.phase, [workspace], partial(create, workspace))
+        for workspace in workspaces_missing
+    }
+
+
+def create_missing_workspaces(
+    attio: AttioData,
+    workspaces_missing: list[FixWorkspace],
+    budget: Optional[TimeBudget] = None,
+    events: Optional[RecordEvents] = None,
+) -> list[FixWorkspace]:
+    events = events or RecordEvents("workspaces_missing", target=attio.name)
+    tasks = create_missing_workspaces_tasks(attio, workspaces_missing, events)
+    return run_tasks(attio, list(tasks.values()), budget).get(events.phase, [])
+
+
+def update_outdated_workspaces_tasks(
+    attio: AttioData, workspaces_outdated: list[FixWorkspace], events: RecordEvents
+) -> dict[UUID, SyncTask]:
+    def update(fix_workspace: FixWorkspace) -> Optional[AttioWorkspace]:
+        events.event("updated", "Updating workspace %s", fix_workspace.name)
         try:
-            attio_workspace = attio.assert_record(**fix_workspace.attio_data())  # type: ignore
+            attio_workspace = attio.assert_record(**fix_workspace.attio_data())
             assert isinstance(attio_workspace, AttioWorkspace)
+            return attio_workspace
         except Exception as e:
             log.error(f"Error updating workspace {fix_workspace.name}: {e}")
-
-
-def create_missing_users(attio: AttioData, users_missing: list[FixUser]) -> None:
-    attio_user: Optional[AttioUser]
-    attio_person: Optional[AttioPerson]
+            return None
+
+    return {
+        workspace.id: SyncTask(events.phase, [workspace], partial(update, workspace))
+        for workspace in workspaces_outdated
+    }
+
+
+def update_outdated_workspaces(
+    attio: AttioData,
+    workspaces_outdated: list[FixWorkspace],
+    budget: Optional[TimeBudget] = None,
+    events: Optional[RecordEvents] = None,
+) -> list[FixWorkspace]:
+    events = events or RecordEvents("workspaces_outdated", target=attio.name)
+    tasks = update_outdated_workspaces_tasks(attio, workspaces_outdated, events)
+    return run_tasks(attio, list(tasks.values()), budget).get(events.phase, [])
+
+
+def create_missing_users_tasks(
+    attio: AttioData,
+    users_missing: list[FixUser],
+    events: RecordEvents,
+    workspaces_by_fix_id: dict[UUID, AttioWorkspace],
+    workspace_tasks: Optional[dict[UUID, SyncTask]] = None,
+) -> dict[str, SyncTask]:
+    """Tasks creating the missing users, one per email because users sharing an email share a person."""
+    users_by_email: dict[str, list[FixUser]] = {}
     for user in users_missing:
-        log.info(f"Asserting person {user.email}")
+        users_by_email.setdefault(user.email.lower(), []).append(user)
+    if len(users_by_email) == 0:
+        return {}
+
+    def load_people() -> None:
         try:
-            attio_person = attio.assert_record(**user.attio_person())  # type: ignore
-            assert isinstance(attio_person, AttioPerson)
+            attio.load_people(set(users_by_email))
+        except Exception as e:
+            # Not fatal, people are asserted by email and existing ones are updated instead of duplicated
+            log.warning(f"Error looking up people by email: {e}")
+
+    def create(users: list[FixUser]) -> None:
+        email = users[0].email.lower()
+        attio_person = attio.person_by_email(email)
+        if attio_person is None:
+            events.event("people_created", "Asserting person %s", users[0].email)
+            try:
+                attio_person = attio.assert_record(**users[0].attio_person())  # type: ignore
+                assert isinstance(attio_person, AttioPerson)
+            except Exception as e:
+                log.error(f"Error asserting person {users[0].email}: {e}")
+                for user in users[1:]:
+                    log.error(f"Skipping user {user.email}: asserting person failed earlier")
+                return
 
-            workspace_ids = [workspace.id for workspace in user.workspaces]
+        for user in users:
             attio_workspaces = [
-                attio_workspace
-                for attio_workspace in attio.workspaces
-                if attio_workspace.fix_workspace_id in workspace_ids
+                workspaces_by_fix_id[workspace.id]
+                for workspace in user.workspaces
+                if workspace.id in workspaces_by_fix_id
             ]
+            events.event("created", "Creating user %s", user.email)
             try:
-                attio_user = attio.assert_record(**user.attio_data(attio_person, attio_workspaces))  # type: ignore
+                attio_user = attio.assert_record(**user.attio_data(attio_person, attio_workspaces))
                 assert isinstance(attio_user, AttioUser)
-
-                attio_user.person = attio_person
-                attio_person.users.append(attio_user)
-                attio_user.workspaces.extend(attio_workspaces)
-                for attio_workspace in attio_workspaces:
-                    attio_workspace.users.append(attio_user)
             except Exception as e:
                 log.error(f"Error asserting user {user.email}: {e}")
-        except Exception as e:
-            log.error(f"Error asserting person {user.email}: {e}")
-
 
-def update_outdated_users(attio: AttioData, users_outdated: list[FixUser]) -> None:
-    attio_user: Optional[AttioUser]
-    attio_person: Optional[AttioPerson]
-    for user in users_outdated:
-        attio_user = None
-        for au in attio.users:
-            if au.id == user.id:
-                attio_user = au
-                break
+    lookup = SyncTask(events.phase, [], load_people)
+    tasks = {}
+    for email, users in users_by_email.items():
+        after = [lookup] + workspace_dependencies(users, workspace_tasks)
+        tasks[email] = SyncTask(events.phase, users, partial(create, users), after)
+    return tasks
+
+
+def create_missing_users(
+    attio: AttioData,
+    users_missing: list[FixUser],
+    budget: Optional[TimeBudget] = None,
+    events: Optional[RecordEvents] = None,
+) -> list[FixUser]:
+    events = events or RecordEvents("users_missing", target=attio.name)
+    tasks = create_missing_users_tasks(attio, users_missing, events, attio_workspaces_by_fix_id(attio))
+    return run_tasks(attio, list(tasks.values()), budget).get(events.phase, [])
+
+
+def workspace_dependencies(users: list[FixUser], workspace_tasks: Optional[dict[UUID, SyncTask]]) -> list[SyncTask]:
+    if not workspace_tasks:
+        return []
+    ids = {workspace.id for user in users for workspace in user.workspaces}
+    return [workspace_tasks[workspace_id] for workspace_id in ids if workspace_id in workspace_tasks]
+
+
+def update_outdated_users_tasks(
+    attio: AttioData,
+    users_outdated: list[FixUser],
+    events: RecordEvents,
+    workspaces_by_fix_id: dict[UUID, AttioWorkspace],
+    workspace_tasks: Optional[dict[UUID, SyncTask]] = None,
+) -> list[SyncTask]:
+    attio_users_by_id = {attio_user.id: attio_user for attio_user in attio.users}
+
+    def update(user: FixUser) -> None:
+        attio_user = attio_users_by_id.get(user.id)
         if attio_user is None:
             log.error(f"User {user.email} ({user.id}) not found in Attio - skipping")
-            continue
-        log.info(f"Updating user {user.email}")
+            return
+        events.event("updated", "Updating user %s", user.email)
         attio_person = attio_user.person
-        workspace_ids = [workspace.id for workspace in user.workspaces]
         attio_workspaces = [
-            attio_workspace for attio_workspace in attio.workspaces if attio_workspace.fix_workspace_id in workspace_ids
+            workspaces_by_fix_id[workspace.id] for workspace in user.workspaces if workspace.id in workspaces_by_fix_id
         ]
         try:
             attio_user = attio.assert_record(**user.attio_data(attio_person, attio_workspaces))  # type: ignore
@@ -128,128 +458,111 @@ def update_outdated_users(attio: AttioData, users_outdated: list[FixUser]) -> No
         except Exception as e:
             log.error(f"Error updating user {user.email}: {e}")
 
+    return [
+        SyncTask(events.phase, [user], partial(update, user), workspace_dependencies([user], workspace_tasks))
+        for user in users_outdated
+    ]
 
-def delete_obsolete_workspaces(attio: AttioData, obsolete_workspaces: list[AttioWorkspace]) -> None:
-    attio_workspace: Optional[AttioWorkspace]
-    for attio_workspace in obsolete_workspaces:
-        log.info(f"Deleting workspace {attio_workspace.name} ({attio_workspace.fix_workspace_id})")
-        try:
-            attio.delete_record(attio_workspace.api_object, attio_workspace.record_id)
-        except Exception as e:
-            log.error(f"Error deleting workspace {attio_workspace.name} ({attio_workspace.fix_workspace_id}): {e}")
 
+def update_outdated_users(
+    attio: AttioData,
+    users_outdated: list[FixUser],
+    budget: Optional[TimeBudget] = None,
+    events: Optional[RecordEvents] = None,
+) -> list[FixUser]:
+    events = events or RecordEvents("users_outdated", target=attio.name)
+    tasks = update_outdated_users_tasks(attio, users_outdated, events, attio_workspaces_by_fix_id(attio))
+    return run_tasks(attio, tasks, budget).get(events.phase, [])
 
-def delete_obsolete_users_and_people(attio: AttioData, obsolete_users: list[AttioUser]) -> None:
-    attio_user: Optional[AttioUser]
-    attio_person: Optional[AttioPerson]
-    for attio_user in obsolete_users:
-        log.info(f"Deleting user {attio_user.email} ({attio_user.user_id})")
+
+def delete_obsolete_workspaces_tasks(
+    attio: AttioData, obsolete_workspaces: list[AttioWorkspace], events: RecordEvents
+) -> list[SyncTask]:
+    def delete(attio_workspace: AttioWorkspace) -> None:
+        events.event("deleted", "Deleting workspace %s (%s)", attio_workspace.name, attio_workspace.fix_workspace_id)
         try:
-            attio_person = attio_user.person
-            attio.delete_record(attio_user.api_object, attio_user.record_id)
-            if attio_person is not None:
-                assert isinstance(attio_person, AttioPerson)
-                if len(attio_person.users) == 0:
-                    log.info(f"Deleting person {attio_person.email} ({attio_person.record_id}) with no users")
-                    try:
-                        attio.delete_record(attio_person.api_object, attio_person.record_id)
-                    except Exception as e:
-                        log.error(f"Error deleting person {attio_person.email} ({attio_person.record_id}): {e}")
+            attio.delete_record(attio_workspace.api_object, attio_workspace.record_id)
         except Exception as e:
-            log.error(f"Error deleting user {attio_user.email} ({attio_user.user_id}): {e}")
-
-
-def workspaces_missing_in_attio(fix: FixData, attio: AttioData) -> list[FixWorkspace]:
-    fix_workspace_ids = {workspace.id for workspace in fix.workspaces}
-    attio_workspace_ids = {workspace.id for workspace in attio.workspaces}
-
-    missing = fix_workspace_ids - attio_workspace_ids
-
-    log.debug(f"Number of workspaces missing in Attio: {len(missing)}")
-
-    return [fix_workspace for fix_workspace in fix.workspaces if fix_workspace.id in missing]
-
-
-def users_missing_in_attio(fix: FixData, attio: AttioData) -> list[FixUser]:
-    fix_user_ids = {user.id for user in fix.users}
-    attio_user_ids = {user.id for user in attio.users}
-
-    missing = fix_user_ids - attio_user_ids
-
-    log.debug(f"Number of users missing in Attio: {len(missing)}")
-
-    return [fix_user for fix_user in fix.users if fix_user.id in missing]
-
-
-def users_no_longer_in_fix(fix: FixData, attio: AttioData) -> list[AttioUser]:
-    fix_user_ids = {user.id for user in fix.users}
-    attio_user_ids = {user.id for user in attio.users}
-
-    missing = attio_user_ids - fix_user_ids
-
-    log.debug(f"Number of users no longer in Fix: {len(missing)}")
-
-    return [attio_user for attio_user in attio.users if attio_user.id in missing]
-
-
-def workspaces_no_longer_in_fix(fix: FixData, attio: AttioData) -> list[AttioWorkspace]:
-    fix_workspace_ids = {workspace.id for workspace in fix.workspaces}
-    attio_workspace_ids = {workspace.id for workspace in attio.workspaces}
-
-    missing = attio_workspace_ids - fix_workspace_ids
-
-    log.debug(f"Number of workspaces no longer in Fix: {len(missing)}")
-
-    return [attio_workspace for attio_workspace in attio.workspaces if attio_workspace.id in missing]
-
-
-def users_outdated_in_attio(fix: FixData, attio: AttioData) -> list[FixUser]:
-    fix_user_ids = {user.id for user in fix.users}
-    attio_user_ids = {user.id for user in attio.users}
-
-    common_user_ids = fix_user_ids & attio_user_ids
-
-    fix_users_by_id = {user.id: user for user in fix.users}
-    attio_users_by_id = {user.id: user for user in attio.users}
-
-    outdated = set()
-
-    for user_id in common_user_ids:
-        fix_user = fix_users_by_id[user_id]
-        attio_user = attio_users_by_id[user_id]
-
-        if fix_user != attio_user:
-            outdated.add(user_id)
-
-    log.debug(f"Number of outdated users in Attio: {len(outdated)}")
-
-    return [fix_user for fix_user in fix.users if fix_user.id in outdated]
-
-
-def workspaces_outdated_in_attio(fix: FixData, attio: AttioData) -> list[FixWorkspace]:
-    fix_workspace_ids = {workspace.id for workspace in fix.workspaces}
-    attio_workspace_ids = {workspace.id for workspace in attio.workspaces}
-
-    common_workspace_ids = fix_workspace_ids & attio_workspace_ids
+            log.error(f"Error deleting workspace {attio_workspace.name} ({attio_workspace.fix_workspace_id}): {e}")
 
-    fix_workspaces_by_id = {workspace.id: workspace for workspace in fix.workspaces}
-    attio_workspaces_by_id = {workspace.id: workspace for workspace in attio.workspaces}
+    return [SyncTask(events.phase, [workspace], partial(delete, workspace)) for workspace in obsolete_workspaces]
 
-    outdated = set()
 
-    for workspace_id in common_workspace_ids:
-        fix_workspace = fix_workspaces_by_id[workspace_id]
-        attio_workspace = attio_workspaces_by_id[workspace_id]
+def delete_obsolete_workspaces(
+    attio: AttioData,
+    obsolete_workspaces: list[AttioWorkspace],
+    budget: Optional[TimeBudget] = None,
+    events: Optional[RecordEvents] = None,
+) -> list[AttioWorkspace]:
+    events = events or RecordEvents("workspaces_obsolete", target=attio.name)
+    return run_tasks(attio, delete_obsolete_workspaces_tasks(attio, obsolete_workspaces, events), budget).get(
+        events.phase, []
+    )
 
-        if fix_workspace != attio_workspace:
-            outdated.add(workspace_id)
 
-    log.debug(f"Number of outdated workspaces in Attio: {len(outdated)}")
+def delete_obsolete_users_and_people_tasks(
+    attio: AttioData,
+    obsolete_users: list[AttioUser],
+    events: RecordEvents,
+    user_tasks: Optional[dict[str, SyncTask]] = None,
+) -> list[SyncTask]:
+    # Users sharing a person are deleted one after another so that only the last one deletes the person
+    users_by_person: dict[int, list[AttioUser]] = {}
+    for attio_user in obsolete_users:
+        users_by_person.setdefault(id(attio_user.person or attio_user), []).append(attio_user)
 
-    return [fix_workspace for fix_workspace in fix.workspaces if fix_workspace.id in outdated]
+    def delete(attio_users: list[AttioUser]) -> None:
+        for attio_user in attio_users:
+            events.event("deleted", "Deleting user %s (%s)", attio_user.email, attio_user.user_id)
+            try:
+                attio_person = attio_user.person
+                attio.delete_record(attio_user.api_object, attio_user.record_id)
+                if attio_person is not None:
+                    assert isinstance(attio_person, AttioPerson)
+                    if not attio.person_in_use(attio_person):
+                        events.event(
+                            "people_deleted",
+                            "Deleting person %s (%s) with no users",
+                            attio_person.email,
+                            attio_person.record_id,
+                        )
+                        try:
+                            attio.delete_record(attio_person.api_object, attio_person.record_id)
+                        except Exception as e:
+                            log.error(f"Error deleting person {attio_person.email} ({attio_person.record_id}): {e}")
+            except Exception as e:
+                log.error(f"Error deleting user {attio_user.email} ({attio_user.user_id}): {e}")
+
+    tasks = []
+    for attio_users in users_by_person.values():
+        # A new user with the same email takes over the person, which then must not be deleted
+        person = attio_users[0].person
+        email = person.email.lower() if isinstance(person, AttioPerson) and person.email else None
+        after = [user_tasks[email]] if user_tasks and email in user_tasks else []
+        tasks.append(SyncTask(events.phase, attio_users, partial(delete, attio_users), after))
+    return tasks
+
+
+def delete_obsolete_users_and_people(
+    attio: AttioData,
+    obsolete_users: list[AttioUser],
+    budget: Optional[TimeBudget] = None,
+    events: Optional[RecordEvents] = None,
+) -> list[AttioUser]:
+    events = events or RecordEvents("users_obsolete", target=attio.name)
+    return run_tasks(attio, delete_obsolete_users_and_people_tasks(attio, obsolete_users, events), budget).get(
+        events.phase, []
+    )
 
 
 def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--time-budget",
+        dest="time_budget",
+        help="Max. seconds to spend applying changes, the least important ones are deferred (default: unlimited)",
+        type=float,
+        default=None,
+    )
     arg_parser.add_argument(
         "--modification-threshold",
         dest="modification_threshold",
@@ -0,0 +1,133 @@
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from argparse import ArgumentParser
+from typing import Optional, Sequence, TypeVar
+from .logger import log
+from .attiodata import AttioData
+from .attioresources import AttioUser, AttioWorkspace
+from .fixdata import FixData
+from .mapping import MappedResource
+
+M = TypeVar("M", bound=MappedResource)
+
+
+@dataclass
+class DriftEstimate:
+    population: int
+    sampled: int = 0
+    missing: list[MappedResource] = field(default_factory=list)
+    outdated: list[MappedResource] = field(default_factory=list)
+
+    @property
+    def drifted(self) -> int:
+        return len(self.missing) + len(self.outdated)
+
+    @property
+    def rate(self) -> float:
+        return self.drifted / self.sampled if self.sampled else 0.0
+
+    def interval(self, confidence: float = 0.95) -> tuple[float, float]:
+        """Wilson score interval of the drift rate, narrowed by the finite population correction."""
+        if self.sampled == 0:
+            return 0.0, 1.0
+        if self.sampled >= self.population:
+            return self.rate, self.rate
+        n = self.sampled * (self.population - 1) / (self.population - self.sampled)
+        z = NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+        center = (self.rate + z**2 / (2 * n)) / (1 + z**2 / n)
+        margin = z / (1 + z**2 / n) * math.sqrt(self.rate * (1 - self.rate) / n + z**2 / (4 * n**2))
+        return max(0.0, center - margin), min(1.0, center + margin)
+
+
+@dataclass
+class VerifyReport:
+    users: DriftEstimate
+    workspaces: DriftEstimate
+    duration: float = 0.0
+    confidence: float = 0.95
+
+
+def verify_sample(fix: FixData, attio: AttioData, sample: int, seed: Optional[int] = None) -> VerifyReport:
+    """Compare `sample` random Fix users and workspaces with just their Attio records, without hydrating Attio.
+
+    Only drift of records that exist in Fix is found this way, records left behind in Attio are not.
+    """
+    started_at = time.monotonic()
+    rng = random.Random(seed)
+    fix_users = pick(rng, fix.users, sample)
+    fix_workspaces = pick(rng, fix.workspaces, sample)
+
+    users = [
+        AttioUser.make(record)
+        for record in attio._records_by_attribute(
+            "users", "user_id", sorted(str(user.id) for user in fix_users), AttioUser.attributes
+        )
+    ]
+    workspaces = [
+        AttioWorkspace.make(record)
+        for record in attio._records_by_attribute(
+            "workspaces",
+            "workspace_id",
+            sorted(str(workspace.id) for workspace in fix_workspaces),
+            AttioWorkspace.attributes,
+        )
+    ]
+    # Users are compared including the workspaces they are linked to
+    workspaces_by_record_id = {workspace.record_id: workspace for workspace in workspaces}
+    refs = {ref for user in users for ref in user.workspace_refs or [] if ref not in workspaces_by_record_id}
+    for record in attio._records_by_id("workspaces", refs, AttioWorkspace.attributes):
+        workspace = AttioWorkspace.make(record)
+        workspaces_by_record_id[workspace.record_id] = workspace
+    for user in users:
+        for ref in user.workspace_refs or []:
+            if ref in workspaces_by_record_id:
+                user.workspaces.add(workspaces_by_record_id[ref])
+
+    return VerifyReport(
+        users=compare(fix_users, users, len(fix.users)),
+        workspaces=compare(fix_workspaces, workspaces, len(fix.workspaces)),
+        duration=time.monotonic() - started_at,
+    )
+
+
+def pick(rng: random.Random, population: Sequence[M], sample: int) -> list[M]:
+    return rng.sample(list(population), min(sample, len(population)))
+
+
+def compare(fix_resources: list[M], attio_resources: Sequence[MappedResource], population: int) -> DriftEstimate:
+    attio_by_id = {getattr(resource, "id"): resource for resource in attio_resources}
+    estimate = DriftEstimate(population=population, sampled=len(fix_resources))
+    for resource in fix_resources:
+        attio_resource = attio_by_id.get(getattr(resource, "id"))
+        if attio_resource is None:
+            estimate.missing.append(resource)
+        elif resource != attio_resource:
+            estimate.outdated.append(resource)
+    return estimate
+
+
+def log_verification(report: VerifyReport) -> None:
+    for kind, estimate in [("users", report.users), ("workspaces", report.workspaces)]:
+        low, high = estimate.interval(report.confidence)
+        log.info(
+            f"Sampled {estimate.sampled} of {estimate.population} {kind}: {len(estimate.missing)} missing,"
+            f" {len(estimate.outdated)} outdated in Attio - estimated drift {estimate.rate:.1%}"
+            f" ({report.confidence:.0%} CI {low:.1%}-{high:.1%})"
+        )
+        for resource in estimate.missing + estimate.outdated:
+            log.debug(f"Drifted {kind[:-1]}: {getattr(resource, 'id')}")
+    log.info(f"Verification took {report.duration:.1f}s")
+
+
+def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--verify-sample",
+        dest="verify_sample",
+        help="Only compare N random Fix users and workspaces with their Attio records and estimate the drift",
+        type=int,
+        metavar="N",
+        default=None,
+    )
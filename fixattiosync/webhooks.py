@@ -0,0 +1,177 @@
+from __future__ import annotations
+import os
+import sys
+import hmac
+import json
+import queue
+import hashlib
+import threading
+from uuid import UUID
+from argparse import ArgumentParser
+from typing import Any, Iterable, Mapping, Optional
+from .logger import log
+from .attiodata import AttioData
+
+SIGNATURE_HEADER = "Attio-Signature"
+OBJECTS = frozenset({"users", "people", "workspaces"})
+
+
+def signature(secret: str, body: bytes) -> str:
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class WebhookReceiver:
+    """Applies Attio record webhooks to the resident AttioData of each target.
+
+    Every target gets its own webhook URL, /webhooks/<target name>. Events only carry record ids, so created and
+    updated records are fetched and decoded like hydrate() does, deleted ones are forgotten. Events are applied one
+    after another by a worker thread, in the order they were received, so the HTTP response doesn't wait for Attio.
+    Requests for a target without a secret are rejected, unless `insecure` accepts them unsigned.
+    """
+
+    def __init__(
+        self, targets: list[AttioData], secrets: Optional[dict[str, str]] = None, insecure: bool = False
+    ) -> None:
+        self.targets = {attio.name: attio for attio in targets}
+        self.secrets = secrets or {}
+        self.insecure = insecure
+        self.stats: dict[str, int] = {"received": 0, "applied": 0, "ignored": 0, "failed": 0}
+        self.__events: queue.Queue[Optional[tuple[AttioData, dict[str, Any]]]] = queue.Queue()
+        self.__worker: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.__worker is None:
+            self.__worker = threading.Thread(target=self.__apply_events, name="webhooks", daemon=True)
+            self.__worker.start()
+
+    def stop(self) -> None:
+        if self.__worker is not None:
+            self.__events.put(None)
+            self.__worker.join()
+            self.__worker = None
+
+    def wait(self) -> None:
+        """Block until all received events are applied."""
+        self.__events.join()
+
+    def receive(self, name: str, body: bytes, headers: Mapping[str, str]) -> int:
+        """Queue the events of one webhook request and return the HTTP status to respond with."""
+        attio = self.targets.get(name)
+        if attio is None:
+            return 404
+        secret = self.secrets.get(name) or self.secrets.get("")
+        if secret is None and not self.insecure:
+            log.warning(f"Rejected webhook for {name}, no secret is configured")
+            return 401
+        # Header names are case-insensitive, proxies speaking HTTP/2 send them in lowercase
+        received = next((value for key, value in headers.items() if key.lower() == SIGNATURE_HEADER.lower()), "")
+        if secret is not None and not hmac.compare_digest(received, signature(secret, body)):
+            log.warning(f"Rejected webhook for {name} with invalid signature")
+            return 401
+        try:
+            events = json.loads(body).get("events", [])
+        except (ValueError, AttributeError):
+            return 400
+        for event in events:
+            self.stats["received"] += 1
+            self.__events.put((attio, event))
+        return 202
+
+    def __apply_events(self) -> None:
+        while (item := self.__events.get()) is not None:
+            attio, event = item
+            try:
+                self.stats["applied" if apply_event(attio, event) else "ignored"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                log.error(f"Error applying webhook event {event.get('event_type')} to {attio.name}: {e}")
+            finally:
+                self.__events.task_done()
+        self.__events.task_done()
+
+
+def apply_event(attio: AttioData, event: dict[str, Any]) -> bool:
+    """Apply one record event to the local state, returns False for events that don't concern synced records."""
+    event_type = event.get("event_type")
+    if event_type not in ("record.created", "record.updated", "record.deleted"):
+        return False
+    actor = event.get("actor") or {}
+    if attio.api_actor_id is not None and actor.get("type") == "api-token" and actor.get("id") == attio.api_actor_id:
+        # Caused by our own write, which is already applied locally
+        return False
+    object_id = attio.object_slug(event["id"]["object_id"])
+    if object_id not in OBJECTS:
+        return False
+    record_id = UUID(event["id"]["record_id"])
+    log.debug(f"Applying {event_type} of {object_id} {record_id} to {attio.name}")
+    if event_type == "record.deleted":
+        return attio.forget_record(object_id, record_id)
+    return attio.refresh_record(object_id, record_id)
+
+
+def parse_webhook_secrets(secrets: Optional[list[str]]) -> dict[str, str]:
+    """Parse `name=secret` entries, a secret without a name applies to every target."""
+    if not secrets:
+        secrets = [s for s in os.environ.get("ATTIO_WEBHOOK_SECRET", "").split(",") if s]
+    parsed = {}
+    for secret in secrets:
+        name, sep, value = secret.partition("=")
+        if sep and name.isidentifier():
+            parsed[name] = value
+        else:
+            parsed[""] = secret
+    return parsed
+
+
+def replay_events(url: str, payloads: Iterable[dict[str, Any]], secret: Optional[str] = None) -> list[int]:
+    """Post recorded webhook payloads to a receiver, e.g. to test it locally. Returns the response codes."""
+    import requests
+
+    statuses = []
+    for payload in payloads:
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        if secret is not None:
+            headers[SIGNATURE_HEADER] = signature(secret, body)
+        statuses.append(requests.post(url, data=body, headers=headers, timeout=10).status_code)
+    return statuses
+
+
+def add_args(arg_parser: ArgumentParser) -> None:
+    arg_parser.add_argument(
+        "--attio-webhooks",
+        dest="attio_webhooks",
+        help="Apply Attio record webhooks posted to /webhooks/<target> in serve mode",
+        action="store_true",
+        default=os.environ.get("ATTIO_WEBHOOKS", "false").lower() == "true",
+    )
+    arg_parser.add_argument(
+        "--attio-webhook-secret",
+        dest="attio_webhook_secrets",
+        help="Secret the Attio webhook signs its requests with, as name=secret per target (repeatable)",
+        action="append",
+        default=None,
+    )
+    arg_parser.add_argument(
+        "--attio-webhooks-insecure",
+        dest="attio_webhooks_insecure",
+        help="Accept unsigned Attio webhooks for targets without a secret, e.g. behind an authenticating proxy",
+        action="store_true",
+        default=os.environ.get("ATTIO_WEBHOOKS_INSECURE", "false").lower() == "true",
+    )
+
+
+def main() -> None:
+    # Replays a file with one recorded webhook payload per line: python -m fixattiosync.webhooks FILE URL [SECRET]
+    if len(sys.argv) < 3:
+        print(f"Usage: {sys.argv[0]} FILE URL [SECRET]", file=sys.stderr)
+        sys.exit(1)
+    with open(sys.argv[1]) as f:
+        payloads = [json.loads(line) for line in f if line.strip()]
+    statuses = replay_events(sys.argv[2], payloads, sys.argv[3] if len(sys.argv) > 3 else None)
+    print(f"Replayed {len(statuses)} payloads: {statuses}")
+    sys.exit(0 if all(status < 300 for status in statuses) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import pytest
+from typing import Any, Callable
+from fakes import FakeAttioData
+
+
+@pytest.fixture
+def fake_attio() -> Callable[[dict[str, list[dict[str, Any]]]], FakeAttioData]:
+    def make(records: dict[str, list[dict[str, Any]]]) -> FakeAttioData:
+        attio = FakeAttioData(records)
+        attio.hydrate()
+        attio.calls.clear()
+        return attio
+
+    return make
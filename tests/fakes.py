@@ -0,0 +1,282 @@
+"""Factories and fakes shared by the tests."""
+
+from datetime import datetime, timezone
+from json import dumps
+from uuid import UUID, uuid4
+from typing import Any, Callable, Iterator, Optional
+from fixattiosync.attiodata import AttioData
+from fixattiosync.fixdata import FixData
+from fixattiosync.fixresources import FixCloudAccount, FixUser, FixWorkspace, FixRoles
+
+ATTIO_WORKSPACE_ID = UUID("00000000-0000-0000-0000-00000000a771")
+OBJECT_IDS = {
+    "workspaces": UUID("00000000-0000-0000-0000-000000000001"),
+    "people": UUID("00000000-0000-0000-0000-000000000002"),
+    "users": UUID("00000000-0000-0000-0000-000000000003"),
+}
+CREATED_AT = datetime(2024, 9, 1, 12, 0, 0, tzinfo=timezone.utc)
+API_TOKEN_ACTOR = {"type": "api-token", "id": "00000000-0000-0000-0000-00000000a91c"}
+
+
+def record_envelope(object_id: str, record_id: UUID, values: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "id": {
+            "workspace_id": str(ATTIO_WORKSPACE_ID),
+            "object_id": str(OBJECT_IDS[object_id]),
+            "record_id": str(record_id),
+        },
+        "created_at": CREATED_AT.isoformat(),
+        "values": values,
+    }
+
+
+def attio_workspace_record(fix_workspace: FixWorkspace, record_id: Optional[UUID] = None) -> dict[str, Any]:
+    values = {
+        "workspace_id": [{"value": str(fix_workspace.id)}],
+        "name": [{"value": fix_workspace.name}],
+        "product_tier": [{"option": {"title": fix_workspace.tier}}],
+        "status": [{"status": {"title": fix_workspace.status.value}}],
+        "cloud_account_connected": [{"value": fix_workspace.cloud_account_connected}],
+    }
+    return record_envelope("workspaces", record_id or uuid4(), values)
+
+
+def attio_person_record(email: str, record_id: Optional[UUID] = None) -> dict[str, Any]:
+    values = {"email_addresses": [{"email_address": email}]}
+    return record_envelope("people", record_id or uuid4(), values)
+
+
+def attio_user_record(
+    fix_user: FixUser,
+    person_record_id: Optional[UUID] = None,
+    workspace_record_ids: Optional[list[UUID]] = None,
+    record_id: Optional[UUID] = None,
+) -> dict[str, Any]:
+    assert fix_user.registered_at is not None
+    values: dict[str, Any] = {
+        "user_id": [{"value": str(fix_user.id)}],
+        "primary_email_address": [{"email_address": fix_user.email}],
+        "status": [{"status": {"title": "Signed up"}}],
+        "registered_at": [{"value": fix_user.registered_at.isoformat()}],
+        "user_email_notifications_disabled": [{"value": fix_user.user_email_notifications_disabled}],
+        "at_least_one_cloud_account_connected": [{"value": fix_user.at_least_one_cloud_account_connected}],
+        "is_main_user_in_at_least_one_workspace": [{"value": fix_user.is_main_user_in_at_least_one_workspace}],
+        "cloud_account_connected_workspace_name": [{"value": fix_user.cloud_account_connected_workspace_name}],
+        "workspace_has_subscription": [{"value": fix_user.workspace_has_subscription}],
+    }
+    if fix_user.last_active_at is not None:
+        values["last_activity_3"] = [{"value": fix_user.last_active_at.isoformat()}]
+    if person_record_id is not None:
+        values["person"] = [{"target_object": "people", "target_record_id": str(person_record_id)}]
+    if workspace_record_ids:
+        values["workspace"] = [
+            {"target_object": "workspaces", "target_record_id": str(workspace_record_id)}
+            for workspace_record_id in workspace_record_ids
+        ]
+    return record_envelope("users", record_id or uuid4(), values)
+
+
+def make_fix_workspace(name: str = "Workspace", **kwargs: Any) -> FixWorkspace:
+    data: dict[str, Any] = {
+        "id": uuid4(),
+        "slug": name.lower(),
+        "name": name,
+        "external_id": uuid4(),
+        "tier": "Free",
+        "subscription_id": None,
+        "payment_on_hold_since": None,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+        "owner_id": uuid4(),
+        "highest_current_cycle_tier": None,
+        "current_cycle_ends_at": None,
+        "tier_updated_at": None,
+    }
+    data.update(kwargs)
+    return FixWorkspace(**data)
+
+
+def make_fix_cloud_account(workspace: FixWorkspace, **kwargs: Any) -> FixCloudAccount:
+    data: dict[str, Any] = {
+        "id": uuid4(),
+        "tenant_id": workspace.id,
+        "cloud": "aws",
+        "account_id": "123456789012",
+        "aws_role_name": None,
+        "aws_external_id": None,
+        "is_configured": False,
+        "enabled": True,
+        "privileged": False,
+        "user_account_name": None,
+        "api_account_name": None,
+        "api_account_alias": None,
+        "state": None,
+        "error": None,
+        "last_scan_duration_seconds": 0,
+        "last_scan_started_at": None,
+        "last_scan_resources_scanned": 0,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+        "state_updated_at": CREATED_AT,
+        "version_id": 0,
+        "cf_stack_version": None,
+        "scan": True,
+        "failed_scan_count": 0,
+        "gcp_service_account_key_id": None,
+        "last_task_id": None,
+        "azure_credential_id": None,
+        "last_scan_resources_errors": 0,
+        "last_degraded_scan_started_at": None,
+    }
+    data.update(kwargs)
+    cloud_account = FixCloudAccount(**data)
+    workspace.cloud_accounts.append(cloud_account)
+    return cloud_account
+
+
+def make_fix_user(email: str, workspaces: Optional[list[FixWorkspace]] = None, **kwargs: Any) -> FixUser:
+    data: dict[str, Any] = {
+        "id": uuid4(),
+        "email": email,
+        "hashed_password": "",
+        "is_active": True,
+        "is_superuser": False,
+        "is_verified": True,
+        "otp_secret": None,
+        "is_mfa_active": False,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+    }
+    data.update(kwargs)
+    user = FixUser(**data)
+    for workspace in workspaces or []:
+        user.workspaces.append(workspace)
+        user.workspace_roles[workspace.id] = FixRoles.workspace_owner
+        workspace.users.append(user)
+        workspace.user_roles[user.id] = FixRoles.workspace_owner
+    user.update_info()
+    return user
+
+
+class StaticFixData(FixData):
+    """FixData serving fixed users and workspaces instead of reading the database."""
+
+    def __init__(self, users: list[FixUser], workspaces: list[FixWorkspace]) -> None:
+        super().__init__(db="fix", user="fix", password="fix")
+        self.static_users = users
+        self.static_workspaces = workspaces
+        self.hydrations = 0
+        self.refreshes = 0
+
+    @property
+    def users(self) -> list[FixUser]:
+        return self.static_users
+
+    @property
+    def workspaces(self) -> list[FixWorkspace]:
+        return self.static_workspaces
+
+    def hydrate(self) -> None:
+        self.hydrations += 1
+        self.hydrated = True
+
+    def refresh(self) -> None:
+        self.refreshes += 1
+        self.hydrated = True
+
+
+def matches(record: dict[str, Any], filter: Optional[dict[str, Any]]) -> bool:
+    """Evaluates the subset of Attio's filter syntax used by AttioData."""
+    if filter is None:
+        return True
+    for key, condition in filter.items():
+        if key == "$or":
+            if not any(matches(record, sub_filter) for sub_filter in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(record, sub_filter) for sub_filter in condition):
+                return False
+        elif key == "created_at":
+            if datetime.fromisoformat(record["created_at"]) < datetime.fromisoformat(condition["$gte"]):
+                return False
+        elif key == "record_id":
+            if record["id"]["record_id"] not in condition["$in"]:
+                return False
+        elif isinstance(condition, dict) and "$not_empty" in condition:
+            if bool(record["values"].get(key)) != condition["$not_empty"]:
+                return False
+        else:
+            values = record["values"].get(key, [])
+            if not any(condition.lower() == str(next(iter(value.values()))).lower() for value in values):
+                return False
+    return True
+
+
+class FakeAttioData(AttioData):
+    """AttioData talking to an in-memory record store instead of the Attio API."""
+
+    def __init__(self, records: dict[str, list[dict[str, Any]]]) -> None:
+        super().__init__("fake-api-key")
+        self.records = records
+        self.calls: list[tuple[str, str]] = []
+
+    def _request(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[dict[str, Any]] = None,
+        params: Optional[dict[str, str]] = None,
+        timeout: int = 10,
+    ) -> dict[str, Any]:
+        self.calls.append((method, endpoint))
+        parts = endpoint.split("/")
+        object_id = parts[1]
+        if method == "POST" and parts[-1] == "query":
+            assert json is not None
+            offset = int(json.get("offset", 0))
+            limit = int(json.get("limit", self.default_limit))
+            records = [record for record in self.records.get(object_id, []) if matches(record, json.get("filter"))]
+            for sort in reversed(json.get("sorts", [])):
+                assert sort["attribute"] == "created_at"
+                records.sort(key=lambda r: datetime.fromisoformat(r["created_at"]), reverse=sort["direction"] == "desc")
+            # Shallow copies, so that dropping unused attributes doesn't touch the stored records
+            return {"data": [dict(record) for record in records[offset : offset + limit]]}
+        if method == "PUT":
+            assert json is not None
+            record = record_envelope(object_id, uuid4(), json["data"]["values"])
+            written = {"active_from": datetime.now(timezone.utc).isoformat(), "created_by_actor": API_TOKEN_ACTOR}
+            record["values"] = {
+                key: [
+                    {**item, **written}
+                    for item in (
+                        value if isinstance(value, list) else [value] if isinstance(value, dict) else [{"value": value}]
+                    )
+                ]
+                for key, value in json["data"]["values"].items()
+            }
+            return {"data": record}
+        if method == "DELETE":
+            return {}
+        if method == "GET" and len(parts) == 2:
+            slug = next(slug for slug, object_uuid in OBJECT_IDS.items() if str(object_uuid) == parts[1])
+            return {"data": {"api_slug": slug}}
+        if method == "GET" and parts[2] == "records":
+            record = next(r for r in self.records.get(object_id, []) if r["id"]["record_id"] == parts[3])
+            return {"data": dict(record)}
+        raise AssertionError(f"Unexpected request {method} {endpoint}")
+
+    def _request_records(
+        self,
+        method: str,
+        endpoint: str,
+        json: Optional[dict[str, Any]] = None,
+        params: Optional[dict[str, str]] = None,
+        timeout: int = 10,
+        with_text: bool = False,
+    ) -> Iterator[Any]:
+        records = self._request(method, endpoint, json=json, params=params, timeout=timeout).get("data", [])
+        for record in records:
+            yield (record, dumps(record)) if with_text else record
+
+    def calls_to(self, method: str, object_id: str) -> int:
+        return sum(1 for m, endpoint in self.calls if m == method and endpoint.split("/")[1] == object_id)
@@ -0,0 +1,157 @@
+from datetime import timedelta
+from unittest.mock import patch
+from uuid import uuid4
+from fakes import (
+    CREATED_AT,
+    FakeAttioData,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+    record_envelope,
+)
+from fixattiosync.attiodata import parse_attio_targets
+from fixattiosync.attioresources import AttioPerson, AttioUser, AttioWorkspace, flatten, unflatten
+
+
+def test_hydrate_fetches_only_synced_records(fake_attio):
+    workspace = make_fix_workspace("Synced")
+    user = make_fix_user("linked@example.com", [workspace])
+    linked_person = attio_person_record("linked@example.com")
+    manual_workspace = record_envelope("workspaces", uuid4(), {"name": [{"value": "Manual"}]})
+    attio = fake_attio(
+        {
+            "workspaces": [attio_workspace_record(workspace), manual_workspace],
+            "people": [linked_person, attio_person_record("unlinked@example.com")],
+            "users": [
+                attio_user_record(user, linked_person["id"]["record_id"]),
+                record_envelope("users", uuid4(), {"primary_email_address": [{"email_address": "x@example.com"}]}),
+            ],
+        }
+    )
+
+    assert [w.name for w in attio.workspaces] == ["Synced"]
+    assert [u.email for u in attio.users] == ["linked@example.com"]
+    assert [p.email for p in attio.people] == ["linked@example.com"]
+    assert attio.person_by_email("unlinked@example.com") is None
+
+
+def test_load_people_fetches_unlinked_people_once(fake_attio):
+    workspace = make_fix_workspace()
+    attio = fake_attio(
+        {
+            "workspaces": [attio_workspace_record(workspace)],
+            "people": [attio_person_record("unlinked@example.com")],
+            "users": [attio_user_record(make_fix_user("user@example.com", [workspace]))],
+        }
+    )
+
+    attio.load_people({"Unlinked@example.com", "missing@example.com"})
+    attio.load_people({"unlinked@example.com"})
+
+    person = attio.person_by_email("unlinked@example.com")
+    assert person is not None and person.email == "unlinked@example.com"
+    assert attio.calls_to("POST", "people") == 1
+
+
+def people_created_at(minutes: list[int]) -> list[dict]:
+    people = []
+    for i, minute in enumerate(minutes):
+        person = attio_person_record(f"person{i}@example.com")
+        person["created_at"] = (CREATED_AT + timedelta(minutes=minute)).isoformat()
+        people.append(person)
+    return people
+
+
+def test_records_paginate_through_shared_timestamps():
+    attio = FakeAttioData({"people": people_created_at([3, 0, 1, 1, 1, 1, 2])})
+    attio.default_limit = 2
+
+    records = list(attio._records("people"))
+
+    assert [r["values"]["email_addresses"][0]["email_address"] for r in records] == [
+        f"person{i}@example.com" for i in [1, 2, 3, 4, 5, 6, 0]
+    ]
+
+
+def test_records_only_remember_ids_at_the_page_boundary():
+    attio = FakeAttioData({"people": people_created_at([0, 1, 1, 2, 3, 4, 5, 6, 7, 8])})
+    attio.default_limit = 3
+    records = attio._records("people")
+
+    seen_sizes = []
+    emails = []
+    for record in records:
+        emails.append(record["values"]["email_addresses"][0]["email_address"])
+        seen_sizes.append(len(records.gi_frame.f_locals["seen"]))
+
+    assert emails == [f"person{i}@example.com" for i in range(10)]
+    assert max(seen_sizes) == 2
+
+
+def test_records_dont_skip_when_earlier_records_are_deleted_mid_scan():
+    people = people_created_at([0, 1, 2, 3, 4])
+    attio = FakeAttioData({"people": list(people)})
+    attio.default_limit = 2
+    request = attio._request
+
+    def delete_first_page_after_fetching(*args, **kwargs):
+        response = request(*args, **kwargs)
+        if len(attio.calls) == 1:
+            del attio.records["people"][:2]
+        return response
+
+    attio._request = delete_first_page_after_fetching
+
+    assert len(list(attio._records("people"))) == len(people)
+
+
+def test_parse_attio_targets_names_targets(monkeypatch):
+    monkeypatch.setenv("ATTIO_API_KEY", "env-key")
+
+    assert parse_attio_targets(None) == {"attio": "env-key"}
+    assert parse_attio_targets(["sales=key1", "key2"]) == {"sales": "key1", "attio2": "key2"}
+
+
+def test_hydrate_marshals_in_worker_processes():
+    workspace = make_fix_workspace("Synced")
+    users = [make_fix_user(f"user{i}@example.com", [workspace]) for i in range(5)]
+    people = [attio_person_record(user.email) for user in users]
+    records = {
+        "workspaces": [attio_workspace_record(workspace)],
+        "people": people,
+        "users": [attio_user_record(user, person["id"]["record_id"]) for user, person in zip(users, people)],
+    }
+    local = FakeAttioData(records)
+    local.hydrate()
+    pooled = FakeAttioData(records)
+    pooled.marshal_workers = 2
+
+    with patch("fixattiosync.attiodata.MARSHAL_CHUNK_SIZE", 2):
+        pooled.hydrate()
+
+    assert [user.user_id for user in pooled.users] == [user.user_id for user in local.users]
+    assert [user.person.email for user in pooled.users] == [user.email for user in users]  # type: ignore
+    assert [w.fix_workspace_id for w in pooled.workspaces] == [workspace.id]
+
+
+def test_flattened_resources_are_restored_equal():
+    workspace = make_fix_workspace()
+    users = [make_fix_user("linked@example.com", [workspace]), make_fix_user("unlinked@example.com")]
+    person = attio_person_record("linked@example.com")
+    workspace_record = attio_workspace_record(workspace)
+    user_records = [
+        attio_user_record(users[0], person["id"]["record_id"], [workspace_record["id"]["record_id"]]),
+        attio_user_record(users[1]),
+    ]
+
+    for cls, records in [(AttioWorkspace, [workspace_record]), (AttioPerson, [person]), (AttioUser, user_records)]:
+        resources = [cls.make(record) for record in records]
+        restored = unflatten(cls, flatten(resources))
+        assert [vars(resource) for resource in restored] == [vars(resource) for resource in resources]
+
+    linked, unlinked = unflatten(AttioUser, flatten([AttioUser.make(record) for record in user_records]))
+    assert linked.id is linked.user_id and linked.person_id is not None and unlinked.person_id is None
+    assert unlinked.workspace_refs is None and len(linked.workspaces) == 0
+    assert unflatten(AttioUser, flatten([])) == []
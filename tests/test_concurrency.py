@@ -0,0 +1,137 @@
+import time
+import pytest
+import requests
+from fixattiosync.attiodata import AttioData
+from fixattiosync.concurrency import AdaptiveLimiter, CircuitBreaker, CircuitOpenError, SharedRateLimit
+
+
+class FakeResponse:
+    def __init__(self, status_code: int) -> None:
+        self.status_code = status_code
+        self.headers = {"Retry-After": "0"}
+        self.text = ""
+
+    def json(self):
+        return {"data": []}
+
+    def close(self) -> None:
+        pass
+
+
+def test_limiter_increases_additively_and_decreases_multiplicatively():
+    limiter = AdaptiveLimiter(initial_limit=2, max_limit=4)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release(success=True, latency=0.1)
+    assert 3 < limiter.limit <= 4
+
+    limiter.acquire()
+    limiter.release(success=False)
+    assert 1.5 < limiter.limit < 2
+
+    limiter.acquire()
+    limiter.release(success=True, latency=limiter.latency_target + 1)
+    assert 1.5 < limiter.limit < 2
+
+
+def test_circuit_breaker_opens_and_recovers(monkeypatch):
+    breaker = CircuitBreaker(threshold=0.5, window=4, cooldown=60, max_trips=2)
+    for success in [True, False, True, False]:
+        breaker.before_request()
+        breaker.record(success)
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+    breaker.opened_at -= 60
+    breaker.before_request()
+    breaker.record(False)
+    assert breaker.exhausted
+
+    breaker.opened_at -= 60
+    breaker.record(True)
+    assert not breaker.is_open and not breaker.exhausted
+
+
+def test_circuit_breaker_ignores_requests_in_flight_when_it_tripped():
+    breaker = CircuitBreaker(threshold=0.5, window=20, cooldown=60, max_trips=3)
+    sent_at = time.monotonic()
+    for _ in range(20):
+        breaker.record(False, sent_at=sent_at)
+    assert breaker.trips == 1
+
+    for success in [False, False, True]:
+        breaker.record(success, sent_at=sent_at)
+    assert breaker.is_open and breaker.trips == 1
+
+    # Of the requests sent after the cooldown, only the first one decides
+    breaker.opened_at -= 60
+    probe_sent_at = time.monotonic()
+    breaker.record(False, sent_at=probe_sent_at)
+    breaker.record(True, sent_at=probe_sent_at)
+    assert breaker.is_open and breaker.trips == 2
+
+    breaker.reset()
+    assert not breaker.is_open and breaker.trips == 0
+
+
+def test_request_backs_off_and_retries_on_429(monkeypatch):
+    responses = iter([FakeResponse(429), FakeResponse(200)])
+    monkeypatch.setattr(requests, "request", lambda *args, **kwargs: next(responses))
+    attio = AttioData("api-key", limiter=AdaptiveLimiter(initial_limit=4, max_limit=8))
+
+    assert attio._request("GET", "objects") == {"data": []}
+    assert attio.limiter.limit < 4
+    assert attio.limiter.in_flight == 0
+
+
+def test_request_gives_up_after_retries(monkeypatch):
+    monkeypatch.setattr(requests, "request", lambda *args, **kwargs: FakeResponse(503))
+    attio = AttioData("api-key", max_retries=1)
+
+    with pytest.raises(Exception, match="503"):
+        attio._request("GET", "objects")
+    assert attio.latencies["GET"] and len(attio.latencies["GET"]) == 2
+
+
+def test_shared_rate_limit_spaces_requests_across_processes(tmp_path):
+    # Separate open files lock each other out like separate processes do
+    path = str(tmp_path / "attio.rate")
+    first, second = SharedRateLimit(path, rate=10), SharedRateLimit(path, rate=10)
+
+    waits = [limit.reserve() for limit in [first, second, first, second]]
+
+    assert waits[0] <= 0
+    assert waits[1:] == pytest.approx([0.1, 0.2, 0.3], abs=0.05)
+    first.pause(5)
+    assert second.reserve() > 4.9
+
+
+def test_requests_share_the_rate_limit(monkeypatch, tmp_path):
+    sleeps = []
+    monkeypatch.setattr("fixattiosync.attiodata.time.sleep", sleeps.append)
+    monkeypatch.setattr(requests, "request", lambda *args, **kwargs: FakeResponse(200))
+    path = str(tmp_path / "attio.rate")
+    runs = [AttioData("api-key", rate_limit=10, shared_rate_limit=SharedRateLimit(path, 10)) for _ in range(2)]
+
+    for attio in runs:
+        attio._request("GET", "objects")
+
+    assert sleeps == [pytest.approx(0.1, abs=0.05)]
+
+
+def test_request_releases_its_slot_and_backs_off_on_errors(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("fixattiosync.attiodata.time.sleep", sleeps.append)
+    failures = iter([requests.Timeout(), requests.TooManyRedirects()])
+
+    def request(*args, **kwargs):
+        raise next(failures)
+
+    monkeypatch.setattr(requests, "request", request)
+    attio = AttioData("api-key", max_retries=2)
+
+    with pytest.raises(requests.TooManyRedirects):
+        attio._request("GET", "objects")
+    assert sleeps == [1]
+    assert attio.limiter.in_flight == 0
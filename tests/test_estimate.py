@@ -0,0 +1,108 @@
+from fakes import (
+    StaticFixData,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.estimate import estimate_sync
+from fixattiosync.sync import plan_sync
+
+
+def test_estimate_counts_calls_per_endpoint(fake_attio):
+    kept_workspace = make_fix_workspace("Kept")
+    gone_workspace = make_fix_workspace("Gone")
+    kept_user = make_fix_user("kept@example.com", [kept_workspace])
+    gone_user = make_fix_user("gone@example.com")
+    shared_gone_user = make_fix_user("shared@example.com")
+    shared_kept_user = make_fix_user("shared@example.com")
+
+    workspace_records = [attio_workspace_record(kept_workspace), attio_workspace_record(gone_workspace)]
+    person_records = {
+        email: attio_person_record(email) for email in ["kept@example.com", "gone@example.com", "shared@example.com"]
+    }
+    user_records = [
+        attio_user_record(
+            kept_user,
+            person_records["kept@example.com"]["id"]["record_id"],
+            [workspace_records[0]["id"]["record_id"]],
+        ),
+        attio_user_record(gone_user, person_records["gone@example.com"]["id"]["record_id"]),
+        attio_user_record(shared_gone_user, person_records["shared@example.com"]["id"]["record_id"]),
+        attio_user_record(shared_kept_user, person_records["shared@example.com"]["id"]["record_id"]),
+    ]
+    attio = fake_attio(
+        {"workspaces": workspace_records, "people": list(person_records.values()), "users": user_records}
+    )
+    attio.rate_limit = 10
+    new_workspace = make_fix_workspace("New")
+    fix = StaticFixData(
+        [
+            kept_user,
+            shared_kept_user,
+            make_fix_user("kept@example.com", [new_workspace]),
+            make_fix_user("new@example.com", [new_workspace]),
+            make_fix_user("NEW@example.com", [new_workspace]),
+        ],
+        [kept_workspace, new_workspace],
+    )
+
+    estimate = estimate_sync(plan_sync(fix, attio), attio)
+
+    assert estimate.calls == {
+        "POST people query": 1,
+        "PUT workspaces": 1,
+        "PUT people": 1,
+        "PUT users": 3,
+        "DELETE workspaces": 1,
+        "DELETE users": 2,
+        "DELETE people": 1,
+    }
+    assert estimate.wall_time == 10 * 0.5
+    assert estimate.min_required_threshold == 67
+
+
+def test_estimate_keeps_people_taken_over_by_new_users(fake_attio):
+    workspace = make_fix_workspace()
+    workspace_record = attio_workspace_record(workspace)
+    person = attio_person_record("moved@example.com")
+    old_user = make_fix_user("moved@example.com", [workspace])
+    attio = fake_attio(
+        {
+            "workspaces": [workspace_record],
+            "people": [person],
+            "users": [attio_user_record(old_user, person["id"]["record_id"], [workspace_record["id"]["record_id"]])],
+        }
+    )
+    fix = StaticFixData([make_fix_user("Moved@example.com", [workspace])], [workspace])
+
+    estimate = estimate_sync(plan_sync(fix, attio), attio)
+
+    assert estimate.calls["DELETE users"] == 1
+    assert estimate.calls["PUT people"] == 0
+    assert estimate.calls["DELETE people"] == 0
+    assert estimate.calls["POST people query"] == 0
+
+
+def test_estimate_counts_one_people_query_per_chunk_of_emails(fake_attio):
+    workspace = make_fix_workspace()
+    workspace_record = attio_workspace_record(workspace)
+    known = make_fix_user("known@example.com", [workspace])
+    person = attio_person_record("known@example.com")
+    attio = fake_attio(
+        {
+            "workspaces": [workspace_record],
+            "people": [person],
+            "users": [attio_user_record(known, person["id"]["record_id"], [workspace_record["id"]["record_id"]])],
+        }
+    )
+    new_users = [make_fix_user(f"new{i}@example.com", [workspace]) for i in range(150)]
+    fix = StaticFixData([known, *new_users], [workspace])
+    plan = plan_sync(fix, attio)
+    attio.calls.clear()
+
+    estimate = estimate_sync(plan, attio)
+
+    assert estimate.calls["POST people query"] == 2 == attio.calls_to("POST", "people")
+    assert estimate.calls["PUT people"] == 150
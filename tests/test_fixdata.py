@@ -0,0 +1,257 @@
+import psycopg
+import pytest
+from contextlib import contextmanager
+from datetime import timedelta
+from uuid import uuid4
+from fakes import CREATED_AT
+from fixattiosync.fixdata import FixData, FixDataError
+
+
+class FakeCursor:
+    def __init__(self, connection: "FakeConnection") -> None:
+        self.connection = connection
+        self.rows: list[dict] = []
+
+    def __enter__(self) -> "FakeCursor":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def execute(self, query, params=None) -> None:
+        statement = query if isinstance(query, str) else query.as_string(None)
+        self.connection.statements.append(statement)
+        if self.connection.failures > 0 and "cloud_account" in statement:
+            self.connection.failures -= 1
+            raise psycopg.errors.SerializationFailure("canceling statement due to conflict with recovery")
+        if "now()" in statement:
+            self.rows = [{"now": self.connection.now}]
+            return
+        table = statement.split('public."')[1].split('"')[0] if 'public."' in statement else None
+        rows = self.connection.tables.get(table, [])
+        if "is_active=true" in statement:
+            rows = [row for row in rows if row["is_active"]]
+        if params is not None:
+            columns = [c for c in ("updated_at", "last_active", "state_updated_at") if f"{c} >= " in statement]
+            rows = [row for row in rows if any((row.get(c) or CREATED_AT) >= params["since"] for c in columns)]
+        if not statement.startswith("SELECT * "):
+            column = statement.split()[1]
+            rows = [{column: row[column]} for row in rows]
+        self.rows = [dict(row) for row in rows]
+
+    def fetchall(self) -> list[dict]:
+        return self.rows
+
+
+class FakeConnection:
+    def __init__(self, tables: dict[str, list[dict]], failures: int = 0) -> None:
+        self.tables = tables
+        self.failures = failures
+        self.statements: list[str] = []
+        self.now = CREATED_AT
+
+    @contextmanager
+    def transaction(self):
+        yield
+
+    def cursor(self, row_factory=None) -> FakeCursor:
+        return FakeCursor(self)
+
+
+class FakePool:
+    def __init__(self, connection: FakeConnection) -> None:
+        self.conn = connection
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+
+def user_row(email: str) -> dict:
+    return {
+        "id": uuid4(),
+        "email": email,
+        "hashed_password": "",
+        "is_active": True,
+        "is_superuser": False,
+        "is_verified": True,
+        "otp_secret": None,
+        "is_mfa_active": False,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+    }
+
+
+def workspace_row(name: str, owner: dict) -> dict:
+    return {
+        "id": uuid4(),
+        "slug": name.lower(),
+        "name": name,
+        "external_id": uuid4(),
+        "tier": "Free",
+        "subscription_id": None,
+        "payment_on_hold_since": None,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+        "owner_id": owner["id"],
+        "highest_current_cycle_tier": None,
+        "current_cycle_ends_at": None,
+        "tier_updated_at": None,
+    }
+
+
+def cloud_account_row(workspace: dict, updated_at=CREATED_AT) -> dict:
+    return {
+        "id": uuid4(),
+        "tenant_id": workspace["id"],
+        "cloud": "aws",
+        "account_id": "123456789012",
+        "aws_role_name": None,
+        "aws_external_id": None,
+        "is_configured": True,
+        "enabled": True,
+        "privileged": False,
+        "user_account_name": None,
+        "api_account_name": None,
+        "api_account_alias": None,
+        "state": "configured",
+        "error": None,
+        "last_scan_duration_seconds": 0,
+        "last_scan_started_at": None,
+        "last_scan_resources_scanned": 10,
+        "created_at": updated_at,
+        "updated_at": updated_at,
+        "state_updated_at": updated_at,
+        "version_id": 1,
+        "cf_stack_version": None,
+        "scan": True,
+        "failed_scan_count": 0,
+        "gcp_service_account_key_id": None,
+        "last_task_id": None,
+        "azure_credential_id": None,
+        "last_scan_resources_errors": 0,
+        "last_degraded_scan_started_at": None,
+    }
+
+
+def tables() -> dict[str, list[dict]]:
+    user = user_row("user@example.com")
+    workspace = workspace_row("Workspace", user)
+    return {
+        "user": [user],
+        "organization": [workspace],
+        "user_role_assignment": [{"user_id": user["id"], "workspace_id": workspace["id"], "role_names": 4}],
+    }
+
+
+def state(fix: FixData) -> tuple[dict, dict]:
+    users = {
+        user.id: (user.sync_key(), sorted(w.id for w in user.workspaces), user.workspace_roles) for user in fix.users
+    }
+    workspaces = {
+        workspace.id: (
+            workspace.sync_key(),
+            sorted(u.id for u in workspace.users),
+            workspace.user_roles,
+            None if workspace.owner is None else workspace.owner.id,
+        )
+        for workspace in fix.workspaces
+    }
+    return users, workspaces
+
+
+def test_hydrate_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr("fixattiosync.fixdata.time.sleep", lambda seconds: None)
+    connection = FakeConnection(tables(), failures=2)
+    fix = FixData(db="fix", user="fix", password="fix", statement_timeout=5)
+    fix.pool = FakePool(connection)  # type: ignore
+
+    fix.hydrate()
+
+    assert [user.email for user in fix.users] == ["user@example.com"]
+    assert [workspace.name for workspace in fix.users[0].workspaces] == ["Workspace"]
+    assert connection.statements.count("SET LOCAL statement_timeout = 5000") == 3 * 7
+
+
+def test_hydrate_raises_once_retries_are_exhausted(monkeypatch):
+    monkeypatch.setattr("fixattiosync.fixdata.time.sleep", lambda seconds: None)
+    fix = FixData(db="fix", user="fix", password="fix", max_retries=1)
+    fix.pool = FakePool(FakeConnection(tables(), failures=2))  # type: ignore
+
+    with pytest.raises(FixDataError, match="conflict with recovery"):
+        fix.hydrate()
+    assert not fix.hydrated
+
+
+def test_refresh_rebuilds_only_what_changed_since_the_last_read():
+    alice, bob, carol, dave = (user_row(f"{name}@example.com") for name in ("alice", "bob", "carol", "dave"))
+    first, second = workspace_row("First", alice), workspace_row("Second", dave)
+    data = {
+        "user": [alice, bob, carol, dave],
+        "organization": [first, second],
+        "user_role_assignment": [
+            {"user_id": alice["id"], "workspace_id": first["id"], "role_names": 4},
+            {"user_id": bob["id"], "workspace_id": first["id"], "role_names": 1},
+            {"user_id": carol["id"], "workspace_id": first["id"], "role_names": 1},
+            {"user_id": dave["id"], "workspace_id": second["id"], "role_names": 4},
+        ],
+        "organization_owners": [{"organization_id": first["id"], "user_id": alice["id"]}],
+        "cloud_account": [],
+    }
+    connection = FakeConnection(data)
+    connection.now = CREATED_AT + timedelta(hours=1)
+    fix = FixData(db="fix", user="fix", password="fix")
+    fix.pool = FakePool(connection)  # type: ignore
+    fix.hydrate()
+    untouched = next(user for user in fix.users if user.id == dave["id"])
+
+    connection.now = later = CREATED_AT + timedelta(hours=2)
+    alice.update(email="alice@example.org", updated_at=later)
+    bob.update(is_active=False, updated_at=later)
+    erin = user_row("erin@example.com") | {"updated_at": later}
+    data["user"].append(erin)
+    data["user_role_assignment"][2]["role_names"] = 4
+    data["user_role_assignment"].append({"user_id": erin["id"], "workspace_id": first["id"], "role_names": 1})
+    data["cloud_account"].append(cloud_account_row(first, later))
+    connection.statements.clear()
+    fix.refresh()
+
+    expected = FixData(db="fix", user="fix", password="fix")
+    expected.pool = FakePool(FakeConnection(data))  # type: ignore
+    expected.hydrate()
+    assert state(fix) == state(expected)
+    assert next(user for user in fix.users if user.id == dave["id"]) is untouched
+    assert 'SELECT * FROM public."user" WHERE is_active=true ORDER BY id;' not in connection.statements
+
+
+def test_refresh_drops_deleted_notification_settings():
+    user = user_row("user@example.com")
+    workspace = workspace_row("Workspace", user)
+    settings = {
+        "user_id": user["id"],
+        "weekly_report": True,
+        "inactivity_reminder": True,
+        "tutorial": True,
+        "marketing": False,
+        "created_at": CREATED_AT,
+        "updated_at": CREATED_AT,
+    }
+    data = {
+        "user": [user],
+        "organization": [workspace],
+        "user_role_assignment": [{"user_id": user["id"], "workspace_id": workspace["id"], "role_names": 4}],
+        "user_notification_settings": [settings],
+    }
+    connection = FakeConnection(data)
+    connection.now = CREATED_AT + timedelta(hours=1)
+    fix = FixData(db="fix", user="fix", password="fix")
+    fix.pool = FakePool(connection)  # type: ignore
+    fix.hydrate()
+    assert fix.users[0].user_email_notifications_disabled
+
+    connection.now = CREATED_AT + timedelta(hours=2)
+    data["user_notification_settings"].clear()
+    fix.refresh()
+
+    assert fix.users[0].notification_settings is None
+    assert not fix.users[0].user_email_notifications_disabled
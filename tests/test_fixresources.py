@@ -0,0 +1,18 @@
+from fakes import make_fix_cloud_account, make_fix_user, make_fix_workspace
+
+
+def test_update_info_prefers_configured_then_most_scanned_workspace():
+    scanned = make_fix_workspace("Scanned")
+    make_fix_cloud_account(scanned, last_scan_resources_scanned=10)
+    make_fix_cloud_account(scanned, last_scan_resources_scanned=20)
+    configured = make_fix_workspace("Configured")
+    make_fix_cloud_account(configured, is_configured=True, last_scan_resources_scanned=5)
+    most_scanned = make_fix_workspace("Most scanned")
+    make_fix_cloud_account(most_scanned, is_configured=True, last_scan_resources_scanned=50)
+    for workspace in [scanned, configured, most_scanned]:
+        workspace.update_info()
+
+    assert (scanned.cloud_account_configured, scanned.resources_scanned) == (False, 30)
+    assert make_fix_user("a@example.com", [scanned, configured]).cloud_account_connected_workspace_name == "Configured"
+    user = make_fix_user("b@example.com", [scanned, configured, most_scanned])
+    assert user.cloud_account_connected_workspace_name == "Most scanned"
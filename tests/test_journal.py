@@ -0,0 +1,122 @@
+from fakes import (
+    StaticFixData,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.journal import SyncJournal
+from fixattiosync.snapshot import checkpoint_attio, restore_attio
+from fixattiosync.sync import create_missing_users, plan_sync
+
+
+def attio_records():
+    workspace = make_fix_workspace("Existing")
+    user = make_fix_user("existing@example.com", [workspace])
+    return {
+        "workspaces": [attio_workspace_record(workspace)],
+        "people": [attio_person_record(user.email)],
+        "users": [attio_user_record(user)],
+    }
+
+
+def test_resume_skips_journaled_writes(fake_attio, tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    records = attio_records()
+    new_users = [make_fix_user(f"user{i}@example.com") for i in range(3)]
+    fix = StaticFixData(new_users, [])
+
+    attio = fake_attio(records)
+    attio.journal = SyncJournal(path)
+    create_missing_users(attio, new_users[:2])
+    # the process dies here, before the journal is completed
+
+    resumed = fake_attio(records)
+    journal = SyncJournal(path, resume=True)
+    resumed.journal = journal
+    resumed.replay_journal(journal)
+
+    assert {entry["key"] for entry in journal.entries} == {
+        "user0@example.com",
+        str(new_users[0].id),
+        "user1@example.com",
+        str(new_users[1].id),
+    }
+    assert plan_sync(fix, resumed).users_missing == [new_users[2]]
+    assert resumed.person_by_email("user1@example.com") is not None
+
+
+def test_resume_ignores_completed_runs_and_torn_writes(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = SyncJournal(str(path))
+    journal.record_delete("users", make_fix_user("gone@example.com").id)
+    journal.complete()
+    journal = SyncJournal(str(path), resume=True)
+    journal.record_delete("people", make_fix_user("gone@example.com").id)
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"operation": "del')
+
+    resumed = SyncJournal(str(path), resume=True)
+
+    assert [entry["object_id"] for entry in resumed.entries] == ["people"]
+    resumed.record_delete("workspaces", make_fix_workspace().id)
+    resumed.close()
+
+    assert [entry["object_id"] for entry in SyncJournal(str(path), resume=True).entries] == ["people", "workspaces"]
+
+
+def test_resume_starts_from_the_journaled_attio_state(fake_attio, tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    records = attio_records()
+    new_users = [make_fix_user(f"user{i}@example.com") for i in range(3)]
+    fix = StaticFixData(new_users, [])
+
+    attio = fake_attio(records)
+    attio.journal = SyncJournal(path)
+    attio.hydrate()
+    checkpoint_attio(attio.journal, attio)
+    create_missing_users(attio, new_users[:2])
+    # the process dies here, before the journal is completed
+
+    resumed = fake_attio(records)
+    journal = SyncJournal(path, resume=True)
+    resumed.journal = journal
+    assert restore_attio(journal, resumed, max_age=60)
+    resumed.replay_journal(journal)
+
+    assert resumed.calls == []
+    assert plan_sync(fix, resumed).users_missing == [new_users[2]]
+    assert {user.id for user in resumed.users if user.person is not None} == {user.id for user in new_users[:2]}
+    existing, original = (
+        next(user for user in data.users if user.email == "existing@example.com") for data in (resumed, attio)
+    )
+    assert existing == original and (existing.record_id, existing.created_at) == (
+        original.record_id,
+        original.created_at,
+    )
+
+    # A resumed run that dies again resumes from the same state
+    create_missing_users(resumed, new_users[2:])
+    journal.close()
+    again = fake_attio(records)
+    assert restore_attio(SyncJournal(path, resume=True), again, max_age=60)
+    assert len(SyncJournal(path, resume=True).entries) == 6
+
+
+def test_resume_fetches_attio_without_a_complete_and_recent_checkpoint(fake_attio, tmp_path):
+    path = tmp_path / "journal.jsonl"
+    attio = fake_attio(attio_records())
+    attio.hydrate()
+    journal = SyncJournal(str(path))
+    checkpoint_attio(journal, attio)
+    journal.close()
+
+    assert not restore_attio(SyncJournal(str(path), resume=True), fake_attio(attio_records()), max_age=0)
+
+    lines = [line for line in path.read_text().splitlines() if line]
+    # The checkpoint marker was never written
+    path.write_text("\n".join(lines[:-1]) + "\n")
+    journal = SyncJournal(str(path), resume=True)
+    assert journal.state is None and not restore_attio(journal, fake_attio(attio_records()), max_age=60)
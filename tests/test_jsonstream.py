@@ -0,0 +1,89 @@
+import json
+import pytest
+import requests
+from fixattiosync.attiodata import AttioData
+from fixattiosync.jsonstream import IncompleteJSON, iter_array
+
+BODY = {
+    "meta": {"limit": 500, "tags": ["a", "b"]},
+    "data": [
+        {"id": {"record_id": "1"}, "values": {"name": [{"value": "Zoë ☃"}]}, "score": 12345.5},
+        {"id": {"record_id": "2"}, "values": {}, "flag": None, "count": 10},
+        [],
+        'text with "quotes" and ] brackets',
+    ],
+    "next": 1234567,
+}
+
+
+def chunked(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100_000])
+def test_iter_array_decodes_across_chunk_boundaries(size):
+    body = json.dumps(BODY, indent=1, ensure_ascii=False).encode()
+
+    assert list(iter_array(chunked(body, size))) == BODY["data"]
+
+
+@pytest.mark.parametrize("size", [1, 7, 100_000])
+def test_iter_array_yields_the_text_of_each_element(size):
+    body = json.dumps(BODY, indent=1, ensure_ascii=False).encode()
+
+    items = list(iter_array(chunked(body, size), with_text=True))
+
+    assert [value for value, _ in items] == BODY["data"]
+    assert [json.loads(text) for _, text in items] == BODY["data"]
+
+
+def test_iter_array_handles_empty_and_missing_arrays():
+    assert list(iter_array([b'{"data": []}'])) == []
+    assert list(iter_array([b"{}"])) == []
+    assert list(iter_array([b'{"other": [1, 2]}'])) == []
+
+
+def test_iter_array_rejects_truncated_bodies():
+    with pytest.raises((IncompleteJSON, json.JSONDecodeError)):
+        list(iter_array(chunked(json.dumps(BODY).encode()[:-30], 16)))
+
+
+class StreamedResponse:
+    status_code = 200
+    headers: dict[str, str] = {}
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.read = 0
+
+    def __enter__(self) -> "StreamedResponse":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+    def iter_content(self, chunk_size: int):
+        for chunk in chunked(self.body, chunk_size):
+            self.read += len(chunk)
+            yield chunk
+
+
+def test_request_records_yields_records_before_the_body_is_read(monkeypatch):
+    body = json.dumps({"data": [{"id": i, "padding": "x" * 100_000} for i in range(5)]}).encode()
+    response = StreamedResponse(body)
+    requests_made = []
+
+    def request(*args, **kwargs):
+        requests_made.append(kwargs)
+        return response
+
+    monkeypatch.setattr(requests, "request", request)
+    attio = AttioData("api-key")
+
+    records = attio._request_records("POST", "objects/users/records/query", json={"limit": 5})
+    first = next(records)
+
+    assert first["id"] == 0 and response.read < len(body) / 2
+    assert [record["id"] for record in records] == [1, 2, 3, 4]
+    assert requests_made[0]["stream"] is True
+    assert "gzip" in requests_made[0]["headers"]["Accept-Encoding"]
@@ -1,7 +1,17 @@
+import json
 import pytest
 import logging
 from argparse import ArgumentParser
-from fixattiosync.logger import add_args, setup_logger, get_fix_logger, FixLogger, setLoggerClass
+from fixattiosync.logger import (
+    add_args,
+    setup_logger,
+    get_fix_logger,
+    FixLogger,
+    JsonFormatter,
+    RecordEvents,
+    RecordSampling,
+    setLoggerClass,
+)
 
 
 @pytest.fixture(autouse=True)
@@ -73,3 +83,28 @@ def test_setup_logger_with_env_vars(monkeypatch, env_var, expected_level):
     setup_logger("fix", force=True)
     logger = get_fix_logger("fix")
     assert logger.level == expected_level
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logging.LogRecord("fix", logging.INFO, "", 0, "Updating user %s", ("a@example.com",), None)
+    record.phase = "users_outdated"
+
+    data = json.loads(JsonFormatter("fix").format(record))
+
+    assert data["message"] == "Updating user a@example.com"
+    assert data["level"] == "INFO"
+    assert data["phase"] == "users_outdated"
+
+
+def test_record_events_sample_and_summarize(caplog):
+    events = RecordEvents("users_outdated", sampling=RecordSampling(sample_rate=0.25, max_events=2))
+
+    with caplog.at_level(logging.INFO, logger="fix"):
+        for i in range(20):
+            events.event("updated", "Updating user %s", i)
+        events.summary(deferred=3)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages[:2] == ["Updating user 3", "Updating user 7"]
+    assert len(messages) == 3
+    assert "updated: 20, deferred: 3, 18 events not logged" in messages[2]
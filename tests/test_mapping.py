@@ -0,0 +1,59 @@
+from datetime import timedelta, timezone
+from uuid import uuid4
+from fakes import make_fix_user, make_fix_workspace, record_envelope
+from fixattiosync.attioresources import AttioUser, AttioWorkspace
+from fixattiosync.fixresources import FixWorkspaceStatus
+
+
+def attio_values(values: dict) -> dict:
+    """Values as returned by Attio for the values of an assert request."""
+    return {
+        key: value if isinstance(value, list) else [value] if isinstance(value, dict) else [{"value": value}]
+        for key, value in values.items()
+    }
+
+
+def test_workspace_round_trips_through_mapping():
+    fix_workspace = make_fix_workspace("Round trip", tier="Enterprise", status=FixWorkspaceStatus.Collected)
+    values = attio_values(fix_workspace.attio_data()["data"]["data"]["values"])
+    values["product_tier"] = [{"option": {"title": "Enterprise"}}]
+    values["status"] = [{"status": {"title": "Collected"}}]
+
+    attio_workspace = AttioWorkspace.make(record_envelope("workspaces", uuid4(), values))
+
+    assert attio_workspace.fix_workspace_id == fix_workspace.id
+    assert fix_workspace == attio_workspace
+    assert attio_workspace == fix_workspace
+
+
+def test_user_comparison_normalizes_email_and_timezones():
+    workspace = make_fix_workspace()
+    fix_user = make_fix_user("Mixed.Case@Example.com", [workspace])
+    fix_user.last_active_at = fix_user.registered_at
+    attio_workspace = AttioWorkspace.make(
+        record_envelope("workspaces", uuid4(), attio_values(workspace.attio_data()["data"]["data"]["values"]))
+    )
+    values = attio_values(fix_user.attio_data()["data"]["data"]["values"])
+    values["primary_email_address"] = [{"email_address": "mixed.case@example.com"}]
+    local = timezone(timedelta(hours=2))
+    values["registered_at"] = [{"value": fix_user.registered_at.astimezone(local).isoformat()}]
+    attio_user = AttioUser.make(record_envelope("users", uuid4(), values))
+    attio_user.workspaces.add(attio_workspace)
+
+    assert fix_user == attio_user
+
+
+def test_assigning_a_mapped_attribute_invalidates_the_normalized_values():
+    workspace = make_fix_workspace()
+    fix_user = make_fix_user("user@example.com", [workspace])
+    attio_user = AttioUser.make(
+        record_envelope("users", uuid4(), attio_values(fix_user.attio_data()["data"]["data"]["values"]))
+    )
+    assert fix_user != attio_user  # not linked to the workspace yet
+
+    fix_user.workspaces.clear()
+    assert fix_user == attio_user
+
+    fix_user.last_active_at = fix_user.registered_at
+    assert fix_user != attio_user
+    assert fix_user.eq_except_last_active(attio_user)
@@ -0,0 +1,50 @@
+import pytest
+from uuid import UUID
+from types import SimpleNamespace
+from fakes import StaticFixData, attio_user_record, attio_workspace_record, make_fix_user, make_fix_workspace
+from fixattiosync.reconcile import merge_join
+from fixattiosync.sync import plan_sync
+
+
+def resource(n, name=""):
+    return SimpleNamespace(id=UUID(int=n) if n is not None else None, name=name)
+
+
+def test_merge_join_is_a_full_outer_join():
+    left = [resource(1), resource(3), resource(4)]
+    right = [resource(None), resource(2), resource(3, "old"), resource(3, "new"), resource(5)]
+
+    joined = [(lhs and lhs.id.int, rhs and (rhs.id and rhs.id.int, rhs.name)) for lhs, rhs in merge_join(left, right)]
+
+    assert joined == [(None, (None, "")), (1, None), (None, (2, "")), (3, (3, "new")), (4, None), (None, (5, ""))]
+
+
+def test_merge_join_rejects_unsorted_input():
+    with pytest.raises(ValueError):
+        list(merge_join([resource(2), resource(1)], []))
+    with pytest.raises(ValueError):
+        list(merge_join([], [resource(2), resource(1)]))
+
+
+def test_plan_sync_finds_every_kind_of_change(fake_attio):
+    workspace = make_fix_workspace("Workspace")
+    workspace_record = attio_workspace_record(workspace)
+    refs = [workspace_record["id"]["record_id"]]
+    users = [make_fix_user(f"user{i}@example.com", [workspace]) for i in range(30)]
+    records = [attio_user_record(user, None, refs) for user in users[10:]]
+    gone = [make_fix_user(f"gone{i}@example.com", [workspace]) for i in range(5)]
+    records += [attio_user_record(user, None, refs) for user in gone]
+    for record in records[:3]:
+        record["values"]["workspace_has_subscription"] = [{"value": True}]
+    fix = StaticFixData(users, [workspace])
+    attio = fake_attio({"workspaces": [workspace_record], "people": [], "users": records})
+
+    plan = plan_sync(fix, attio)
+
+    assert [len(plan.users_missing), len(plan.users_outdated), len(plan.users_obsolete)] == [10, 3, 5]
+    assert sorted(user.id for user in plan.users_missing) == sorted(user.id for user in users[:10])
+    assert sorted(user.id for user in plan.users_outdated) == sorted(user.id for user in users[10:13])
+    assert sorted(user.id for user in plan.users_obsolete) == sorted(user.id for user in gone)
+    # In id order, like the merge join produces them
+    assert plan.users_missing == sorted(plan.users_missing, key=lambda user: user.id.int)
+    assert plan.workspaces_missing == plan.workspaces_outdated == plan.workspaces_obsolete == []
@@ -0,0 +1,85 @@
+import json
+import threading
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+from http.server import ThreadingHTTPServer
+from fakes import (
+    StaticFixData,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.service import SyncService, make_handler
+
+
+def make_service(fake_attio):
+    workspace = make_fix_workspace("Existing")
+    user = make_fix_user("existing@example.com", [workspace])
+    workspace_record = attio_workspace_record(workspace)
+    person_record = attio_person_record(user.email)
+    attio = fake_attio(
+        {
+            "workspaces": [workspace_record],
+            "people": [person_record],
+            "users": [
+                attio_user_record(
+                    user,
+                    person_record_id=person_record["id"]["record_id"],
+                    workspace_record_ids=[workspace_record["id"]["record_id"]],
+                )
+            ],
+        }
+    )
+    fix = StaticFixData([user, make_fix_user("new@example.com", [workspace])], [workspace])
+    return SyncService(fix, [attio], max_changes_percent=100, interval=60), attio, fix
+
+
+def test_run_once_keeps_attio_resident(fake_attio):
+    service, attio, fix = make_service(fake_attio)
+
+    first = service.run_once()
+    attio.calls.clear()
+    second = service.run_once()
+
+    assert first["success"] and first["reports"]["attio"]["users_missing"] == 1
+    assert second["success"] and second["reports"]["attio"]["users_missing"] == 0
+    assert fix.hydrations == 1 and fix.refreshes == 1
+    assert attio.calls == []
+    assert service.healthy()
+
+
+def test_run_once_records_failures(fake_attio):
+    service, _, _ = make_service(fake_attio)
+    service.max_changes_percent = 0
+
+    run = service.run_once()
+
+    assert not run["success"]
+    assert "threshold" in run["errors"]["attio"]
+    assert service.stats["failures"] == 1
+    assert not service.healthy()
+
+
+def test_http_endpoints(fake_attio):
+    service, _, _ = make_service(fake_attio)
+    service.run_once()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urlopen(f"{base_url}/health") as response:
+            assert json.load(response) == {"healthy": True}
+        with urlopen(f"{base_url}/stats") as response:
+            assert json.load(response)["runs"] == 1
+        with urlopen(Request(f"{base_url}/sync", method="POST")) as response:
+            assert response.status == 202
+        try:
+            urlopen(f"{base_url}/unknown")
+            assert False, "expected 404"
+        except HTTPError as e:
+            assert e.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,83 @@
+import pytest
+from fakes import (
+    CREATED_AT,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.attiodata import AttioData
+from fixattiosync.attioresources import AttioUser
+from fixattiosync.fixdata import FixData
+from fixattiosync.fixresources import FixUser, FixWorkspace
+from fixattiosync.snapshot import (
+    columns,
+    dump_snapshot,
+    load_attio_snapshot,
+    load_fix_snapshot,
+    read_rows,
+    snapshot_targets,
+)
+from fixattiosync.sync import plan_sync
+
+
+def test_columns_leave_out_relations():
+    assert {"id", "owner_id", "status", "cloud_account_configured"} <= set(columns(FixWorkspace))
+    assert not {"owner", "users", "cloud_accounts", "user_roles"} & set(columns(FixWorkspace))
+    assert {"person_id", "workspace_refs"} <= set(columns(AttioUser))
+    assert not {"person", "workspaces"} & set(columns(AttioUser))
+    assert not {"hashed_password", "otp_secret", "is_mfa_active"} & set(columns(FixUser))
+
+
+def test_snapshot_round_trip_plans_the_same_sync(tmp_path, fake_attio):
+    pytest.importorskip("pyarrow")
+    synced = make_fix_workspace("Synced")
+    owner = make_fix_user("owner@example.com", [synced], last_active_at=CREATED_AT)
+    synced.owner_id = owner.id
+    synced.owner = owner
+    new = make_fix_workspace("New")
+    fix = FixData(db="", user="", password="")
+    fix.load([synced, new], [owner, make_fix_user("new@example.com", [new])])
+    person = attio_person_record("owner@example.com")
+    attio = fake_attio(
+        {
+            "workspaces": [attio_workspace_record(synced)],
+            "people": [person],
+            "users": [attio_user_record(owner, person["id"]["record_id"])],
+        }
+    )
+
+    dump_snapshot(str(tmp_path), fix, [attio])
+    snapshot_fix = FixData(db="", user="", password="")
+    load_fix_snapshot(str(tmp_path), snapshot_fix)
+    snapshot_attio = AttioData("", name=snapshot_targets(str(tmp_path))[0])
+    load_attio_snapshot(str(tmp_path), snapshot_attio)
+
+    assert snapshot_attio.name == "attio"
+    assert plan_sync(snapshot_fix, snapshot_attio).report() == plan_sync(fix, attio).report()
+    loaded = {workspace.name: workspace for workspace in snapshot_fix.workspaces}
+    assert loaded["Synced"].owner is not None and loaded["Synced"].owner.email == "owner@example.com"
+
+
+def test_snapshot_leaves_out_credentials(tmp_path):
+    pytest.importorskip("pyarrow")
+    workspace = make_fix_workspace("Workspace")
+    user = make_fix_user("user@example.com", [workspace])
+    user.hashed_password = "$argon2id$secret-hash"
+    user.otp_secret = "TOTPSECRETBASE32"
+    user.is_mfa_active = True
+    fix = FixData(db="", user="", password="")
+    fix.load([workspace], [user])
+
+    dump_snapshot(str(tmp_path), fix, [])
+
+    for path in tmp_path.iterdir():
+        content = path.read_bytes()
+        assert b"secret-hash" not in content and b"TOTPSECRETBASE32" not in content
+    assert not {"hashed_password", "otp_secret", "is_mfa_active"} & set(read_rows(str(tmp_path / "fix-users.arrow"))[0])
+    snapshot_fix = FixData(db="", user="", password="")
+    load_fix_snapshot(str(tmp_path), snapshot_fix)
+    loaded = snapshot_fix.users[0]
+    assert (loaded.hashed_password, loaded.otp_secret, loaded.is_mfa_active) == ("", None, False)
+    assert loaded.email == "user@example.com"
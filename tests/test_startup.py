@@ -0,0 +1,23 @@
+import re
+import sys
+import subprocess
+
+LAZY_MODULES = ["psycopg", "requests", "http.server"]
+
+
+def import_times(module: str) -> dict[str, int]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)", line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def test_entry_point_defers_heavy_imports():
+    times = import_times("fixattiosync.__main__")
+    for module in LAZY_MODULES:
+        assert module not in times, f"{module} is imported eagerly"
@@ -0,0 +1,286 @@
+import time
+import pytest
+import threading
+from fakes import (
+    CREATED_AT,
+    FakeAttioData,
+    StaticFixData,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.attiodata import AttioDataError
+from fixattiosync.concurrency import AdaptiveLimiter
+from fixattiosync.fixdata import FixDataError
+from fixattiosync.sync import (
+    delete_obsolete_users_and_people,
+    SyncReport,
+    TimeBudget,
+    create_missing_users,
+    hydrate_sources,
+    sync_fix_to_attio,
+    sync_fix_to_targets,
+)
+
+
+def existing_records() -> dict[str, list[dict]]:
+    workspace = make_fix_workspace("Existing")
+    user = make_fix_user("existing@example.com", [workspace])
+    person = attio_person_record("existing@example.com")
+    return {
+        "workspaces": [attio_workspace_record(workspace)],
+        "people": [person, attio_person_record("Known@Example.com")],
+        "users": [attio_user_record(user)],
+    }
+
+
+def test_create_missing_users_skips_known_people(fake_attio):
+    attio = fake_attio(existing_records())
+    user = make_fix_user("known@example.com")
+
+    create_missing_users(attio, [user])
+
+    assert attio.calls_to("PUT", "people") == 0
+    assert attio.calls_to("PUT", "users") == 1
+    assert [u.id for u in attio.person_by_email("KNOWN@example.com").users] == [user.id]
+
+
+def test_create_missing_users_coalesces_shared_email(fake_attio):
+    attio = fake_attio(existing_records())
+    users = [make_fix_user("new@example.com"), make_fix_user("New@Example.com")]
+
+    create_missing_users(attio, users)
+
+    assert attio.calls_to("PUT", "people") == 1
+    assert attio.calls_to("PUT", "users") == 2
+    assert len(attio.person_by_email("new@example.com").users) == 2
+
+
+def budget_fixture(fake_attio):
+    kept_workspace = make_fix_workspace("Kept")
+    workspace_record = attio_workspace_record(kept_workspace)
+    active_user = make_fix_user("active@example.com")
+    person_record = attio_person_record("active@example.com")
+    attio = fake_attio(
+        {
+            "workspaces": [workspace_record, attio_workspace_record(make_fix_workspace("Gone"))],
+            "people": [person_record],
+            "users": [attio_user_record(active_user, person_record["id"]["record_id"])],
+        }
+    )
+    active_user.last_active_at = CREATED_AT
+    fix = StaticFixData(
+        [active_user, make_fix_user("new@example.com", [kept_workspace])],
+        [kept_workspace, make_fix_workspace("New")],
+    )
+    return fix, attio
+
+
+def test_time_budget_defers_everything_when_exhausted(fake_attio):
+    fix, attio = budget_fixture(fake_attio)
+
+    report = sync_fix_to_attio(fix, attio, max_changes_percent=100, time_budget=0)
+
+    assert attio.calls == []
+    assert report.deferred == {
+        "workspaces_missing": 1,
+        "users_missing": 1,
+        "users_last_active_outdated": 1,
+        "workspaces_obsolete": 1,
+    }
+
+
+def test_time_budget_applies_creates_first(fake_attio, monkeypatch):
+    fix, attio = budget_fixture(fake_attio)
+    checks = iter([False, False, False])
+    monkeypatch.setattr(TimeBudget, "exhausted", lambda self: next(checks, True))
+    # One request at a time, so that every ready change is weighed against the budget
+    attio.limiter = AdaptiveLimiter(initial_limit=1, max_limit=1)
+
+    report = sync_fix_to_attio(fix, attio, max_changes_percent=100, time_budget=60)
+
+    assert [method for method, _ in attio.calls] == ["PUT", "POST", "PUT", "PUT"]
+    assert attio.calls_to("PUT", "workspaces") == 1
+    assert attio.calls_to("PUT", "users") == 1
+    assert report.deferred == {"users_last_active_outdated": 1, "workspaces_obsolete": 1}
+
+
+def test_time_budget_keeps_later_phases_from_overtaking_creates(fake_attio, monkeypatch):
+    workspace = make_fix_workspace("Kept")
+    workspace_record = attio_workspace_record(workspace)
+    synced = make_fix_user("synced@example.com", [workspace])
+    person_record = attio_person_record(synced.email)
+    user_record = attio_user_record(synced, person_record["id"]["record_id"], [workspace_record["id"]["record_id"]])
+    obsolete = [attio_workspace_record(make_fix_workspace(f"Gone {i}")) for i in range(8)]
+    attio = fake_attio({"workspaces": [workspace_record, *obsolete], "people": [person_record], "users": [user_record]})
+    attio.limiter = AdaptiveLimiter(initial_limit=4, max_limit=4)
+    fix = StaticFixData([synced, make_fix_user("new@example.com", [workspace])], [workspace])
+    load_people = attio.load_people
+
+    def slow_load_people(emails):
+        time.sleep(0.1)
+        load_people(emails)
+
+    monkeypatch.setattr(attio, "load_people", slow_load_people)
+
+    sync_fix_to_attio(fix, attio, max_changes_percent=100, time_budget=60)
+
+    calls = [(method, endpoint.split("/")[1]) for method, endpoint in attio.calls]
+    assert calls.index(("PUT", "users")) < calls.index(("DELETE", "workspaces"))
+    assert calls.count(("DELETE", "workspaces")) == 8
+
+
+def test_exhausted_circuit_breaker_pauses_the_run(fake_attio):
+    fix, attio = budget_fixture(fake_attio)
+    attio.breaker.trips = attio.breaker.max_trips
+
+    report = sync_fix_to_attio(fix, attio, max_changes_percent=100)
+
+    assert attio.calls == []
+    assert sum(report.deferred.values()) == 4
+
+
+def test_sync_to_targets_checks_threshold_per_target(fake_attio):
+    workspace = make_fix_workspace("Synced")
+    user = make_fix_user("synced@example.com", [workspace])
+    workspace_record = attio_workspace_record(workspace)
+    person_record = attio_person_record(user.email)
+    sales = fake_attio(
+        {
+            "workspaces": [workspace_record],
+            "people": [person_record],
+            "users": [attio_user_record(user, person_record["id"]["record_id"], [workspace_record["id"]["record_id"]])],
+        }
+    )
+    sales.name = "sales"
+    other_workspace = make_fix_workspace("Other")
+    success = fake_attio(
+        {
+            "workspaces": [attio_workspace_record(other_workspace)],
+            "people": [],
+            "users": [attio_user_record(make_fix_user("other@example.com", [other_workspace]))],
+        }
+    )
+    success.name = "success"
+    fix = StaticFixData([user], [workspace])
+
+    results = sync_fix_to_targets(fix, [sales, success], max_changes_percent=10)
+
+    assert results["sales"] == SyncReport()
+    assert "threshold" in str(results["success"])
+    assert fix.hydrations == 1
+    assert sales.calls == [] and success.calls == []
+
+
+def test_users_wait_only_for_their_own_workspaces(fake_attio):
+    existing = make_fix_workspace("Existing")
+    synced_user = make_fix_user("synced@example.com", [existing])
+    person = attio_person_record(synced_user.email)
+    attio = fake_attio(
+        {
+            "workspaces": [attio_workspace_record(existing), attio_workspace_record(make_fix_workspace("Gone"))],
+            "people": [person],
+            "users": [attio_user_record(synced_user, person["id"]["record_id"])],
+        }
+    )
+    new_workspace = make_fix_workspace("New")
+    new_user = make_fix_user("new@example.com", [new_workspace])
+    fix = StaticFixData([synced_user, new_user], [existing, new_workspace])
+    request = attio._request
+    deleted = threading.Event()
+    overlapped = []
+
+    def slow_workspace_creates(method, endpoint, json=None, params=None, timeout=10):
+        if method == "PUT" and endpoint.startswith("objects/workspaces"):
+            # Only finishes early if the unrelated delete runs alongside instead of after it
+            overlapped.append(deleted.wait(timeout=2))
+        if method == "DELETE":
+            deleted.set()
+        return request(method, endpoint, json=json, params=params, timeout=timeout)
+
+    attio._request = slow_workspace_creates
+
+    report = sync_fix_to_attio(fix, attio, max_changes_percent=100)
+
+    assert overlapped == [True]
+    assert report.deferred == {}
+    created = next(user for user in attio.users if user.id == new_user.id)
+    assert [workspace.name for workspace in created.workspaces] == ["New"]
+
+
+def test_hydrate_sources_overlaps_fix_and_attio():
+    # Both hydrations have to be running at the same time to pass the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    class SlowFixData(StaticFixData):
+        def hydrate(self) -> None:
+            barrier.wait()
+            super().hydrate()
+
+    class SlowAttioData(FakeAttioData):
+        def hydrate(self) -> None:
+            barrier.wait()
+            super().hydrate()
+
+    fix = SlowFixData([], [])
+    attio = SlowAttioData(existing_records())
+
+    hydrate_sources(fix, [attio])
+
+    assert fix.hydrated and attio.hydrated
+
+
+def test_hydrate_sources_raises_fix_error_first():
+    class BrokenFixData(StaticFixData):
+        def hydrate(self) -> None:
+            raise FixDataError("No data found in Fix database")
+
+    empty_attio = FakeAttioData({"workspaces": [], "people": [], "users": []})
+    attio = FakeAttioData(existing_records())
+
+    with pytest.raises(AttioDataError):
+        hydrate_sources(StaticFixData([], []), [empty_attio, attio])
+    with pytest.raises(FixDataError):
+        hydrate_sources(BrokenFixData([], []), [empty_attio])
+    # The other sources still finished hydrating
+    assert attio.hydrated
+
+
+def test_person_is_not_deleted_while_another_user_is_being_stored(fake_attio):
+    workspace = make_fix_workspace()
+    person = attio_person_record("shared@example.com")
+    person_id = person["id"]["record_id"]
+    gone, kept = make_fix_user("shared@example.com", [workspace]), make_fix_user("shared@example.com", [workspace])
+    users = [attio_user_record(gone, person_id), attio_user_record(kept, person_id)]
+    attio = fake_attio({"workspaces": [attio_workspace_record(workspace)], "people": [person], "users": users})
+    gone_user = next(user for user in attio.users if user.id == gone.id)
+    kept_user = next(user for user in attio.users if user.id == kept.id)
+    attio_person = gone_user.person
+    assert attio_person is not None
+
+    user_deleted, storing = threading.Event(), threading.Event()
+    delete_record = attio.delete_record
+
+    def delete_user_then_let_the_other_user_be_stored(object_id, record_id):
+        response = delete_record(object_id, record_id)
+        if object_id == "users":
+            user_deleted.set()
+            storing.wait()
+        return response
+
+    attio.delete_record = delete_user_then_let_the_other_user_be_stored
+    deletion = threading.Thread(target=delete_obsolete_users_and_people, args=(attio, [gone_user]))
+    deletion.start()
+    user_deleted.wait()
+    # Like store_record() of the kept user: unlinked and re-linked under the store lock
+    with attio._AttioData__store_lock:
+        attio_person.users.remove(kept_user)
+        storing.set()
+        deletion.join(timeout=0.2)
+        attio_person.users.add(kept_user)
+    deletion.join()
+
+    assert attio.calls_to("DELETE", "users") == 1
+    assert attio.calls_to("DELETE", "people") == 0
@@ -0,0 +1,39 @@
+from fakes import (
+    FakeAttioData,
+    StaticFixData,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.verify import DriftEstimate, verify_sample
+
+
+def test_verify_sample_fetches_only_sampled_records():
+    workspaces = [make_fix_workspace(f"Workspace {i}") for i in range(4)]
+    users = [make_fix_user(f"user{i}@example.com", [workspaces[i % 4]]) for i in range(20)]
+    workspace_records = [attio_workspace_record(workspace) for workspace in workspaces]
+    record_ids = {workspace.id: record["id"]["record_id"] for workspace, record in zip(workspaces, workspace_records)}
+    user_records = [attio_user_record(user, None, [record_ids[user.workspaces[0].id]]) for user in users[:18]]
+    # One synced user drifted, two were never synced
+    user_records[0]["values"]["workspace_has_subscription"] = [{"value": True}]
+    attio = FakeAttioData({"workspaces": workspace_records, "people": [], "users": user_records})
+
+    report = verify_sample(StaticFixData(users, workspaces), attio, sample=20, seed=1)
+
+    assert not attio.hydrated
+    assert [len(report.users.missing), len(report.users.outdated)] == [2, 1]
+    assert report.users.interval() == (3 / 20, 3 / 20)
+    assert report.workspaces.sampled == 4 and report.workspaces.drifted == 0
+    assert all(method == "POST" for method, _ in attio.calls)
+
+
+def test_drift_interval_narrows_with_sample_size():
+    small = DriftEstimate(population=100_000, sampled=20, outdated=[None] * 2)  # type: ignore
+    large = DriftEstimate(population=100_000, sampled=2_000, outdated=[None] * 200)  # type: ignore
+
+    small_low, small_high = small.interval()
+    large_low, large_high = large.interval()
+
+    assert small_low < large_low < 0.1 < large_high < small_high
+    assert large_high - large_low < 0.03
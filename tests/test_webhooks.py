@@ -0,0 +1,137 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from fakes import (
+    API_TOKEN_ACTOR,
+    OBJECT_IDS,
+    StaticFixData,
+    attio_person_record,
+    attio_user_record,
+    attio_workspace_record,
+    make_fix_user,
+    make_fix_workspace,
+)
+from fixattiosync.service import SyncService, make_handler
+from fixattiosync.sync import plan_sync
+from fixattiosync.webhooks import WebhookReceiver, parse_webhook_secrets, replay_events, signature
+
+
+def event(event_type: str, record: dict) -> dict:
+    return {"event_type": event_type, "id": dict(record["id"]), "actor": {"type": "workspace-member"}}
+
+
+def test_webhooks_keep_attio_state_fresh(fake_attio):
+    workspace = make_fix_workspace("Workspace")
+    user = make_fix_user("user@example.com", [workspace])
+    synced_user = make_fix_user("synced@example.com", [workspace])
+    workspace_record = attio_workspace_record(workspace)
+    attio = fake_attio({"workspaces": [workspace_record], "people": [], "users": [attio_user_record(synced_user)]})
+    fix = StaticFixData([synced_user, user], [workspace])
+    assert plan_sync(fix, attio).report().users_missing == 1
+
+    # Someone creates the user by hand and renames the workspace in Attio
+    person_record = attio_person_record(user.email)
+    user_record = attio_user_record(user, person_record["id"]["record_id"], [workspace_record["id"]["record_id"]])
+    attio.records["people"].append(person_record)
+    attio.records["users"].append(user_record)
+    workspace_record["values"]["name"] = [{"value": "Renamed"}]
+
+    webhooks = WebhookReceiver([attio], parse_webhook_secrets(["attio=secret"]))
+    service = SyncService(fix, [attio], webhooks=webhooks)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    webhooks.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/webhooks/attio"
+    try:
+        statuses = replay_events(
+            url,
+            [
+                {"webhook_id": "hook", "events": [event("record.created", user_record)]},
+                {"webhook_id": "hook", "events": [event("record.updated", workspace_record)]},
+            ],
+            secret="secret",
+        )
+        assert replay_events(url, [{"events": [event("record.deleted", user_record)]}], secret="wrong") == [401]
+        webhooks.wait()
+    finally:
+        webhooks.stop()
+        server.shutdown()
+        server.server_close()
+
+    assert statuses == [202, 202]
+    assert webhooks.stats == {"received": 2, "applied": 2, "ignored": 0, "failed": 0}
+    created = next(attio_user for attio_user in attio.users if attio_user.id == user.id)
+    assert created.person is not None and created.person.email == "user@example.com"
+    assert [w.name for w in created.workspaces] == ["Renamed"]
+    report = plan_sync(fix, attio).report()
+    assert report.users_missing == 0 and report.workspaces_outdated == 1
+    # Object slugs are looked up once per object
+    assert sum(1 for method, endpoint in attio.calls if method == "GET" and endpoint.count("/") == 1) == 2
+
+
+def test_deleted_and_unsynced_records_are_forgotten(fake_attio):
+    workspace = make_fix_workspace()
+    user = make_fix_user("user@example.com", [workspace])
+    workspace_record = attio_workspace_record(workspace)
+    user_record = attio_user_record(user)
+    attio = fake_attio({"workspaces": [workspace_record], "people": [], "users": [user_record]})
+    webhooks = WebhookReceiver([attio], insecure=True)
+    webhooks.start()
+
+    # The Fix id of the workspace was cleared by hand, hydrate() would no longer load it
+    workspace_record["values"]["workspace_id"] = []
+    body = json.dumps(
+        {
+            "events": [
+                event("record.updated", workspace_record),
+                event("record.deleted", user_record),
+                {"event_type": "note.created", "id": {"object_id": str(OBJECT_IDS["people"])}},
+            ]
+        }
+    ).encode()
+    assert webhooks.receive("attio", body, {}) == 202
+    assert webhooks.receive("unknown", body, {}) == 404
+    webhooks.wait()
+    webhooks.stop()
+
+    assert attio.workspaces == [] and attio.users == []
+    assert webhooks.stats["ignored"] == 1
+
+
+def test_own_writes_are_skipped_and_header_names_are_case_insensitive(fake_attio):
+    workspace = make_fix_workspace()
+    workspace_record = attio_workspace_record(workspace)
+    attio = fake_attio(
+        {"workspaces": [workspace_record], "people": [], "users": [attio_user_record(make_fix_user("a@example.com"))]}
+    )
+    workspace.name = "Renamed"
+    written = attio.assert_record(**workspace.attio_data())
+    assert attio.api_actor_id == API_TOKEN_ACTOR["id"]
+    attio.calls.clear()
+    webhooks = WebhookReceiver([attio], {"": "secret"})
+    webhooks.start()
+
+    own_event = {
+        "event_type": "record.updated",
+        "id": {"object_id": str(OBJECT_IDS["workspaces"]), "record_id": str(written.record_id)},
+        "actor": API_TOKEN_ACTOR,
+    }
+    body = json.dumps({"events": [own_event]}).encode()
+    assert webhooks.receive("attio", body, {"attio-signature": signature("secret", body)}) == 202
+    webhooks.wait()
+    webhooks.stop()
+
+    assert webhooks.stats["ignored"] == 1
+    assert attio.calls == []
+
+
+def test_unsigned_requests_are_rejected_without_a_secret(fake_attio):
+    workspace = make_fix_workspace()
+    user_record = attio_user_record(make_fix_user("user@example.com", [workspace]))
+    attio = fake_attio({"workspaces": [attio_workspace_record(workspace)], "people": [], "users": [user_record]})
+    webhooks = WebhookReceiver([attio], {"other": "secret"})
+
+    body = json.dumps({"events": [event("record.deleted", user_record)]}).encode()
+
+    assert webhooks.receive("attio", body, {}) == 401
+    assert webhooks.stats["received"] == 0